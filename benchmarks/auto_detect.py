@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Request count and latency of ``tr <text>`` (auto-detected source language).
+
+Compares the previous detect() + translate() flow with the single-request
+flow of ``Main.fetch_translations`` against the local fake endpoint, so the
+numbers only reflect round trips, never Google itself.
+
+    python benchmarks/auto_detect.py --latency 0.05 --queries 50
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir / "lib"))
+sys.path.insert(0, str(basedir))
+
+from benchmarks.fake_google import FakeGoogleServer, point_translator_at  # noqa: E402
+
+
+def legacy_fetch(translator, dest, query):
+    """The flow before single-round-trip auto mode"""
+    src = translator.detect(query).lang
+    sources = src if isinstance(src, list) else [src]
+    return [(src, translator.translate(query, src=src, dest=dest).text) for src in sources]
+
+
+def run(name, fetch, server, queries):
+    server.reset()
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        fetch("fr", f"good morning {i}")
+        latencies.append(time.perf_counter() - start)
+
+    translate_calls = server.requests["/translate_a/single"]
+    print(
+        f"{name:<8} {translate_calls / queries:>9.2f} "
+        f"{statistics.median(latencies) * 1000:>8.1f} "
+        f"{sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000:>8.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.05, help="fake server latency in seconds")
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    from plugin import ui
+    from plugin.translator import translator_pool
+
+    server = FakeGoogleServer(latency=args.latency).start()
+    translator = point_translator_at(translator_pool.get(), server.host)
+    translator.translate("warm up", dest="en")
+
+    print(f"{'flow':<8} {'req/query':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    run("before", lambda dest, query: legacy_fetch(translator, dest, query), server, args.queries)
+    run("after", lambda dest, query: ui.Main.fetch_translations("auto", dest, query), server, args.queries)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput of the translation backend against a degraded fake endpoint.
+
+Runs ``BatchTranslator`` through ``get_backend()`` while the local fake
+server adds latency, fails a share of requests and throttles with 429,
+and reports how retries and backoff cope.
+
+    python benchmarks/backend_load.py --error-rate 0.1 --rate-limit 20 --segments 2000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir / "lib"))
+sys.path.insert(0, str(basedir))
+
+from benchmarks.fake_google import FakeGoogleServer, point_translator_at  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.02, help="fake server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="random extra latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="share of requests failing with 500")
+    parser.add_argument("--rate-limit", type=float, default=20, help="server requests per second before 429")
+    parser.add_argument("--segments", type=int, default=2000)
+    parser.add_argument("--batch-chars", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=15, help="client requests per second")
+    args = parser.parse_args()
+
+    from plugin.backend import get_backend
+    from plugin.batch import BatchTranslator
+    from plugin.translator import translator_pool
+
+    server = FakeGoogleServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, rate_limit=args.rate_limit
+    ).start()
+    point_translator_at(translator_pool.get(), server.host)
+    backend = get_backend()
+    print(f"backend {backend.name}, capabilities {', '.join(sorted(backend.capabilities))}")
+
+    translator = BatchTranslator(
+        dest="fr", max_chars=args.batch_chars, workers=args.workers, rate=args.rate, backoff=0.1, cache=None
+    )
+    start = time.perf_counter()
+    results = list(translator.translate(f"segment number {i}" for i in range(args.segments)))
+    elapsed = time.perf_counter() - start
+
+    stats = translator.stats
+    print(
+        f"{len(results)} segments in {elapsed:.2f}s ({len(results) / elapsed:.0f} segments/s), "
+        f"{stats['requests']} requests, {stats['retries']} retries, {stats['failed']} failed"
+    )
+    print("server responses:", dict(sorted(server.responses.items())))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
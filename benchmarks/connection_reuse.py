@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Connections opened per translation with and without the shared translator.
+
+Runs the same queries through a fresh ``Translator()`` per call (the old
+behaviour) and through ``translator_pool`` against the local fake endpoint,
+and reports connections accepted by the server next to the pool counters.
+
+    python benchmarks/connection_reuse.py --queries 50
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir / "lib"))
+sys.path.insert(0, str(basedir))
+
+from benchmarks.fake_google import FakeGoogleServer, point_translator_at  # noqa: E402
+
+
+def run(name, get_translator, server, queries):
+    server.reset()
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        get_translator().translate(f"good morning {i}", dest="fr")
+        latencies.append(time.perf_counter() - start)
+
+    print(
+        f"{name:<8} {server.connections:>11} {sum(server.requests.values()):>8} "
+        f"{statistics.median(latencies) * 1000:>8.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.0, help="fake server latency in seconds")
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    from googletrans import Translator
+
+    from plugin.translator import translator_pool
+
+    server = FakeGoogleServer(latency=args.latency).start()
+
+    print(f"{'client':<8} {'connections':>11} {'requests':>8} {'p50 ms':>8}")
+    run("fresh", lambda: point_translator_at(Translator(), server.host), server, args.queries)
+
+    pooled = point_translator_at(translator_pool.get(), server.host)
+    run("pooled", lambda: pooled, server, args.queries)
+    print("pool counters:", translator_pool.stats())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
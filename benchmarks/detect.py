@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Accuracy and latency of the offline language detector.
+
+Runs ``plugin.detect`` over the labelled phrases in ``detect_corpus.tsv``
+and reports, per confidence threshold, how many queries would skip the
+network detector (coverage) and how many of those were detected correctly.
+Exits with status 1 when a phrase is misdetected at or above the default
+``min_confidence``, which would send Google the wrong source language.
+
+    python benchmarks/detect.py --threshold 0.5 --repeat 20
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir))
+
+corpus_path = Path(__file__).resolve().parent / "detect_corpus.tsv"
+
+
+def load_corpus(path=corpus_path):
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                lang, text = line.rstrip("\n").split("\t", 1)
+                samples.append((lang, text))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threshold", type=float, action="append", help="confidence thresholds to report")
+    parser.add_argument("--repeat", type=int, default=20, help="timing passes over the corpus")
+    parser.add_argument("--errors", action="store_true", help="list misdetected phrases")
+    args = parser.parse_args()
+
+    from plugin.detect import MIN_CONFIDENCE, language_detector
+
+    samples = load_corpus()
+
+    start = time.perf_counter()
+    language_detector.model
+    load_ms = (time.perf_counter() - start) * 1000
+
+    detections = [language_detector.detect(text) for _, text in samples]
+
+    timings = []
+    for _ in range(args.repeat):
+        for _, text in samples:
+            start = time.perf_counter()
+            language_detector.detect(text)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    print(f"{len(samples)} phrases, {len(set(lang for lang, _ in samples))} languages, model loaded in {load_ms:.1f} ms")
+    print(
+        f"latency  p50 {timings[len(timings) // 2] * 1e6:.0f} µs  "
+        f"p95 {timings[int(len(timings) * 0.95)] * 1e6:.0f} µs  "
+        f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.0f} µs"
+    )
+
+    methods = Counter(detection.method for detection in detections if detection)
+    print(f"methods  {', '.join(f'{method} {count}' for method, count in methods.most_common())}")
+
+    print(f"{'threshold':>9} {'coverage':>9} {'accuracy':>9}")
+    for threshold in args.threshold or [0.0, 0.3, 0.5, MIN_CONFIDENCE]:
+        accepted = [
+            (lang, detection) for (lang, _), detection in zip(samples, detections)
+            if detection and detection.confidence >= threshold
+        ]
+        correct = sum(1 for lang, detection in accepted if detection.lang == lang)
+        print(
+            f"{threshold:>9.2f} {len(accepted) / len(samples):>9.0%} "
+            f"{correct / max(len(accepted), 1):>9.1%}"
+        )
+
+    if args.errors:
+        for (lang, text), detection in zip(samples, detections):
+            if not detection or detection.lang != lang:
+                print(f"  {lang:<6} {detection!r:<60} {text}")
+
+    confident_errors = [
+        (lang, text, detection) for (lang, text), detection in zip(samples, detections)
+        if detection and detection.lang != lang and detection.confidence >= MIN_CONFIDENCE
+    ]
+    for lang, text, detection in confident_errors:
+        print(f"misdetected at min_confidence {MIN_CONFIDENCE}: {lang:<6} {detection!r:<60} {text}")
+    return 1 if confident_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the Google Translate endpoints used by googletrans.
+
+Serves the TKK token page (``/``) and ``/translate_a/single`` with a
+deterministic fake translation and a per-path request counter, so
+benchmarks never touch the real service. Latency (with jitter), a share of
+failing requests and a requests-per-second limit answered with 429 can be
+configured to load-test retries and backoff, and a share of requests can
+stall for seconds to reproduce tail latency.
+
+    python benchmarks/fake_google.py --port 8765 --latency 0.05 --error-rate 0.1 --rate-limit 20
+
+Further endpoints on the following ports take the same options with some
+overridden, e.g. one that is slow and one that always fails:
+
+    python benchmarks/fake_google.py --port 8765 --endpoint latency=2 --endpoint error_rate=1
+
+Point the plugin at it with ``service_urls = http://127.0.0.1:8765`` in the
+``[Network]`` section of ``user_settings.ini``.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_translate(text, dest):
+    """Deterministic stand-in for a translation, line by line like Google"""
+    return "\n".join(f"[{dest}] {line}" for line in text.split("\n"))
+
+
+def fake_detect(text):
+    """Crude detection: non-ASCII text is 'ja', everything else is 'en'"""
+    return "en" if text.isascii() else "ja"
+
+
+class FakeGoogleHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        with self.server.lock:
+            self.server.responses[status] += 1
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        with server.lock:
+            server.requests[url.path] += 1
+        delay = server.latency + random.uniform(0, server.jitter)
+        if random.random() < server.stall_rate:
+            delay += server.stall
+        if delay:
+            time.sleep(delay)
+
+        if not server.admit():
+            self._send(429, "too many requests", "text/plain")
+        elif random.random() < server.error_rate:
+            self._send(500, "internal error", "text/plain")
+        elif url.path == "/":
+            # googletrans only re-fetches the token when the hour changes
+            hour = int(time.time() * 1000 / 3600000)
+            self._send(200, f"<script>tkk:'{hour}.1234567890'</script>", "text/html")
+        elif url.path == "/translate_a/single":
+            params = parse_qs(url.query)
+            text = params.get("q", [""])[0]
+            src = params.get("sl", ["auto"])[0]
+            dest = params.get("tl", ["en"])[0]
+            candidates = server.candidates or [fake_detect(text)]
+            if src == "auto":
+                src = candidates[0]
+            data = [
+                [[fake_translate(text, dest), text, None, None, 1]],
+                None,
+                src,
+                None, None, None,
+                1.0,
+                [],
+                [candidates, None, [1.0] * len(candidates), candidates],
+            ]
+            self._send(200, json.dumps(data, ensure_ascii=False), "application/json")
+        else:
+            self._send(404, "not found", "text/plain")
+
+
+class FakeGoogleServer(ThreadingHTTPServer):
+    """Threaded fake server; counts accepted connections and hits per path"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, candidates=None, jitter=0.0, error_rate=0.0, rate_limit=0.0,
+                 stall_rate=0.0, stall=0.0):
+        super().__init__(("127.0.0.1", port), FakeGoogleHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.candidates = candidates
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.requests = Counter()
+        self.responses = Counter()
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._tokens = rate_limit
+        self._updated = time.monotonic()
+
+    def admit(self):
+        """Token bucket of ``rate_limit`` requests per second, one second of burst"""
+        if self.rate_limit <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._updated) * self.rate_limit)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def host(self):
+        return f"127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+            self.responses.clear()
+            self.connections = 0
+
+
+def point_translator_at(translator, host, *hosts):
+    """Send a googletrans Translator's requests to fake servers over plain HTTP"""
+    from googletrans import urls
+
+    urls.TRANSLATE = "http://{host}/translate_a/single"
+    translator.service_urls = [host, *hosts]
+    translator.token_acquirer.host = f"http://{host}"
+    return translator
+
+
+def parse_endpoint(spec, defaults):
+    """Options of a further endpoint: the defaults with 'name=value' pairs overridden"""
+    options = dict(defaults)
+    for pair in filter(None, spec.split(",")):
+        name, _, value = pair.partition("=")
+        name = name.strip().replace("-", "_")
+        if name not in options:
+            raise argparse.ArgumentTypeError(f"unknown endpoint option: {name}")
+        options[name] = float(value)
+    return options
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds, at random")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second before answering 429")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="share of requests delayed by --stall")
+    parser.add_argument("--stall", type=float, default=3.0, help="seconds a stalled request waits")
+    parser.add_argument("--endpoint", action="append", default=[], metavar="NAME=VALUE,...",
+                        help="serve another endpoint on the next port with these options overridden")
+    args = parser.parse_args()
+
+    defaults = {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "rate_limit": args.rate_limit,
+        "stall_rate": args.stall_rate,
+        "stall": args.stall,
+    }
+    try:
+        endpoints = [defaults] + [parse_endpoint(spec, defaults) for spec in args.endpoint]
+    except argparse.ArgumentTypeError as error:
+        parser.error(str(error))
+
+    servers = [FakeGoogleServer(args.port + i, **options) for i, options in enumerate(endpoints)]
+    for server, options in zip(servers, endpoints):
+        overrides = ", ".join(f"{name}={value:g}" for name, value in options.items() if value != defaults[name])
+        print(f"Fake Google Translate listening on http://{server.host}" + (f" ({overrides})" if overrides else ""))
+    print("service_urls = " + ", ".join(f"http://{server.host}" for server in servers))
+    for server in servers[1:]:
+        server.start()
+    try:
+        servers[0].serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Build time, size, lookup latency and memory of a large glossary.
+
+Generates a synthetic term list, compiles it with ``plugin.glossary`` into
+a temporary directory and times lookups of present and absent terms. The
+memory reported is what the lookups allocate on the Python heap, which
+stays flat because the file is only memory-mapped.
+
+    python benchmarks/glossary.py --entries 500000 --lookups 100000
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir))
+
+SYLLABLES = ["ka", "lo", "mi", "ré", "sa", "tü", "vo", "ne", "pi", "zé", "Do", "Fa", "gu", "Ñe"]
+
+
+def term(rng):
+    words = rng.randint(1, 3)
+    return " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(words))
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=500000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    from plugin.glossary import Glossary, build_glossary
+
+    rng = random.Random(args.seed)
+    terms = [(f"{term(rng)} {i}", f"translation {i}") for i in range(args.entries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "en_fr.gloss"
+        start = time.perf_counter()
+        count = build_glossary(iter(terms), path, "en", "fr")
+        build_s = time.perf_counter() - start
+        print(f"{count} entries, {path.stat().st_size / 1024 / 1024:.1f} MB, built in {build_s:.1f}s")
+
+        queries = [rng.choice(terms)[0].upper() for _ in range(args.lookups // 2)]
+        queries += [f"{term(rng)} missing" for _ in range(args.lookups - len(queries))]
+        rng.shuffle(queries)
+        del terms
+
+        start = time.perf_counter()
+        glossary = Glossary(path)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        timings, hits = array("d", bytes(8 * len(queries))), 0
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            hits += glossary.lookup(query) is not None
+            timings[i] = time.perf_counter() - start
+
+        # A second pass under tracemalloc, which would distort the timings
+        tracemalloc.start()
+        for query in queries:
+            glossary.lookup(query)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        glossary.close()
+
+    timings = sorted(timings)
+    print(f"opened in {open_ms:.2f} ms, {hits} / {len(queries)} hits")
+    print(f"lookup p50 {percentile(timings, 0.5):.1f} us, p95 {percentile(timings, 0.95):.1f} us, "
+          f"p99 {percentile(timings, 0.99):.1f} us")
+    print(f"heap during {len(queries)} lookups: {current / 1024:.1f} KB retained, {peak / 1024:.1f} KB peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Tail latency with hedged requests, deadlines and circuit breakers.
+
+Translates through the googletrans backend against local fake endpoints:
+two that occasionally stall, compared with and without hedging; one of
+two that always fails, to show its breaker taking it out; and one that
+hangs, to show the deadline.
+
+    python benchmarks/hedging.py --queries 200 --stall-rate 0.05 --stall 1
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir / "lib"))
+sys.path.insert(0, str(basedir))
+
+from benchmarks.fake_google import FakeGoogleServer, point_translator_at  # noqa: E402
+
+
+def run(name, backend, servers, queries, **options):
+    from plugin.hedging import HedgedCaller
+    from plugin.translator import translator_pool
+
+    translator_pool.hedger = HedgedCaller(
+        is_failure=lambda error: not isinstance(error, ValueError), **options
+    )
+    point_translator_at(translator_pool.get(), *(server.host for server in servers))
+    # The hedge delay follows the p95 once enough latencies are known
+    for i in range(HedgedCaller.min_samples):
+        try:
+            backend.translate(f"warm up {i}", src="en", dest="fr")
+        except Exception:
+            pass
+    for counter in ("hedges", "hedge_wins"):
+        translator_pool.hedger.stats[counter] = 0
+    for server in servers:
+        server.reset()
+
+    latencies, errors = [], 0
+    for i in range(queries):
+        start = time.perf_counter()
+        try:
+            backend.translate(f"good morning {i}", src="en", dest="fr")
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    def ms(fraction):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+    stats = translator_pool.hedger.stats
+    requests = sum(sum(server.requests.values()) for server in servers)
+    print(
+        f"{name:<16} {statistics.median(latencies) * 1000:>7.1f} {ms(0.95):>7.1f} {ms(0.99):>7.1f} "
+        f"{latencies[-1] * 1000:>7.1f} {requests / queries:>6.2f} {stats['hedges']:>6} {stats['hedge_wins']:>5} "
+        f"{stats['breaker_trips']:>5} {errors:>6}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="fake server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="random extra latency in seconds")
+    parser.add_argument("--stall-rate", type=float, default=0.05, help="share of requests that stall")
+    parser.add_argument("--stall", type=float, default=1.0, help="seconds a stalled request waits")
+    parser.add_argument("--deadline", type=float, default=0.5, help="deadline of the hanging scenario")
+    args = parser.parse_args()
+
+    from plugin.backend import get_backend
+
+    backend = get_backend()
+    common = dict(latency=args.latency, jitter=args.jitter)
+    stalling = [
+        FakeGoogleServer(stall_rate=args.stall_rate, stall=args.stall, **common).start() for _ in range(2)
+    ]
+    healthy = FakeGoogleServer(**common).start()
+    failing = FakeGoogleServer(error_rate=1.0, **common).start()
+    hanging = FakeGoogleServer(latency=30).start()
+
+    print(f"{'scenario':<16} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7} {'req/q':>6} "
+          f"{'hedges':>6} {'wins':>5} {'trips':>5} {'errors':>6}")
+    run("stalls", backend, stalling, args.queries, hedge=False)
+    run("stalls, hedged", backend, stalling, args.queries, hedge=True)
+    run("failing", backend, [healthy, failing], args.queries, hedge=True, breaker_failures=1000)
+    run("failing, broken", backend, [healthy, failing], args.queries, hedge=True)
+    run("hanging", backend, [hanging], 3, hedge=False, deadline=args.deadline)
+
+    for server in stalling + [healthy, failing, hanging]:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Insert rate, size, lookup latency and recall of a large translation memory.
+
+Fills ``plugin.memory`` in a temporary directory with synthetic sentences
+of made-up words with a name and a number, then looks up variants of
+stored sentences (another number or name, a typo, a word less) and
+sentences that were never stored. Recall is the share of variants
+offered their original sentence or one at least as similar. With
+``--max-entries`` below ``--entries``, the oldest entries are evicted
+while filling, as in use.
+
+    python benchmarks/memory.py --entries 1000000 --lookups 10000
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from array import array
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir))
+
+SYLLABLES = ["ka", "lo", "mi", "re", "sa", "tu", "vo", "ne", "pi", "ze", "do", "fa", "gu", "ban", "tor", "el"]
+
+
+# Recall is reported for variants this similar to their original
+BUCKETS = (0.8, 0.7, 0.6, 0.0)
+
+
+def word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+
+
+def sentence(rng, names):
+    """Five to ten words with a name and a number somewhere in them"""
+    words = [word(rng) for _ in range(rng.randint(3, 8))]
+    words.insert(rng.randint(0, len(words)), rng.choice(names))
+    words.insert(rng.randint(0, len(words)), str(rng.randint(1, 9999)))
+    return " ".join(words)
+
+
+def variant(rng, text, names):
+    """The same sentence with another number, another name, a typo or a word less"""
+    words = text.split()
+    kind = rng.randrange(4)
+    if kind == 0:
+        i = next(i for i, word in enumerate(words) if word.isdigit())
+        words[i] = str(int(words[i]) + rng.randint(1, 99))
+    elif kind == 1:
+        i = next(i for i, word in enumerate(words) if word[0].isupper())
+        words[i] = rng.choice([name for name in names if name != words[i]])
+    elif kind == 2:
+        i = max(range(len(words)), key=lambda i: len(words[i]))
+        j = rng.randrange(len(words[i]) - 1)
+        words[i] = words[i][:j] + words[i][j + 1] + words[i][j] + words[i][j + 2:]
+    else:
+        del words[rng.choice([i for i, word in enumerate(words) if word.islower()])]
+    return " ".join(words)
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--max-entries", type=int, help="memory bound, --entries by default")
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=1000, help="entries added per transaction")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    from plugin.cache import normalize_query
+    from plugin.memory import TranslationMemory, shingles, similarity
+
+    rng = random.Random(args.seed)
+    names = [word(rng).capitalize() for _ in range(200)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "memory.sqlite3"
+        memory = TranslationMemory(path, max_entries=args.max_entries or args.entries)
+
+        stored = []
+        start = time.perf_counter()
+        for offset in range(0, args.entries, args.batch):
+            batch = [sentence(rng, names) for _ in range(min(args.batch, args.entries - offset))]
+            memory.add_many([("fr", text, "en", f"[fr] {text}") for text in batch])
+            stored.extend(batch[-50:] if offset + args.batch >= args.entries else batch[:1])
+        fill_s = time.perf_counter() - start
+        size = sum(p.stat().st_size for p in path.parent.glob(path.name + "*"))
+        print(f"{len(memory)} entries, {size / 1024 / 1024:.0f} MB, "
+              f"{args.entries / fill_s:.0f} entries/s ({fill_s:.0f}s)")
+
+        # Incremental: one more entry into the full memory, as after a translation
+        timings = array("d")
+        for _ in range(200):
+            text = sentence(rng, names)
+            start = time.perf_counter()
+            memory.add("fr", text, "en", f"[fr] {text}")
+            timings.append(time.perf_counter() - start)
+        timings = sorted(timings)
+        print(f"add one   p50 {percentile(timings, 0.5):.2f} ms, p95 {percentile(timings, 0.95):.2f} ms")
+
+        # Entries of the last batches are certain to still be in a bounded memory
+        originals = [rng.choice(stored[-50:] if args.max_entries else stored) for _ in range(args.lookups // 2)]
+        queries = [(variant(rng, text, names), text) for text in originals]
+        # A typo that swaps equal letters leaves the sentence as it was
+        queries = [(query, original) for query, original in queries if query != original]
+        queries += [(sentence(rng, names), None) for _ in range(args.lookups - len(queries))]
+        rng.shuffle(queries)
+
+        timings, offered, recall = array("d"), 0, {bucket: [0, 0] for bucket in BUCKETS}
+        for query, original in queries:
+            start = time.perf_counter()
+            matches = memory.lookup("fr", query, limit=3)
+            timings.append(time.perf_counter() - start)
+            if original is None:
+                offered += bool(matches)
+                continue
+            score = similarity(shingles(normalize_query(query)), shingles(normalize_query(original)))
+            bucket = next(bucket for bucket in BUCKETS if score >= bucket)
+            recall[bucket][0] += bool(matches) and matches[0][0] >= score
+            recall[bucket][1] += 1
+
+    timings = sorted(timings)
+    print(f"lookup    p50 {percentile(timings, 0.5):.2f} ms, p95 {percentile(timings, 0.95):.2f} ms, "
+          f"p99 {percentile(timings, 0.99):.2f} ms")
+    for bucket, (found, total) in recall.items():
+        if total:
+            label = f">= {bucket:.1f}" if bucket else f"< {BUCKETS[-2]:.1f}"
+            print(f"recall at similarity {label}: {found / total:.1%} of {total} variants")
+    unrelated = sum(original is None for _, original in queries)
+    print(f"{offered} of {unrelated} unrelated queries offered a match")
+
+
+if __name__ == "__main__":
+    main()
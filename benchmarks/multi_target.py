@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Latency of 'tr en,fr,de,… <text>' against the local fake endpoint.
+
+Translates uncached queries into N languages sequentially and through
+``Main.translate_many``; with the concurrent fan-out the total should stay
+close to a single request instead of N of them.
+
+    python benchmarks/multi_target.py --latency 0.1 --targets en,fr,de,es
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir / "lib"))
+sys.path.insert(0, str(basedir))
+
+from benchmarks.fake_google import FakeGoogleServer, point_translator_at  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.1, help="fake server latency in seconds")
+    parser.add_argument("--targets", default="en,fr,de,es")
+    parser.add_argument("--queries", type=int, default=10)
+    args = parser.parse_args()
+
+    from plugin import ui
+    from plugin.translator import translator_pool
+    from plugin.cache import TranslationCache
+    from plugin.debounce import debouncer
+
+    # Measure the network fan-out only
+    ui.translation_cache = TranslationCache(path=":memory:")
+    debouncer.quiet_period = 0
+
+    server = FakeGoogleServer(latency=args.latency).start()
+    point_translator_at(translator_pool.get(), server.host)
+    targets = args.targets.split(",")
+
+    def sequential(i):
+        for dest in targets:
+            ui.Main.fetch_translations("auto", dest, f"sequential {i}")
+
+    def concurrent(i):
+        ui.Main.handle({"method": "query", "parameters": [f"{args.targets} concurrent {i}"]})
+
+    print(f"{len(targets)} targets, {args.latency * 1000:.0f} ms per request")
+    for name, run in (("sequential", sequential), ("concurrent", concurrent)):
+        latencies = []
+        for i in range(args.queries):
+            start = time.perf_counter()
+            run(i)
+            latencies.append(time.perf_counter() - start)
+        print(f"{name:<11} p50 {statistics.median(latencies) * 1000:>7.1f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Throughput of filling a .po catalog, in entries per second.
+
+Generates a synthetic catalog (with duplicated msgids and some entries
+already translated) and runs the autofill path against the local fake
+endpoint with a throwaway cache.
+
+    python benchmarks/po_autofill.py --entries 20000 --latency 0.05
+"""
+
+import argparse
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir / "lib"))
+sys.path.insert(0, str(basedir))
+
+from benchmarks.fake_google import FakeGoogleServer, point_translator_at  # noqa: E402
+
+
+def synthetic_catalog(entries, duplicates=0.2, translated=0.1):
+    """Build a .po catalog; every 1/duplicates-th msgid repeats an earlier one"""
+    lines = ['msgid ""', 'msgstr ""', '"Content-Type: text/plain; charset=utf-8\\n"', '']
+    for i in range(entries):
+        text = f"Message number {i // 2 if duplicates and i % int(1 / duplicates) == 0 else i}"
+        msgstr = f"Translated {i}" if translated and i % int(1 / translated) == 1 else ""
+        lines += [f"#: plugin/ui.py:{i}", f'msgctxt "{i}"', f'msgid "{text}"', f'msgstr "{msgstr}"', ""]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake server latency in seconds")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    from plugin.translator import translator_pool
+    from plugin.batch import BatchTranslator, translate_po
+    from plugin.cache import TranslationCache
+
+    server = FakeGoogleServer(latency=args.latency).start()
+    point_translator_at(translator_pool.get(), server.host)
+    catalog = synthetic_catalog(args.entries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TranslationCache(path=Path(tmp) / "cache.sqlite3", max_entries=args.entries * 2)
+        for run in ("cold", "warm"):
+            translator = BatchTranslator(src="en", dest="fr", workers=args.workers, rate=0, cache=cache)
+            start = time.perf_counter()
+            translate_po(translator, io.StringIO(catalog), io.StringIO(), fuzzy=True)
+            elapsed = time.perf_counter() - start
+            stats = translator.stats
+            print(
+                f"{run}: {stats['segments']} entries in {elapsed:.2f}s "
+                f"({stats['segments'] / elapsed:.0f} entries/s), {stats['requests']} requests, "
+                f"{stats['cached']} cached"
+            )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
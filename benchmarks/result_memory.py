@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Memory and serialization cost of result rows over many queries.
+
+Answers a mix of help, list, set and cached translation queries through
+``Main.handle`` the way the resident backend does, and samples the memory
+traced by tracemalloc every so often. The previous rows (dicts appended to
+a class-level list that no request ever cleared) are replayed for
+comparison.
+
+    python benchmarks/result_memory.py --queries 100000
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir / "lib"))
+sys.path.insert(0, str(basedir))
+
+QUERIES = ["", "list", "set fr", "fr hello world", "list fre"]
+
+
+def run(name, handle, queries, samples):
+    tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    points = []
+    start = time.perf_counter()
+    for i in range(1, queries + 1):
+        handle({"method": "query", "parameters": [QUERIES[i % len(QUERIES)]]})
+        if i % max(1, queries // samples) == 0:
+            points.append((i, (tracemalloc.get_traced_memory()[0] - start_memory) / 1024))
+    elapsed = time.perf_counter() - start
+    peak = (tracemalloc.get_traced_memory()[1] - start_memory) / 1024
+    tracemalloc.stop()
+
+    print(f"\n{name}: {queries} queries, {elapsed / queries * 1e6:.0f} us/query (traced), peak {peak:.0f} KB")
+    for i, kb in points:
+        print(f"  {i:>8} queries  {kb:>10.0f} KB retained")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=100000)
+    parser.add_argument("--legacy-queries", type=int, default=300, help="queries replayed with the old rows (quadratic)")
+    parser.add_argument("--samples", type=int, default=5, help="memory samples per run")
+    args = parser.parse_args()
+
+    from plugin import ui
+    from plugin.cache import TranslationCache
+    from plugin.debounce import debouncer
+
+    workdir = Path(tempfile.mkdtemp(prefix="dt-bench-"))
+    ui.translation_cache = TranslationCache(path=workdir / "cache.sqlite3", ttl=0)
+    ui.translation_cache.put("auto", "fr", "hello world", [("en", "bonjour le monde")])
+    debouncer.path = workdir / ".last_query"
+    debouncer.quiet_period = 0
+
+    class LegacyMain(ui.Main):
+        """Rows as dicts on a list shared by every instance"""
+
+        items = []
+
+        def _dispatch(self, request):
+            self.debugMessage = ""
+            results = getattr(self, request["method"])(*request["parameters"])
+            return json.dumps({"result": results, "debugMessage": self.debugMessage})
+
+        def add_item(self, title, subtitle, method=None, parameters=None):
+            item = {'Title': title, 'SubTitle': subtitle, 'IcoPath': ui.ICON_PATH}
+            if method:
+                item['JsonRPCAction'] = {'method': method, 'parameters': parameters or []}
+            self.items.append(item)
+
+    # Both produce the same payload for a fresh process
+    assert LegacyMain.handle({"method": "query", "parameters": ["set fr"]}) == \
+        ui.Main.handle({"method": "query", "parameters": ["set fr"]})
+    LegacyMain.items.clear()
+
+    run("before (shared dict rows)", LegacyMain.handle, args.legacy_queries, args.samples)
+    LegacyMain.items.clear()
+    run("after (per-request slotted rows)", ui.Main.handle, args.queries, args.samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Latency of the shared cache tier against its reference server.
+
+Starts ``plugin.shared_cache``'s reference server on a temporary database,
+writes ``--entries`` translations from one client as another machine would,
+then times batched lookups of stored and unknown queries from a second
+client over a keep-alive connection. Finally it measures what a hung
+server costs: one lookup waits out the timeout, and the ones after it skip
+the tier until the cooldown has passed.
+
+    python benchmarks/shared_cache.py --entries 10000 --lookups 2000
+"""
+
+import argparse
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir))
+
+BATCH_SIZES = (1, 10, 100)
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=2000, help="lookups per batch size")
+    parser.add_argument("--timeout", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    from plugin.cache import TranslationCache
+    from plugin.shared_cache import SharedCache, make_server
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        server = make_server(port=0, path=tmp / "shared.sqlite3", max_entries=args.entries * 2)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        counters = TranslationCache(tmp / "counters.sqlite3")
+
+        def client(url, cooldown=30):
+            return SharedCache(url, token="", timeout=args.timeout, cooldown=cooldown,
+                               counters=counters, down_marker=tmp / "down")
+
+        queries = [f"phrase {i} {rng.random():.6f}" for i in range(args.entries)]
+        writer = client(url)
+        start = time.perf_counter()
+        sent = writer.put_many([("auto", "fr", query, [("en", f"[fr] {query}")]) for query in queries])
+        put_s = time.perf_counter() - start
+        print(f"put {sent} entries in {put_s:.1f}s ({sent / put_s:.0f} entries/s, batches of 500)")
+
+        reader = client(url)
+        for size in BATCH_SIZES:
+            timings, found, total = array("d"), 0, 0
+            for _ in range(max(1, args.lookups // size)):
+                # Half of the keys were stored by the writer
+                keys = [("auto", "fr", rng.choice(queries) if rng.random() < 0.5 else f"unknown {rng.random()}")
+                        for _ in range(size)]
+                start = time.perf_counter()
+                values = reader.get_many(keys)
+                timings.append(time.perf_counter() - start)
+                found += sum(value is not None for value in values)
+                total += size
+            timings = sorted(timings)
+            print(f"get x{size:<4} p50 {percentile(timings, 0.5):.2f} ms, p95 {percentile(timings, 0.95):.2f} ms, "
+                  f"{found / total:.0%} found")
+        server.shutdown()
+
+        # A server that accepts connections and never answers
+        hung = socket.socket()
+        hung.bind(("127.0.0.1", 0))
+        hung.listen(16)
+        stuck = client(f"http://127.0.0.1:{hung.getsockname()[1]}")
+        for label in ("first lookup", "next lookup"):
+            start = time.perf_counter()
+            stuck.get_many([("auto", "fr", queries[0])])
+            print(f"hung server, {label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+        hung.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Cold-start benchmark for the plugin entry path.
+
+Runs ``main.py`` under ``python -X importtime`` for the commands that never
+need the network and compares the total import time against the checked-in
+budget in ``startup_budget.json``. Exits non-zero when a command exceeds its
+budget or imports one of the forbidden modules (the HTTP stack, and the
+settings parsers that the precompiled settings blob replaces).
+
+    python benchmarks/startup.py            # check against the budget
+    python benchmarks/startup.py --update   # re-baseline the budget
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+budget_path = Path(__file__).resolve().parent / "startup_budget.json"
+
+SCENARIOS = {
+    "help": "",
+    "list": "list",
+    "set": "set fr",
+}
+
+# Headroom applied to measurements when re-baselining
+UPDATE_FACTOR = 1.5
+
+
+def measure(query, env):
+    """Run main.py once and return (wall seconds, {module: self import us})"""
+    request = json.dumps({"method": "query", "parameters": [query]})
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", str(basedir / "main.py"), request],
+        cwd=str(basedir),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    wall = time.perf_counter() - start
+
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(self_us)
+    return wall, modules
+
+
+def run(repeat):
+    env = dict(os.environ)
+    # The resident backend would hide the cost we want to measure
+    env["DIRECTTRANSLATE_NO_DAEMON"] = "1"
+
+    # The first run after a settings change compiles the settings blob
+    measure("", env)
+
+    report = {}
+    for name, query in SCENARIOS.items():
+        walls, imports, loaded = [], [], set()
+        for _ in range(repeat):
+            wall, modules = measure(query, env)
+            walls.append(wall)
+            imports.append(sum(modules.values()))
+            loaded.update(modules)
+        report[name] = {
+            "wall_ms": statistics.median(walls) * 1000,
+            "import_ms": statistics.median(imports) / 1000,
+            "modules": loaded,
+        }
+    return report
+
+
+def main(argv):
+    update = "--update" in argv
+    repeat = 5
+
+    budget = json.loads(budget_path.read_text(encoding="utf-8"))
+    report = run(repeat)
+
+    failures = []
+    print(f"{'command':<8} {'wall ms':>9} {'import ms':>10} {'budget ms':>10}")
+    for name, result in report.items():
+        limit = budget["import_ms"].get(name)
+        print(f"{name:<8} {result['wall_ms']:>9.1f} {result['import_ms']:>10.1f} {limit or 0:>10.1f}")
+
+        forbidden = sorted(
+            module for module in result["modules"]
+            if module.split(".")[0] in budget["forbidden_modules"]
+        )
+        if forbidden:
+            failures.append(f"{name}: imports {', '.join(forbidden)}")
+        if not update and limit is not None and result["import_ms"] > limit:
+            failures.append(f"{name}: {result['import_ms']:.1f} ms exceeds budget of {limit:.1f} ms")
+
+    if update:
+        budget["import_ms"] = {
+            name: round(result["import_ms"] * UPDATE_FACTOR, 1) for name, result in report.items()
+        }
+        budget_path.write_text(json.dumps(budget, indent=4) + "\n", encoding="utf-8")
+        print(f"Budget written to {budget_path.name}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
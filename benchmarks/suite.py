@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Latency and allocation benchmarks for the query path.
+
+Covers ``Main.query`` dispatch (help, list, set and the 1/2/3-token
+translation forms, answered from a warm cache), ``SettingsManager`` calls,
+result serialization and full ``main.py`` process spawns against the local
+fake endpoint. Reports p50/p95/p99 latency and the peak memory allocated
+per call, and compares against a saved JSON baseline.
+
+    python benchmarks/suite.py                    # run and compare with baseline.json
+    python benchmarks/suite.py --save             # write baseline.json
+    python benchmarks/suite.py -k query -k spawn  # only matching benchmarks
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(basedir / "lib"))
+sys.path.insert(0, str(basedir))
+
+from benchmarks.fake_google import FakeGoogleServer, point_translator_at  # noqa: E402
+
+baseline_path = Path(__file__).resolve().parent / "baseline.json"
+
+QUERIES = {
+    "help": "",
+    "list": "list",
+    "set": "set fr",
+    "1-token": "hello world",
+    "2-token": "fr hello world",
+    "3-token": "en fr hello world",
+    "multi-target": "en,fr,de hello world",
+}
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of sorted samples"""
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def measure(fn, iterations, warmup=3, alloc_samples=20):
+    """Time ``fn`` and sample the peak memory it allocates per call"""
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        fn()
+        timings.append(time.perf_counter_ns() - start)
+    timings.sort()
+
+    peaks = []
+    for _ in range(min(alloc_samples, iterations)):
+        # Restarting resets the peak; reset_peak() needs Python 3.9
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        fn()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        tracemalloc.stop()
+    peaks.sort()
+
+    result = {
+        "p50_us": percentile(timings, 0.50) / 1000,
+        "p95_us": percentile(timings, 0.95) / 1000,
+        "p99_us": percentile(timings, 0.99) / 1000,
+        "iterations": iterations,
+    }
+    if peaks:
+        result["alloc_kb"] = percentile(peaks, 0.50) / 1024
+    return result
+
+
+def in_process_benchmarks(server):
+    """Benchmarks that call the plugin directly, with translations served from a warm cache"""
+    from plugin import prewarm, ui
+    from plugin.cache import TranslationCache
+    from plugin.debounce import debouncer
+    from plugin.results import ResultList, payload
+    from plugin.settings_manager import settings_manager
+    from plugin.translator import translator_pool
+
+    # A cache miss must never reach Google
+    point_translator_at(translator_pool.get(), server.host)
+
+    workdir = Path(tempfile.mkdtemp(prefix="dt-bench-"))
+    ui.translation_cache = TranslationCache(path=workdir / "cache.sqlite3", max_entries=1000, ttl=0)
+    # Queries translated to the default language are counted for prewarming
+    prewarm.translation_cache = ui.translation_cache
+    debouncer.path = workdir / ".last_query"
+    debouncer.quiet_period = 0
+
+    default = settings_manager.get_default_language()
+    for src, dest in [("auto", default), ("auto", "fr"), ("auto", "de"), ("en", "fr")]:
+        ui.translation_cache.put(src, dest, "hello world", [("en", f"[{dest}] hello world")])
+
+    def run_query(query):
+        main = ui.Main.__new__(ui.Main)
+        main.items = ResultList()
+        return main.query(query)
+
+    benchmarks = {f"query:{name}": (lambda query=query: run_query(query)) for name, query in QUERIES.items()}
+
+    benchmarks.update({
+        "settings:get_default_language": settings_manager.get_default_language,
+        "settings:get_available_languages": settings_manager.get_available_languages,
+        "settings:is_valid_language": lambda: settings_manager.is_valid_language("zh-tw"),
+        "settings:get_float": lambda: settings_manager.get_float("Debounce", "quiet_period", 0.15),
+    })
+
+    list_results = run_query("list")
+    translation_results = run_query("fr hello world")
+    benchmarks.update({
+        "serialize:list": lambda: payload(list_results),
+        "serialize:translation": lambda: payload(translation_results),
+        "handle:translation": lambda: ui.Main.handle({"method": "query", "parameters": ["fr hello world"]}),
+    })
+    return benchmarks, workdir
+
+
+def make_plugin_copy(workdir, host):
+    """Copy the plugin next to a user_settings.ini that points at the fake endpoint"""
+    plugin_dir = workdir / "plugin-copy"
+    shutil.copytree(str(basedir / "plugin"), str(plugin_dir / "plugin"))
+    shutil.copy2(str(basedir / "main.py"), str(plugin_dir / "main.py"))
+    if (basedir / "lib").exists():
+        os.symlink(str(basedir / "lib"), str(plugin_dir / "lib"))
+    (plugin_dir / "user_settings.ini").write_text(
+        "[Translation]\ndefault_language = en\ndefault_language_name = English\n\n"
+        f"[Network]\nservice_urls = http://{host}\n\n"
+        "[Debounce]\nquiet_period = 0\n",
+        encoding="utf-8",
+    )
+    return plugin_dir
+
+
+def spawn_benchmarks(workdir, server):
+    """Benchmarks that run main.py in a new process, the way Flow Launcher does"""
+    plugin_dir = make_plugin_copy(workdir, server.host)
+    env = dict(os.environ)
+    env["DIRECTTRANSLATE_NO_DAEMON"] = "1"
+    counter = iter(range(10 ** 9))
+
+    def spawn(query):
+        request = json.dumps({"method": "query", "parameters": [query]})
+        subprocess.run(
+            [sys.executable, str(plugin_dir / "main.py"), request],
+            cwd=str(plugin_dir), env=env, stdout=subprocess.DEVNULL, check=True,
+        )
+
+    return {
+        "spawn:help": lambda: spawn(""),
+        "spawn:cached": lambda: spawn("fr hello world"),
+        "spawn:network": lambda: spawn(f"fr hello world {next(counter)}"),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print the change against the baseline and return the names that regressed"""
+    regressions = []
+    print(f"\n{'benchmark':<34} {'p50 before':>11} {'p50 now':>9} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = result["p50_us"] / before["p50_us"] - 1 if before["p50_us"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<34} {before['p50_us']:>11.1f} {result['p50_us']:>9.1f} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-k", "--filter", action="append", default=[], help="only run benchmarks containing this")
+    parser.add_argument("-n", "--iterations", type=int, default=300, help="iterations of in-process benchmarks")
+    parser.add_argument("--spawn-iterations", type=int, default=15, help="iterations of process spawns")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake server latency in seconds")
+    parser.add_argument("--baseline", type=Path, default=baseline_path)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.5, help="p50 slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    server = FakeGoogleServer(latency=args.latency).start()
+    benchmarks, workdir = in_process_benchmarks(server)
+    iterations = dict.fromkeys(benchmarks, args.iterations)
+    spawns = spawn_benchmarks(workdir, server)
+    benchmarks.update(spawns)
+    iterations.update(dict.fromkeys(spawns, args.spawn_iterations))
+
+    results = {}
+    print(f"{'benchmark':<34} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'alloc KB':>9}")
+    try:
+        for name, fn in benchmarks.items():
+            if args.filter and not any(pattern in name for pattern in args.filter):
+                continue
+            # Process spawns allocate in the child, which tracemalloc cannot see
+            result = measure(fn, iterations[name], alloc_samples=0 if name.startswith("spawn:") else 20)
+            results[name] = result
+            print(
+                f"{name:<34} {result['p50_us']:>10.1f} {result['p95_us']:>10.1f} "
+                f"{result['p99_us']:>10.1f} {result.get('alloc_kb', 0):>9.1f}"
+            )
+    finally:
+        server.shutdown()
+        shutil.rmtree(str(workdir), ignore_errors=True)
+
+    regressions = []
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline["results"], args.threshold)
+
+    if args.save:
+        args.baseline.write_text(json.dumps({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }, indent=4) + "\n", encoding="utf-8")
+        print(f"\nBaseline written to {args.baseline.name}")
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
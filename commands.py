@@ -2,6 +2,8 @@
 
 import json
 import os
+import sys
+import time
 from textwrap import dedent
 from typing import List
 
@@ -19,7 +21,6 @@ from plugin import (
     PLUGIN_URL_SOURCE_CODE,
     PLUGIN_ZIP_NAME,
     TRANSLATIONS_PATH,
-    __long_description__,
     __package_name__,
     __short_description__,
     __version__,
@@ -38,6 +39,12 @@ build_ignore_path = basedir / ".buildignore"
 build_ignore_path.touch()  # if no existed, would be created
 plugin_info_path = basedir / "plugin.json"
 zip_path = build_path / f"{PLUGIN_ZIP_NAME}"
+readme_path = basedir / "README.md"
+
+try:
+    __long_description__ = open(readme_path, "r").read()
+except:
+    __long_description__ = __short_description__
 
 plugin_infos = {
     "ID": PLUGIN_ID,
@@ -146,6 +153,152 @@ def compile():
     click.echo("Done.")
 
 
+@translate.command()
+@click.argument("input", type=click.File("r", encoding="utf-8"), default="-")
+@click.option("-o", "--output", type=click.File("w", encoding="utf-8"), default="-", help="Output file, stdout by default.")
+@click.option("-f", "--format", "fmt", type=click.Choice(["lines", "jsonl", "po"]), help="Input format, guessed from the file extension.")
+@click.option("-s", "--src", default="auto", show_default=True, help="Source language.")
+@click.option("-d", "--dest", required=True, help="Target language.")
+@click.option("--field", default="text", show_default=True, help="JSON field to translate (jsonl).")
+@click.option("--batch-chars", default=4500, show_default=True, help="Maximum characters per request.")
+@click.option("--workers", default=4, show_default=True, help="Concurrent requests.")
+@click.option("--rate", default=5.0, show_default=True, help="Maximum requests per second.")
+@click.option("--retries", default=3, show_default=True, help="Retries per request, with exponential backoff.")
+def translate_batch(input, output, fmt, src, dest, field, batch_chars, workers, rate, retries):
+    """Translate lines, JSONL records or .po entries from a file or stdin."""
+    from plugin.batch import BatchTranslator, translate_jsonl, translate_lines, translate_po
+
+    if fmt is None:
+        suffix = os.path.splitext(input.name)[1].lower()
+        fmt = {".jsonl": "jsonl", ".po": "po", ".pot": "po"}.get(suffix, "lines")
+
+    translator = BatchTranslator(
+        src=src, dest=dest, max_chars=batch_chars, workers=workers, rate=rate, retries=retries
+    )
+    if fmt == "jsonl":
+        translate_jsonl(translator, input, output, field=field)
+    elif fmt == "po":
+        translate_po(translator, input, output)
+    else:
+        translate_lines(translator, input, output)
+
+    stats = translator.stats
+    click.echo(
+        f"{stats['segments']} segments, {stats['glossary']} from glossaries, {stats['cached']} cached, "
+        f"{stats['requests']} requests, {stats['retries']} retries, {stats['failed']} failed.",
+        err=True,
+    )
+
+
+@translate.command()
+@click.option("-d", "--dest", help="Target language, the default language by default.")
+@click.option("--phrases", type=click.Path(exists=True, dir_okay=False), help="Phrase list, one per line.")
+@click.option("--queries", type=int, help="Most used recent queries to replay, [Prewarm] queries by default.")
+@click.option("--workers", type=int, help="Concurrent translations.")
+@click.option("--rate", type=float, help="Maximum translations per second.")
+def prewarm(dest, phrases, queries, workers, rate):
+    """Translate frequent queries and a phrase list into the cache ahead of use."""
+    from plugin.prewarm import PrewarmJob, candidates
+    from plugin.settings_manager import settings_manager
+
+    dest = dest or settings_manager.get_default_language()
+    job = PrewarmJob(dest, candidates(queries, phrases), workers=workers, rate=rate)
+    start = time.perf_counter()
+    stats = job.run()
+    click.echo(
+        f"{stats['queries']} queries into {dest} in {time.perf_counter() - start:.1f}s: "
+        f"{stats['translated']} translated, {stats['cached']} already cached "
+        f"({stats['shared']} from the shared cache), {stats['failed']} failed."
+    )
+
+
+@translate.command()
+@click.option("--host", default="127.0.0.1", show_default=True, help="Address to listen on.")
+@click.option("--port", default=8790, show_default=True, help="Port to listen on.")
+@click.option("--db", type=click.Path(dir_okay=False), help="SQLite file, shared_cache.sqlite3 by default.")
+@click.option("--max-entries", default=1000000, show_default=True, help="Least recently used entries are evicted beyond this.")
+@click.option("--ttl-days", default=30.0, show_default=True, help="Entries older than this are dropped, 0 keeps them.")
+@click.option("--token", default="", help="Bearer token clients must send.")
+def serve_shared_cache(host, port, db, max_entries, ttl_days, token):
+    """Run the reference server of the shared cache tier."""
+    from plugin.shared_cache import serve
+
+    click.echo(f"Serving the shared cache on http://{host}:{port}, Ctrl+C to stop.")
+    serve(host=host, port=port, path=db, max_entries=max_entries, ttl_days=ttl_days, token=token)
+
+
+@translate.command()
+@click.argument("locale")
+@click.option("-s", "--src", default="en", show_default=True, help="Language of the msgids.")
+@click.option("--workers", default=4, show_default=True, help="Concurrent requests.")
+@click.option("--rate", default=5.0, show_default=True, help="Maximum requests per second.")
+@click.option("--use-fuzzy/--no-use-fuzzy", default=True, show_default=True, help="Compile fuzzy entries into the .mo.")
+def autofill(locale, src, workers, rate, use_fuzzy):
+    """Machine-translate untranslated and fuzzy entries of a language."""
+    from plugin.batch import BatchTranslator, translate_po
+    from plugin.languages import locale_to_language
+
+    po_path = TRANSLATIONS_PATH / locale / "LC_MESSAGES" / "messages.po"
+    if not po_path.exists():
+        raise click.ClickException(f"{po_path} not found, run 'init {locale}' first")
+
+    translator = BatchTranslator(src=src, dest=locale_to_language(locale), workers=workers, rate=rate)
+    temp_path = po_path.with_suffix(".po.tmp")
+    start = time.perf_counter()
+    with open(po_path, "r", encoding="utf-8") as f_r, open(temp_path, "w", encoding="utf-8") as f_w:
+        translate_po(translator, f_r, f_w, fuzzy=True, retranslate_fuzzy=True)
+    os.replace(temp_path, po_path)
+    elapsed = time.perf_counter() - start
+
+    stats = translator.stats
+    click.echo(
+        f"{stats['segments']} entries in {elapsed:.1f}s ({stats['segments'] / max(elapsed, 1e-9):.0f} entries/s), "
+        f"{stats['cached']} cached, {stats['requests']} requests, {stats['failed']} failed."
+    )
+
+    use_fuzzy_flag = " --use-fuzzy" if use_fuzzy else ""
+    if os.system(f"pybabel compile -d {TRANSLATIONS_PATH} -l {locale}{use_fuzzy_flag}"):
+        raise RuntimeError("compile command failed")
+
+    click.echo("Done.")
+
+
+@translate.command()
+@click.argument("profiles", type=click.Path(exists=True, file_okay=False))
+@click.option("--top", default=600, show_default=True, help="Grams of each length kept per language.")
+def build_detector(profiles, top):
+    """Compile langdetect profiles into the offline language detector model."""
+    from plugin.detect import build_model, model_path
+
+    languages, grams = build_model(profiles, top=top)
+    click.echo(f"{languages} languages, {grams} grams, {model_path.stat().st_size / 1024:.0f} KB.")
+
+
+@translate.command()
+@click.argument("terms", type=click.Path(exists=True, dir_okay=False))
+@click.option("-s", "--src", required=True, help="Language of the terms.")
+@click.option("-d", "--dest", required=True, help="Language of the translations.")
+@click.option("--source-column", default=0, show_default=True, help="Column of the terms.")
+@click.option("--target-column", default=1, show_default=True, help="Column of the translations.")
+@click.option("--skip-header", is_flag=True, help="Ignore the first row.")
+def build_glossary(terms, src, dest, source_column, target_column, skip_header):
+    """Compile a TSV or CSV term list into the glossary of a language pair."""
+    from plugin.glossary import build_glossary, glossaries, glossary_path, read_terms
+    from plugin.languages import language_index
+
+    for code in (src, dest):
+        if code not in language_index().codes:
+            raise click.BadParameter(f"unknown language code: {code}")
+
+    path = glossary_path(src, dest, glossaries.directory)
+    start = time.perf_counter()
+    try:
+        count = build_glossary(read_terms(terms, source_column, target_column, skip_header), path, src, dest)
+    except PermissionError:
+        raise click.ClickException(f"{path} is in use, stop the resident backend and try again")
+    click.echo(f"{count} entries, {path.stat().st_size / 1024:.0f} KB in {time.perf_counter() - start:.1f}s: {path}")
+
+
 @click.group()
 def plugin():
     """Plugin commands."""
@@ -163,9 +316,41 @@ def gen_plugin_info():
 
 
 @plugin.command()
-def build():
+@click.option("--optimized", is_flag=True, help="Prune lib/ to what the plugin imports and ship precompiled bytecode.")
+@click.option("--python", default=sys.executable, show_default=True, help="Python the package is compiled for.")
+@click.option("--optimize", type=click.IntRange(0, 2), default=2, show_default=True, help="Bytecode optimization level (-O).")
+@click.option("--zip-lib", is_flag=True, help="Pack the pure-Python packages of lib/ into lib.zip.")
+@click.option("--sourceless", is_flag=True, help="Ship only bytecode; the package then runs on that Python only.")
+def build(optimized, python, optimize, zip_lib, sourceless):
     "Pack plugin to a zip file."
 
+    if optimized:
+        from plugin.bundle import BuildError, build_optimized
+
+        try:
+            report = build_optimized(
+                get_build_ignores(), zip_path, python=python, optimize=optimize,
+                sourceless=sourceless, zip_lib_=zip_lib,
+            )
+        except BuildError as error:
+            raise click.ClickException(str(error))
+
+        click.echo(
+            f"{report['modules']} modules of lib/ imported, {report['pruned']} files "
+            f"({report['pruned_bytes'] / 1024:.0f} KB) pruned, {report['compiled']} compiled for {report['cache_tag']}."
+        )
+        if report["zipped"]:
+            click.echo(f"lib.zip: {', '.join(report['zipped'])}")
+        click.echo(f"\n{'':<24} {'plain':>10} {'optimized':>10}")
+        for label, (before, after) in (("zip KB", report["size"]), ("installed KB", report["installed"])):
+            click.echo(f"{label:<24} {before / 1024:>10.0f} {after / 1024:>10.0f}")
+        before, after = report["cold_start"]
+        for name in before:
+            for i, label in enumerate(("first", "median")):
+                click.echo(f"{name + ' ' + label + ' ms':<24} {before[name][i] * 1000:>10.1f} {after[name][i] * 1000:>10.1f}")
+        click.echo(f"Done: {zip_path}")
+        return
+
     zip_path.unlink(missing_ok=True)
 
     ignore_list = get_build_ignores()
@@ -244,6 +429,41 @@ def parse_header(line: str) -> Tuple[str, Dict[str, str]]:
     click.echo("Done.")
 
 
+@click.group()
+def bench():
+    """Benchmark commands."""
+    ...
+
+
+@bench.command(name="bench", context_settings={"ignore_unknown_options": True})
+@click.option("--save", is_flag=True, help="Write the results as the new baseline.")
+@click.argument("args", nargs=-1, type=click.UNPROCESSED)
+def run_bench(save, args):
+    """Run the benchmark suite and compare it with the saved baseline.
+
+    Extra arguments are passed to benchmarks/suite.py, e.g. '-k query'.
+    """
+    sys.path.insert(0, str(basedir))
+    from benchmarks import suite
+
+    if suite.main(list(args) + (["--save"] if save else [])):
+        raise click.ClickException("benchmarks regressed against the baseline")
+
+
+@bench.command()
+@click.option("--update", is_flag=True, help="Re-baseline the checked-in budget.")
+def bench_startup(update):
+    """Check cold-start import time of main.py against the budget."""
+
+    import subprocess
+
+    args = ["--update"] if update else []
+    try:
+        subprocess.run([sys.executable, str(basedir / 'benchmarks' / 'startup.py'), *args], check=True)
+    except subprocess.CalledProcessError:
+        raise click.ClickException("startup budget exceeded")
+
+
 @click.group()
 def clean():
     """Clean commands."""
@@ -272,6 +492,7 @@ def clean_pyc():
 if __name__ == "__main__":
     cli = click.CommandCollection(
         sources=[
+            bench,
             clean,
             env,
             plugin,
@@ -1,15 +1,61 @@
 # -*- coding: utf-8 -*-
 import os
 import sys
+import time
 
-# Add lib directory to Python path to use vendored dependencies
-basedir = os.path.dirname(os.path.abspath(__file__))
-lib_path = os.path.join(basedir, "lib")
-if lib_path not in sys.path:
-    sys.path.insert(0, lib_path)
+# Queries are timed from here on, see plugin/metrics.py
+started, started_at = time.perf_counter(), time.time()
 
+# Add lib directory to Python path to use vendored dependencies; optimized
+# builds pack the pure-Python ones into lib.zip (see plugin/bundle.py)
+basedir = os.path.dirname(os.path.abspath(__file__))
+for lib_path in (os.path.join(basedir, "lib"), os.path.join(basedir, "lib.zip")):
+    if lib_path not in sys.path and os.path.exists(lib_path):
+        sys.path.insert(0, lib_path)
 
-from plugin import Main
 
 if __name__ == "__main__":
-    Main()
+    if sys.argv[1:] == ["--daemon"]:
+        from plugin.daemon import serve
+
+        serve()
+    else:
+        import json
+
+        from plugin import metrics
+
+        metrics.begin(started, started_at)
+        profiler = None
+        if os.environ.get("DIRECTTRANSLATE_PROFILE"):
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        request = json.loads(sys.argv[1]) if len(sys.argv) > 1 else {"method": "query", "parameters": [""]}
+        with metrics.stage("imports"):
+            from plugin.daemon import forward
+
+        # A profiled query is handled in-process, where the profiler sees it
+        handled, output = (False, None)
+        if profiler is None:
+            with metrics.stage("forward"):
+                handled, output = forward(request)
+        if handled:
+            metrics.tag(command="forward")
+            if output is not None:
+                with metrics.stage("output"):
+                    print(output)
+        else:
+            with metrics.stage("imports"):
+                from plugin import Main
+
+            Main()
+
+        # Flow Launcher reads until the pipe closes; the rest is off its clock
+        sys.stdout.flush()
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(str(metrics.profile_path()))
+        metrics.end()
@@ -18,10 +18,17 @@ from plugin.settings import (
     PLUGIN_URL_SOURCE_CODE,
     PLUGIN_ZIP_NAME,
     TRANSLATIONS_PATH,
-    __long_description__,
     __package_name__,
     __short_description__,
     __version__,
     basedir,
 )
-from plugin.ui import Main
+
+
+def __getattr__(name):
+    # Import the UI lazily so that the daemon client in main.py stays light
+    if name == "Main":
+        from plugin.ui import Main
+
+        return Main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Translation backends.
+
+Everything that talks to a translation service goes through a ``Backend``,
+chosen with ``[Backend] name`` in ``user_settings.ini``. Implementations are
+registered by dotted path and only imported when first used, so the HTTP
+stack of a backend is never loaded for cached or offline answers.
+"""
+
+import importlib
+import threading
+from collections import namedtuple
+
+from plugin.settings_manager import settings_manager
+
+# One translated text; ``candidates`` lists other likely source languages
+Translation = namedtuple('Translation', ['src', 'dest', 'text', 'candidates'])
+
+# What a backend can do beyond translating single texts
+DETECT = 'detect'
+BATCH = 'batch'
+CANDIDATES = 'candidates'
+
+BACKENDS = {
+    'googletrans': 'plugin.translator:GoogletransBackend',
+}
+
+
+class Backend:
+    """Interface of a translation service"""
+
+    name = ''
+    capabilities = frozenset()
+
+    def warm_up(self):
+        """Open connections ahead of the first request"""
+
+    def translate(self, text, src='auto', dest='en'):
+        """Translate one text, returning a Translation"""
+        raise NotImplementedError
+
+    def detect(self, text):
+        """Return the (language, confidence) of a text"""
+        raise NotImplementedError(f"{self.name} cannot detect languages")
+
+    def translate_joined(self, texts, src='auto', dest='en'):
+        """
+        Translate several texts without newlines in a single request.
+
+        Google answers line for line; returns one Translation per text, all
+        with the detected source of the whole request, or None when the line
+        count comes back different. Each text keeps its leading and trailing
+        whitespace.
+        """
+        texts = list(texts)
+        translation = self.translate("\n".join(texts), src=src, dest=dest)
+        parts = translation.text.split("\n")
+        if len(parts) != len(texts):
+            return None
+        return [
+            Translation(translation.src, dest, text[:len(text) - len(text.lstrip())] + part.strip() +
+                        text[len(text.rstrip()):], translation.candidates)
+            for text, part in zip(texts, parts)
+        ]
+
+    def translate_batch(self, texts, src='auto', dest='en'):
+        """
+        Translate several texts, returning one Translation each.
+
+        Texts without newlines are joined into a single request (see
+        ``translate_joined``); if that cannot be split back, every text is
+        sent on its own.
+        """
+        texts = list(texts)
+        if len(texts) > 1 and not any("\n" in text for text in texts):
+            translations = self.translate_joined(texts, src=src, dest=dest)
+            if translations is not None:
+                return translations
+        return [self.translate(text, src=src, dest=dest) for text in texts]
+
+    def stats(self):
+        """Return request and connection counters"""
+        return {}
+
+
+def load_backend(name):
+    """Instantiate a registered backend by name"""
+    try:
+        module_name, class_name = BACKENDS[name].split(':')
+    except KeyError:
+        raise ValueError(f"unknown translation backend: {name}") from None
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the process-wide backend, created on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = load_backend(settings_manager.get('Backend', 'name', 'googletrans'))
+    return _backend
@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+"""
+Batch translation of large inputs.
+
+Segments are read in windows so that memory stays bounded regardless of
+input size. Within a window, cached segments are served from the
+glossaries or the translation cache, the rest are packed several per
+backend call (see ``Backend.translate_joined``) and the calls run
+concurrently behind a shared rate limit, retrying with exponential
+backoff.
+
+Long texts typed or pasted into the launcher are split into sentences,
+which are sent concurrently, one request each (``translate_text``).
+"""
+
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from plugin.cache import translation_cache
+from plugin.glossary import glossaries
+
+
+class RateLimiter:
+    """Token bucket shared by the worker threads"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class BatchTranslator:
+    """Translates a stream of segments, yielding (src, text) in input order"""
+
+    def __init__(self, src='auto', dest='en', max_chars=4500, workers=4, rate=5.0,
+                 retries=3, backoff=0.5, window=1000, cache=translation_cache, glossary=glossaries, pack=True):
+        self.src = src
+        self.dest = dest
+        self.max_chars = max_chars
+        # Several segments per request, or one request per segment
+        self.pack = pack
+        self.workers = workers
+        self.limiter = RateLimiter(rate, burst=workers)
+        self.retries = retries
+        self.backoff = backoff
+        self.window = window
+        self.cache = cache
+        self.glossary = glossary
+        self.stats = {'segments': 0, 'glossary': 0, 'cached': 0, 'requests': 0, 'retries': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            self.stats[name] += value
+
+    def _request(self, call, *args):
+        """One rate-limited backend call, retried with exponential backoff"""
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            self._count('requests')
+            try:
+                return call(*args, src=self.src, dest=self.dest)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                self._count('retries')
+                time.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+
+    def _translate_batch(self, texts):
+        """
+        Translate segments in a single request.
+
+        Returns None when the backend's answer to several segments cannot be
+        split back into them.
+        """
+        from plugin.backend import get_backend
+
+        backend = get_backend()
+        if len(texts) == 1:
+            translation = self._request(backend.translate, texts[0])
+            return [(translation.src, translation.text)]
+        translations = self._request(backend.translate_joined, texts)
+        if translations is None:
+            return None
+        return [(translation.src, translation.text) for translation in translations]
+
+    def _batches(self, texts):
+        """Pack segments into requests of at most ``max_chars`` characters"""
+        batch, size = [], 0
+        for text in texts:
+            # Segments with newlines cannot be told apart once joined
+            if not self.pack or "\n" in text or len(text) >= self.max_chars:
+                if batch:
+                    yield batch
+                    batch, size = [], 0
+                yield [text]
+                continue
+            if batch and size + len(text) + 1 > self.max_chars:
+                yield batch
+                batch, size = [], 0
+            batch.append(text)
+            size += len(text) + 1
+        if batch:
+            yield batch
+
+    def _translate_window(self, executor, texts):
+        results = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            if not text.strip():
+                results[text] = (self.src, text)
+                continue
+            entry = self.glossary.lookup(self.src, self.dest, text) if self.glossary else None
+            if entry:
+                results[text] = (entry[0], entry[2])
+                self._count('glossary')
+                continue
+            cached = self.cache.get(self.src, self.dest, text, exact=True) if self.cache else None
+            if cached:
+                results[text] = cached[0]
+                self._count('cached')
+            else:
+                missing.append(text)
+
+        pending = [(batch, executor.submit(self._translate_batch, batch)) for batch in self._batches(missing)]
+        while pending:
+            batch, future = pending.pop(0)
+            try:
+                translated = future.result()
+            except Exception:
+                # Keep going; untranslated segments come back as None
+                self._count('failed', len(batch))
+                translated = [None] * len(batch)
+            if translated is None:
+                # The joined answer did not split back: one request per segment
+                pending += [([text], executor.submit(self._translate_batch, [text])) for text in batch]
+                continue
+            for text, result in zip(batch, translated):
+                results[text] = result
+                if result is not None and self.cache:
+                    self.cache.put(self.src, self.dest, text, [result], exact=True)
+        return [results[text] for text in texts]
+
+    def translate(self, segments):
+        """Yield a (src, text) result, or None on failure, for each segment in order"""
+        segments = iter(segments)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as executor:
+            while True:
+                texts = list(itertools.islice(segments, self.window))
+                if not texts:
+                    return
+                self._count('segments', len(texts))
+                yield from self._translate_window(executor, texts)
+
+
+# Whitespace after sentence-ending punctuation (and a closing quote or
+# bracket), after CJK full stops, and around line breaks
+_SENTENCE_BOUNDARY = re.compile(
+    r'(?:(?<=[.!?\u2026])|(?<=[.!?\u2026]["\'\u201d\u2019)\]]))\s+|(?<=[\u3002\uff01\uff1f])\s*|\s*\n\s*'
+)
+
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _fit(sentence, max_chars):
+    """Cut a sentence longer than max_chars at whitespace, alternating chunks and separators"""
+    pieces = []
+    while len(sentence) > max_chars:
+        spaces = None
+        for spaces in _WHITESPACE.finditer(sentence, 1, max_chars + 1):
+            pass
+        if spaces is None:
+            pieces += [sentence[:max_chars], ""]
+            sentence = sentence[max_chars:]
+        else:
+            end = _WHITESPACE.match(sentence, spaces.start()).end()
+            pieces += [sentence[:spaces.start()], sentence[spaces.start():end]]
+            sentence = sentence[end:]
+    return pieces + [sentence]
+
+
+def split_sentences(text, max_chars=4500):
+    """
+    Split a text into sentences of at most ``max_chars`` characters.
+
+    Returns the pieces of the text, alternating the whitespace between
+    sentences and the sentences themselves: ``pieces[1::2]`` are the
+    sentences and ``"".join(pieces) == text``.
+    """
+    pieces = [text[:len(text) - len(text.lstrip())]]
+    position = len(pieces[0])
+    for match in _SENTENCE_BOUNDARY.finditer(text, position):
+        if match.start() <= position:
+            # Whitespace right after a boundary joins it
+            pieces[-1] += text[position:match.end()]
+        else:
+            pieces += _fit(text[position:match.start()], max_chars) + [match.group()]
+        position = max(position, match.end())
+    rest = text[position:].rstrip()
+    if rest:
+        pieces += _fit(rest, max_chars) + [text[position + len(rest):]]
+    return pieces
+
+
+def translate_text(text, src='auto', dest='en', max_chars=4500, workers=4, **options):
+    """
+    Translate a long text sentence by sentence, returning (src, text).
+
+    Sentences are cached one by one and the missing ones are sent
+    concurrently on ``workers`` threads, one request each, so editing one
+    sentence of a paragraph only sends that sentence again. Each sentence
+    keeps its own detected source language. The translations are put
+    back between the original whitespace. Raises RuntimeError when a
+    sentence could not be translated; the others are cached by then.
+    """
+    pieces = split_sentences(text, max_chars)
+    # Retries are left to the translator's deadline and hedging
+    translator = BatchTranslator(src=src, dest=dest, max_chars=max_chars, workers=workers, rate=0, retries=0,
+                                 pack=False, **options)
+    results = list(translator.translate(pieces[1::2]))
+    failed = sum(result is None for result in results)
+    if failed:
+        raise RuntimeError(f"{failed} of {len(results)} sentences could not be translated")
+    pieces[1::2] = [translation for _, translation in results]
+    sources = Counter(source for source, _ in results)
+    return sources.most_common(1)[0][0] if sources else src, "".join(pieces)
+
+
+def translate_lines(translator, infile, outfile):
+    """Translate a file line by line, keeping empty lines and failures as they are"""
+    lines, texts = itertools.tee(line.rstrip("\r\n") for line in infile)
+    for line, result in zip(lines, translator.translate(texts)):
+        outfile.write((result[1] if result else line) + "\n")
+        outfile.flush()
+
+
+def _parse_record(line):
+    """The JSON object of a line, or None when it holds anything else"""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def translate_jsonl(translator, infile, outfile, field='text'):
+    """
+    Translate ``field`` of every JSON object, adding 'translation' and 'src'.
+
+    Lines that are not JSON objects are kept as they are.
+    """
+    entries, texts = itertools.tee((line.rstrip("\r\n"), _parse_record(line)) for line in infile if line.strip())
+    results = translator.translate('' if record is None else str(record.get(field, '')) for _, record in texts)
+    for (line, record), result in zip(entries, results):
+        if record is not None:
+            if result:
+                record['src'], record['translation'] = result
+            else:
+                record['translation'] = None
+            line = json.dumps(record, ensure_ascii=False)
+        outfile.write(line + "\n")
+        outfile.flush()
+
+
+_PO_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', '\\': '\\'}
+
+
+def po_unescape(value):
+    """Decode the contents of a quoted .po string"""
+    return re.sub(r'\\(.)', lambda m: _PO_ESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def po_escape(value):
+    """Encode a string for a quoted .po line"""
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n').replace('\t', '\\t').replace('\r', '\\r')
+    )
+
+
+class PoEntry:
+    """One blank-line separated block of a .po file"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.fields = {}
+        self.flags = set()
+        current = None
+        for line in lines:
+            if line.startswith('#,'):
+                self.flags.update(flag.strip() for flag in line[2:].split(','))
+            elif line.startswith('#'):
+                current = None
+            elif line.startswith('"') and current:
+                self.fields[current] += po_unescape(line.strip()[1:-1])
+            elif ' ' in line:
+                current, value = line.split(' ', 1)
+                self.fields[current] = po_unescape(value.strip()[1:-1])
+
+    @property
+    def msgid(self):
+        return self.fields.get('msgid', '')
+
+    @property
+    def translatable(self):
+        """Singular, non-header entries; plural and obsolete ones are left alone"""
+        return bool(self.msgid) and 'msgid_plural' not in self.fields and 'msgstr' in self.fields
+
+    @property
+    def untranslated(self):
+        return self.translatable and (not self.fields['msgstr'] or 'fuzzy' in self.flags)
+
+    def with_msgstr(self, msgstr, fuzzy=False):
+        """Return the block's lines with msgstr replaced"""
+        lines = []
+        flags = set(self.flags)
+        if fuzzy:
+            flags.add('fuzzy')
+        else:
+            flags.discard('fuzzy')
+        in_msgstr = False
+        for line in self.lines:
+            if line.startswith('#,'):
+                continue
+            if line.startswith('msgstr '):
+                in_msgstr = True
+                lines.append(f'msgstr "{po_escape(msgstr)}"')
+                continue
+            if in_msgstr and line.startswith('"'):
+                continue
+            in_msgstr = False
+            lines.append(line)
+        if flags:
+            # Flags go right before msgctxt/msgid, after the other comments
+            index = next(i for i, line in enumerate(lines) if not line.startswith('#'))
+            lines.insert(index, '#, ' + ', '.join(sorted(flags)))
+        return lines
+
+
+def read_po(infile):
+    """Yield the entries of a .po file one block at a time"""
+    block = []
+    for line in infile:
+        line = line.rstrip("\r\n")
+        if line.strip():
+            block.append(line)
+        elif block:
+            yield PoEntry(block)
+            block = []
+    if block:
+        yield PoEntry(block)
+
+
+def translate_po(translator, infile, outfile, fuzzy=False, retranslate_fuzzy=False):
+    """Fill empty msgstr (and optionally fuzzy ones) of a .po file, streaming"""
+
+    def needs_translation(entry):
+        if retranslate_fuzzy:
+            return entry.untranslated
+        return entry.translatable and not entry.fields['msgstr']
+
+    entries, pending = itertools.tee(read_po(infile))
+    results = translator.translate(entry.msgid for entry in pending if needs_translation(entry))
+
+    first = True
+    for entry in entries:
+        lines = entry.lines
+        if needs_translation(entry):
+            result = next(results)
+            if result:
+                lines = entry.with_msgstr(result[1], fuzzy=fuzzy)
+        if not first:
+            outfile.write("\n")
+        outfile.write("\n".join(lines) + "\n")
+        outfile.flush()
+        first = False
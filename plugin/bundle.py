@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Startup-optimized plugin packages.
+
+Flow Launcher starts a new interpreter for every query that the resident
+backend does not take, so the installed plugin pays for finding, reading
+and compiling its modules each time. An optimized build:
+
+- traces which modules of ``lib/`` the plugin actually imports, by running
+  its commands under ``python -S -X importtime`` against a local stand-in
+  for Google, and drops the rest together with dist-info, tests and caches;
+- compiles the plugin and ``lib/`` ahead of time with the target Python, as
+  unchecked-hash .pyc files that are never re-validated against the source;
+- optionally packs the pure-Python packages of ``lib/`` into ``lib.zip``,
+  one archive read instead of hundreds of directory lookups;
+- checks that the result answers every traced command exactly like the
+  unoptimized tree, and measures both.
+
+Used by ``python commands.py build --optimized``.
+"""
+
+import fnmatch
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+
+# Commands traced for imports; they cover every module path of a query
+TRACE_QUERIES = (
+    "", "list", "list deutsch", "set fr", "set fren", "cache", "stats",
+    "hello world", "fr hello world", "de en guten morgen", "fr,de good morning", "* good evening",
+)
+
+# Their results depend on the state of the plugin folder, not on the build
+UNSTABLE_QUERIES = ("cache", "stats")
+
+# Never needed at runtime
+PRUNED_DIRS = {"__pycache__", "tests", "test", "bin"}
+PRUNED_SUFFIXES = (".dist-info", ".egg-info", ".pyi", ".pth")
+PRUNED_FILES = {"py.typed"}
+
+CODE_SUFFIXES = (".py", ".pyc", ".so", ".pyd")
+
+# Compiles (source, name shown in tracebacks, legacy layout) jobs read from stdin
+COMPILE_SCRIPT = """\
+import importlib.util, json, py_compile, sys
+for source, dfile, legacy in json.load(sys.stdin):
+    cfile = source + "c" if legacy else importlib.util.cache_from_source(source, optimization="")
+    py_compile.compile(source, cfile=cfile, dfile=dfile, doraise=True, optimize=int(sys.argv[1]),
+                       invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+print(sys.implementation.cache_tag)
+"""
+
+
+class BuildError(Exception):
+    """The optimized build could not be made or does not behave like the source"""
+
+
+def ignored(relative, patterns):
+    """Whether a path relative to the plugin matches a .buildignore pattern, as 'zip -x' would"""
+    return any(fnmatch.fnmatch(relative, pattern) for pattern in patterns)
+
+
+def stage_tree(source, target, patterns):
+    """Copy the plugin without the ignored files"""
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        for name in sorted(files):
+            path = Path(root) / name
+            relative = path.relative_to(source).as_posix()
+            if ignored(relative, patterns):
+                continue
+            destination = target / relative
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(str(path), str(destination))
+
+
+def point_at(plugin_dir, host):
+    """Settings of a scratch copy: the fake endpoint, no debouncing, no metrics file"""
+    (plugin_dir / "user_settings.ini").write_text(
+        "[Translation]\ndefault_language = en\ndefault_language_name = English\n\n"
+        f"[Network]\nservice_urls = http://{host}\n\n"
+        "[Debounce]\nquiet_period = 0\n\n"
+        "[Metrics]\nenabled = false\n",
+        encoding="utf-8",
+    )
+
+
+def run_query(plugin_dir, python, query, importtime=False):
+    """Run main.py once the way Flow Launcher does, without site-packages"""
+    env = dict(os.environ)
+    env["DIRECTTRANSLATE_NO_DAEMON"] = "1"
+    command = [python, "-S", "-E"] + (["-X", "importtime"] if importtime else [])
+    request = json.dumps({"method": "query", "parameters": [query]})
+    start = time.perf_counter()
+    proc = subprocess.run(
+        command + [str(plugin_dir / "main.py"), request],
+        cwd=str(plugin_dir), env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, encoding="utf-8",
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode:
+        error = proc.stderr.strip().splitlines()[-1:] or [f"exit status {proc.returncode}"]
+        raise BuildError(f"{query or 'help'!r} failed: {error[0]}")
+    return elapsed, proc.stdout, proc.stderr
+
+
+def imported_modules(stderr):
+    """Module names listed by -X importtime"""
+    modules = set()
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "self [us]" not in line:
+            modules.add(line.rsplit("|", 1)[1].strip())
+    return modules
+
+
+def trace(plugin_dir, python, queries=TRACE_QUERIES):
+    """Run the traced commands, returning (imported modules, output of each command)"""
+    modules, outputs = set(), {}
+    for query in queries:
+        _, output, stderr = run_query(plugin_dir, python, query, importtime=True)
+        modules |= imported_modules(stderr)
+        outputs[query] = output
+    return modules, outputs
+
+
+def module_file(lib, name):
+    """The file of lib/ that an imported module was loaded from, if any"""
+    parts = name.split(".")
+    base = lib.joinpath(*parts)
+    for candidate in (base / "__init__.py", base.with_name(parts[-1] + ".py")):
+        if candidate.is_file():
+            return candidate
+    if base.parent.is_dir():
+        for candidate in base.parent.glob(parts[-1] + ".*"):
+            if candidate.suffix in (".so", ".pyd") and candidate.is_file():
+                return candidate
+    return None
+
+
+def prune_lib(lib, modules):
+    """Delete what the plugin never loads from lib/, returning (files, bytes) removed"""
+    keep = {path for path in (module_file(lib, name) for name in modules) if path}
+    packages = {path.relative_to(lib).parts[0] for path in keep}
+    removed = size = 0
+    for path in sorted(lib.rglob("*")):
+        if not path.is_file():
+            continue
+        parts = path.relative_to(lib).parts
+        if (
+            any(part in PRUNED_DIRS or part.endswith(PRUNED_SUFFIXES) for part in parts)
+            or path.name in PRUNED_FILES
+            or parts[0] not in packages
+            or (path.suffix in CODE_SUFFIXES and path not in keep)
+        ):
+            removed += 1
+            size += path.stat().st_size
+            path.unlink()
+    for path in sorted(lib.rglob("*"), reverse=True):
+        if path.is_dir() and not any(path.iterdir()):
+            path.rmdir()
+    return removed, size
+
+
+def compile_tree(plugin_dir, sources, python, optimize):
+    """
+    Precompile ``(path, legacy)`` sources with the target Python.
+
+    With ``legacy`` the .pyc goes next to its source, the only layout that
+    is imported from zip archives or without the source.
+    """
+    jobs = [[str(path), path.relative_to(plugin_dir).as_posix(), legacy] for path, legacy in sources]
+    proc = subprocess.run(
+        [python, "-S", "-E", "-c", COMPILE_SCRIPT, str(optimize)],
+        input=json.dumps(jobs), stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+    )
+    if proc.returncode:
+        raise BuildError(f"compiling with {python} failed: {proc.stderr.strip()}")
+    return len(jobs), proc.stdout.strip()
+
+
+def top_level(lib):
+    """Top-level modules and packages of lib/ with their files"""
+    entries = {}
+    for path in sorted(lib.iterdir()):
+        name = path.name.split(".")[0]
+        files = [path] if path.is_file() else sorted(p for p in path.rglob("*") if p.is_file())
+        entries.setdefault(name, []).extend(files)
+    return entries
+
+
+def zippable(lib):
+    """
+    The pure-Python entries of lib/.
+
+    Packages with data files or extension modules stay in lib/, where they
+    can open their files and be loaded.
+    """
+    return {
+        name: files for name, files in top_level(lib).items()
+        if files and all(path.suffix in (".py", ".pyc") for path in files)
+    }
+
+
+def zip_lib(lib, entries):
+    """Move entries of lib/ into lib.zip next to it"""
+    with zipfile.ZipFile(str(lib.with_name(lib.name + ".zip")), "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, files in sorted(entries.items()):
+            for path in files:
+                if path.exists():
+                    zf.write(str(path), path.relative_to(lib).as_posix())
+                    path.unlink()
+    for path in sorted(lib.rglob("*"), reverse=True):
+        if path.is_dir() and not any(path.iterdir()):
+            path.rmdir()
+
+
+def strip_sources(sources):
+    """Delete the sources compiled next to themselves"""
+    for path, legacy in sources:
+        if legacy:
+            path.unlink()
+
+
+def write_zip(plugin_dir, path):
+    path.unlink(missing_ok=True)
+    with zipfile.ZipFile(str(path), "w", zipfile.ZIP_DEFLATED) as zf:
+        for file in sorted(p for p in plugin_dir.rglob("*") if p.is_file()):
+            zf.write(str(file), file.relative_to(plugin_dir).as_posix())
+    return path.stat().st_size
+
+
+def installed_size(plugin_dir):
+    return sum(path.stat().st_size for path in plugin_dir.rglob("*") if path.is_file())
+
+
+def cold_start(archive, workdir, python, host, repeat):
+    """
+    Install a package into an empty folder and time main.py.
+
+    The first query after installation pays for everything that is not
+    shipped precompiled; the median of the following ones is what every
+    later query costs. Returns {command: (first s, median s)}.
+    """
+    plugin_dir = Path(tempfile.mkdtemp(dir=str(workdir)))
+    with zipfile.ZipFile(str(archive)) as zf:
+        zf.extractall(str(plugin_dir))
+    point_at(plugin_dir, host)
+    timings = {}
+    for name, query in (("help", ""), ("translate", "fr hello world")):
+        runs = []
+        for i in range(repeat + 1):
+            # A new text each time, so every translation goes to the network
+            runs.append(run_query(plugin_dir, python, f"{query} {i}" if query else query)[0])
+        timings[name] = (runs[0], statistics.median(runs[1:]))
+    return timings
+
+
+def build_optimized(patterns, output, python=sys.executable, optimize=2, sourceless=False, zip_lib_=False,
+                    repeat=10):
+    """
+    Build ``output`` from the plugin folder and compare it with a plain build.
+
+    Sources are kept by default: the .pyc files then only speed up the
+    Python they were compiled for, and any other version falls back to the
+    sources. ``sourceless`` drops them for a smaller package that only runs
+    on the target Python.
+    """
+    sys.path.insert(0, str(basedir))
+    from benchmarks.fake_google import FakeGoogleServer
+
+    if not any((basedir / "lib").glob("*")):
+        raise BuildError("lib/ is empty, run 'python commands.py setup-env-to-lib' first")
+
+    server = FakeGoogleServer().start()
+    workdir = Path(tempfile.mkdtemp(prefix="directtranslate-build-"))
+    try:
+        raw = workdir / "raw"
+        stage_tree(basedir, raw, patterns)
+        raw_zip = workdir / "raw.zip"
+        raw_size = write_zip(raw, raw_zip)
+        raw_installed = installed_size(raw)
+
+        # Traced in a scratch copy, which writes caches and settings of its own
+        scratch = workdir / "trace"
+        shutil.copytree(str(raw), str(scratch))
+        point_at(scratch, server.host)
+        modules, expected = trace(scratch, python)
+
+        optimized = workdir / "optimized"
+        shutil.copytree(str(raw), str(optimized))
+        lib = optimized / "lib"
+        pruned, pruned_bytes = prune_lib(lib, modules)
+        packed = zippable(lib) if zip_lib_ else {}
+        packed_files = {path for files in packed.values() for path in files}
+        sources = [
+            (path, sourceless or path in packed_files)
+            for root in (optimized / "plugin", lib)
+            for path in sorted(root.rglob("*.py"))
+        ]
+        compiled, cache_tag = compile_tree(optimized, sources, python, optimize)
+        for files in packed.values():
+            files.extend(path.with_suffix(".pyc") for path in files if path.suffix == ".py")
+        if sourceless:
+            strip_sources(sources)
+        if packed:
+            zip_lib(lib, packed)
+        size = write_zip(optimized, output)
+
+        # The package as installed must answer exactly like the source tree
+        check = workdir / "check"
+        with zipfile.ZipFile(str(output)) as zf:
+            zf.extractall(str(check))
+        installed = installed_size(check)
+        point_at(check, server.host)
+        _, outputs = trace(check, python)
+        for query in TRACE_QUERIES:
+            if query not in UNSTABLE_QUERIES and outputs[query] != expected[query]:
+                raise BuildError(f"{query or 'help'!r} answers differently after the build")
+
+        return {
+            "cache_tag": cache_tag,
+            "modules": len([name for name in modules if module_file(raw / "lib", name)]),
+            "pruned": pruned,
+            "pruned_bytes": pruned_bytes,
+            "compiled": compiled,
+            "zipped": sorted(packed),
+            "size": (raw_size, size),
+            "installed": (raw_installed, installed),
+            "cold_start": (
+                cold_start(raw_zip, workdir, python, server.host, repeat),
+                cold_start(output, workdir, python, server.host, repeat),
+            ),
+        }
+    finally:
+        server.shutdown()
+        shutil.rmtree(str(workdir), ignore_errors=True)
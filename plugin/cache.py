@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from plugin.settings_manager import settings_manager
+
+
+# Starts the keys of exact entries, which no typed query does
+EXACT_PREFIX = "\x00"
+
+
+def normalize_query(query):
+    """Normalize a query for use as a cache key"""
+    return " ".join(query.split()).casefold()
+
+
+def cache_key(query, exact=False):
+    """
+    Key of a query in the cache.
+
+    Queries typed in the launcher share an entry regardless of case and
+    spacing; exact keys keep the text as is (batch and .po segments, where
+    "File" and "FILE" are distinct strings) and never match a typed query.
+    """
+    return EXACT_PREFIX + query if exact else normalize_query(query)
+
+
+class TranslationCache:
+    """Persistent SQLite cache of translation results with LRU and TTL eviction"""
+
+    def __init__(self, path=None, max_entries=None, ttl=None):
+        self.path = Path(path) if path else Path(__file__).parent.parent / "translation_cache.sqlite3"
+        self.max_entries = max_entries if max_entries is not None else \
+            settings_manager.get_int('Cache', 'max_entries', 5000)
+        self.ttl = ttl if ttl is not None else \
+            settings_manager.get_float('Cache', 'ttl_days', 30) * 86400
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        """Open the database on first use so that uncached commands never touch it"""
+        # SQLite connections cannot be shared between the daemon's threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(str(self.path), timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS translations (
+                    src TEXT NOT NULL,
+                    dest TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL,
+                    UNIQUE (src, dest, query)
+                );
+                CREATE INDEX IF NOT EXISTS translations_accessed ON translations (accessed);
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS history (
+                    src TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    uses INTEGER NOT NULL,
+                    used REAL NOT NULL,
+                    PRIMARY KEY (src, query)
+                );
+                CREATE INDEX IF NOT EXISTS history_used ON history (used);
+                """
+            )
+        return conn
+
+    def _count(self, name, value=1):
+        self.conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            (name, value),
+        )
+
+    def count(self, name, value=1):
+        """Add to a persistent counter shown by 'tr cache'"""
+        try:
+            self._count(name, value)
+        except sqlite3.Error:
+            pass
+
+    def get(self, src, dest, query, exact=False):
+        """Return the cached list of (src, text) results, or None on a miss"""
+        try:
+            return self._get(src, dest, query, exact)
+        except sqlite3.Error:
+            # A locked or corrupt cache must never block a translation
+            return None
+
+    def _get(self, src, dest, query, exact=False):
+        key = (src, dest, cache_key(query, exact))
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT result, created FROM translations WHERE src = ? AND dest = ? AND query = ?",
+            key,
+        ).fetchone()
+
+        if row is None or (self.ttl > 0 and now - row[1] > self.ttl):
+            if row is not None:
+                self.conn.execute(
+                    "DELETE FROM translations WHERE src = ? AND dest = ? AND query = ?", key
+                )
+            self._count('misses')
+            return None
+
+        self.conn.execute(
+            "UPDATE translations SET accessed = ? WHERE src = ? AND dest = ? AND query = ?",
+            (now,) + key,
+        )
+        self._count('hits')
+        return [tuple(result) for result in json.loads(row[0])]
+
+    def contains(self, src, dest, query):
+        """Check for a fresh entry without touching the counters or the LRU order"""
+        try:
+            row = self.conn.execute(
+                "SELECT created FROM translations WHERE src = ? AND dest = ? AND query = ?",
+                (src, dest, normalize_query(query)),
+            ).fetchone()
+        except sqlite3.Error:
+            return False
+        return row is not None and not (self.ttl > 0 and time.time() - row[0] > self.ttl)
+
+    def get_prefix(self, src, dest, query, min_length=3, max_candidates=64):
+        """
+        Return ``(prefix, results)`` for the longest cached prefix of the query.
+
+        Lookups go through the (src, dest, query) index and do not touch the
+        hit/miss counters or the LRU order. Returns None when nothing matches.
+        """
+        query = normalize_query(query)
+        prefixes = [query[:i] for i in range(len(query) - 1, min_length - 1, -1)][:max_candidates]
+        if not prefixes:
+            return None
+
+        try:
+            row = self.conn.execute(
+                "SELECT query, result, created FROM translations WHERE src = ? AND dest = ? "
+                f"AND query IN ({', '.join('?' * len(prefixes))}) "
+                "ORDER BY length(query) DESC LIMIT 1",
+                [src, dest] + prefixes,
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+
+        if row is None or (self.ttl > 0 and time.time() - row[2] > self.ttl):
+            return None
+        return row[0], [tuple(result) for result in json.loads(row[1])]
+
+    def put(self, src, dest, query, results, exact=False):
+        """Store a list of (src, text) results and evict the least recently used entries"""
+        try:
+            self._put(src, dest, query, results, exact)
+        except sqlite3.Error:
+            pass
+
+    def _put(self, src, dest, query, results, exact=False):
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO translations (src, dest, query, result, created, accessed) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (src, dest, cache_key(query, exact), json.dumps(results, ensure_ascii=False), now, now),
+        )
+
+        overflow = self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM translations WHERE rowid IN "
+                "(SELECT rowid FROM translations ORDER BY accessed LIMIT ?)",
+                (overflow,),
+            )
+            self._count('evictions', overflow)
+
+    def record_query(self, src, query, max_entries=1000, max_age=None):
+        """Count a query translated to the default language, keeping the ``max_entries`` most recently used"""
+        try:
+            self.conn.execute(
+                "INSERT INTO history (src, query, text, uses, used) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT (src, query) DO UPDATE SET "
+                "text = excluded.text, uses = uses + 1, used = excluded.used",
+                (src, normalize_query(query), " ".join(query.split()), time.time()),
+            )
+            # Counting goes through the history_used index; once full, each
+            # new query forgets the least recently used and the expired ones
+            overflow = self.conn.execute("SELECT COUNT(*) FROM history").fetchone()[0] - max_entries
+            if overflow > 0:
+                self._prune_history(overflow, max_age)
+        except sqlite3.Error:
+            pass
+
+    def _prune_history(self, overflow, max_age=None):
+        if max_age:
+            overflow -= self.conn.execute(
+                "DELETE FROM history WHERE used < ?", (time.time() - max_age,)
+            ).rowcount
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM history WHERE rowid IN (SELECT rowid FROM history ORDER BY used LIMIT ?)",
+                (overflow,),
+            )
+
+    def frequent_queries(self, limit, max_age=None):
+        """Return the (src, query) of the most used recent queries, as last typed, forgetting older ones"""
+        since = time.time() - max_age if max_age else 0
+        try:
+            self.conn.execute("DELETE FROM history WHERE used < ?", (since,))
+            return self.conn.execute(
+                "SELECT src, text FROM history WHERE used >= ? ORDER BY uses DESC, used DESC LIMIT ?",
+                (since, limit),
+            ).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def stats(self):
+        """Return entry count, counters and on-disk size, or None when the database cannot be read"""
+        try:
+            return self._stats()
+        except (sqlite3.Error, OSError):
+            return None
+
+    def _stats(self):
+        counters = dict(self.conn.execute("SELECT name, value FROM counters"))
+        stats = {
+            'entries': self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0],
+            'max_entries': self.max_entries,
+            'hits': counters.get('hits', 0),
+            'misses': counters.get('misses', 0),
+            'evictions': counters.get('evictions', 0),
+            'debounce_sent': counters.get('debounce_sent', 0),
+            'debounce_suppressed': counters.get('debounce_suppressed', 0),
+            'provisional_shown': counters.get('provisional_shown', 0),
+            'pending_shown': counters.get('pending_shown', 0),
+            'detect_local': counters.get('detect_local', 0),
+            'detect_remote': counters.get('detect_remote', 0),
+            'glossary_hits': counters.get('glossary_hits', 0),
+            'memory_suggestions': counters.get('memory_suggestions', 0),
+            'hedges': counters.get('hedges', 0),
+            'hedge_wins': counters.get('hedge_wins', 0),
+            'breaker_trips': counters.get('breaker_trips', 0),
+            'deadline_exceeded': counters.get('deadline_exceeded', 0),
+            'prewarmed': counters.get('prewarmed', 0),
+            'shared_hits': counters.get('shared_hits', 0),
+            'shared_misses': counters.get('shared_misses', 0),
+            'shared_puts': counters.get('shared_puts', 0),
+            'shared_errors': counters.get('shared_errors', 0),
+            'size': sum(p.stat().st_size for p in self.path.parent.glob(self.path.name + "*")),
+        }
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Remove all entries, the query history and reset the counters"""
+        self.conn.execute("DELETE FROM translations")
+        self.conn.execute("DELETE FROM history")
+        self.conn.execute("DELETE FROM counters")
+        self.conn.execute("VACUUM")
+
+
+# Global translation cache instance
+translation_cache = TranslationCache()
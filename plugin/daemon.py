@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Resident translation backend.
+
+``main.py`` forwards each JSON-RPC request to a long-lived process over a
+local socket (a named pipe on Windows) so that queries stop paying for
+interpreter start, imports and a cold ``Translator``. The daemon is spawned
+on the first query and exits by itself after ``idle_timeout`` seconds.
+Once idle for ``[Prewarm] idle_after`` seconds, it prewarms the cache with
+frequent queries (see ``plugin/prewarm.py``).
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from plugin.settings_manager import settings_manager
+
+basedir = Path(__file__).resolve().parent.parent
+key_path = basedir / ".daemon_key"
+spawn_marker_path = basedir / ".daemon_spawned"
+
+# One daemon per plugin install
+_instance = hashlib.md5(str(basedir).encode("utf-8")).hexdigest()[:12]
+if sys.platform == "win32":
+    ADDRESS = rf"\\.\pipe\DirectTranslate-{_instance}"
+else:
+    ADDRESS = os.path.join(tempfile.gettempdir(), f"DirectTranslate-{_instance}.sock")
+
+# Seconds to wait before spawning again while a daemon is still starting
+SPAWN_GRACE = 10
+
+# Seconds the daemon gets beyond [Translation] query_budget to answer,
+# and the wait when there is no budget
+REPLY_MARGIN = 1.0
+REPLY_TIMEOUT = 10
+
+
+def is_enabled():
+    """Check whether the resident backend is switched on in user_settings.ini"""
+    if os.environ.get("DIRECTTRANSLATE_NO_DAEMON"):
+        return False
+    return settings_manager.get_boolean('Daemon', 'enabled', False)
+
+
+def get_authkey():
+    """Read the per-install secret, creating it on first use"""
+    if not key_path.exists():
+        fd = os.open(str(key_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(os.urandom(32))
+    return key_path.read_bytes()
+
+
+def spawn():
+    """Start the daemon in the background unless one was started moments ago"""
+    try:
+        if time.time() - spawn_marker_path.stat().st_mtime < SPAWN_GRACE:
+            return
+    except OSError:
+        pass
+    spawn_marker_path.touch()
+
+    import subprocess
+
+    kwargs = {}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+
+    subprocess.Popen(
+        [sys.executable, str(basedir / "main.py"), "--daemon"],
+        cwd=str(basedir),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        close_fds=True,
+        **kwargs,
+    )
+
+
+def reply_timeout():
+    """Seconds to wait for the daemon's answer, which it sends once query_budget has passed"""
+    budget = settings_manager.get_float('Translation', 'query_budget', 2.0)
+    return budget + REPLY_MARGIN if budget > 0 else REPLY_TIMEOUT
+
+
+def forward(request, timeout=None):
+    """
+    Send a JSON-RPC request to the daemon and return ``(True, output)``.
+
+    Returns ``(False, None)`` when the daemon is disabled, not reachable or
+    does not answer within ``timeout`` (by default ``reply_timeout()``), in
+    which case the caller handles the request in-process.
+    """
+    if not is_enabled():
+        return False, None
+    if timeout is None:
+        timeout = reply_timeout()
+
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Client
+
+    try:
+        conn = Client(ADDRESS, authkey=get_authkey())
+    except AuthenticationError:
+        # A daemon started with an earlier key holds the address until it
+        # idles out
+        return False, None
+    except OSError:
+        spawn()
+        return False, None
+
+    try:
+        conn.send(request)
+        if not conn.poll(timeout):
+            return False, None
+        return True, conn.recv()
+    except (OSError, EOFError, AuthenticationError):
+        return False, None
+    finally:
+        conn.close()
+
+
+def serve():
+    """Run the daemon loop until it has been idle for ``idle_timeout`` seconds"""
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Client, Listener
+
+    authkey = get_authkey()
+
+    # Another daemon won the race to start, or one started with an earlier
+    # key still holds the address
+    try:
+        Client(ADDRESS, authkey=authkey).close()
+        return
+    except AuthenticationError:
+        return
+    except OSError:
+        pass
+    if sys.platform != "win32" and os.path.exists(ADDRESS):
+        os.unlink(ADDRESS)
+
+    import threading
+
+    from plugin import metrics
+    from plugin.ui import Main
+
+    Main.resident = True
+    Main.warm_up()
+
+    from plugin import prewarm
+
+    idle_timeout = settings_manager.get_float('Daemon', 'idle_timeout', 600)
+    prewarm_after = settings_manager.get_float('Prewarm', 'idle_after', 60)
+    lock = threading.Lock()
+    # Prewarming runs once per idle period, so queries typed since are included
+    state = {'active': 0, 'last_activity': time.monotonic(), 'prewarmed': False}
+
+    def watchdog():
+        while True:
+            time.sleep(min(idle_timeout, 5))
+            with lock:
+                idle = 0 if state['active'] else time.monotonic() - state['last_activity']
+                if idle > idle_timeout and not prewarm.is_running():
+                    if sys.platform != "win32":
+                        try:
+                            os.unlink(ADDRESS)
+                        except OSError:
+                            pass
+                    os._exit(0)
+                if 0 < prewarm_after < idle and not state['prewarmed'] and not prewarm.is_running():
+                    state['prewarmed'] = True
+                    prewarm.start()
+
+    def handle(conn):
+        # Requests are handled concurrently so a newer keystroke can
+        # supersede one that is still waiting out the debounce period
+        with conn:
+            try:
+                request = conn.recv()
+                metrics.begin(resident=True)
+                conn.send(Main.handle(request))
+            except Exception:
+                pass
+        metrics.end()
+        with lock:
+            state['active'] -= 1
+            state['last_activity'] = time.monotonic()
+            state['prewarmed'] = False
+
+    threading.Thread(target=watchdog, daemon=True).start()
+
+    with Listener(ADDRESS, authkey=authkey) as listener:
+        if sys.platform != "win32":
+            os.chmod(ADDRESS, 0o600)
+        spawn_marker_path.unlink(missing_ok=True)
+
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception:
+                # Failed handshakes, e.g. of a client with another key
+                # (AuthenticationError), must not take the daemon down
+                continue
+
+            with lock:
+                state['active'] += 1
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
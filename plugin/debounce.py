@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Keystroke debouncing.
+
+Flow Launcher sends a query for every character typed. Each query stamps a
+token into a small state file shared by all plugin processes (and daemon
+threads); before going to the network it waits for ``quiet_period`` and
+gives up if a newer query has stamped the file in the meantime.
+"""
+
+import itertools
+import os
+import time
+from pathlib import Path
+
+from plugin.settings_manager import settings_manager
+
+_sequence = itertools.count()
+
+
+class Debouncer:
+    """Coalesces bursts of queries so only the settled one is translated"""
+
+    def __init__(self, path=None, quiet_period=None, min_query_length=None):
+        self.path = Path(path) if path else Path(__file__).parent.parent / ".last_query"
+        self.quiet_period = quiet_period if quiet_period is not None else \
+            settings_manager.get_float('Debounce', 'quiet_period', 0.15)
+        self.min_query_length = min_query_length if min_query_length is not None else \
+            settings_manager.get_int('Debounce', 'min_query_length', 1)
+
+    def begin(self):
+        """Mark a new query as the latest one and return its token"""
+        token = f"{os.getpid()}:{next(_sequence)}:{time.time_ns()}"
+        try:
+            self.path.write_text(token, encoding='utf-8')
+        except OSError:
+            pass
+        return token
+
+    def is_current(self, token):
+        """Check that no newer query has started since ``token``"""
+        try:
+            return self.path.read_text(encoding='utf-8') == token
+        except OSError:
+            # Without a readable state file nothing can be suppressed
+            return True
+
+    def settle(self, token):
+        """Wait for the quiet period and report whether the query is still the latest"""
+        if self.quiet_period > 0:
+            time.sleep(self.quiet_period)
+        return self.is_current(token)
+
+    def too_short(self, query):
+        """Check whether a query is below the minimum length worth translating"""
+        return len(query.strip()) < self.min_query_length
+
+
+# Global debouncer instance
+debouncer = Debouncer()
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Offline language detection.
+
+Text written in a script used by a single language (Hangul, kana, Thai,
+Greek, ...) is resolved from the script alone. Otherwise the text is scored
+with a naive Bayes model over character 1-3 grams, restricted to the
+languages written in the text's dominant script. The model lives in
+``detector.bin`` as flat ``array`` tables and is built with
+``python commands.py build-detector`` from langdetect's language profiles.
+
+Callers use the confidence to decide whether the network detector is
+still needed. The model knows 55 of the languages Google Translate
+supports, so an n-gram answer is only confident with enough text, without
+letters the language never uses, and for a language that none of the
+missing ones passes for.
+"""
+
+import json
+import math
+import unicodedata
+from array import array
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+model_path = Path(__file__).resolve().parent / "detector.bin"
+
+MAGIC = b"DTLD1\n"
+
+# Scripts written by a single language Google Translate supports
+SCRIPT_LANGUAGES = {
+    'HANGUL': 'ko',
+    'HIRAGANA': 'ja',
+    'KATAKANA': 'ja',
+    'THAI': 'th',
+    'LAO': 'lo',
+    'KHMER': 'km',
+    'MYANMAR': 'my',
+    'GEORGIAN': 'ka',
+    'ARMENIAN': 'hy',
+    'SINHALA': 'si',
+    'ETHIOPIC': 'am',
+    'ORIYA': 'or',
+    'GURMUKHI': 'pa',
+    'GUJARATI': 'gu',
+    'TAMIL': 'ta',
+    'TELUGU': 'te',
+    'KANNADA': 'kn',
+    'MALAYALAM': 'ml',
+    'GREEK': 'el',
+}
+
+# Script fast-path answers that other languages share occasionally
+SCRIPT_CONFIDENCE = 0.95
+
+# Default [Detection] min_confidence: closely related languages the model
+# knows (Russian, Ukrainian and Bulgarian; Hindi and Nepali; simplified
+# and traditional Chinese) score up to about 0.65 for one another
+MIN_CONFIDENCE = 0.7
+
+# Words an n-gram answer needs (characters for Han, written without
+# spaces); single words score confidently as several languages
+MIN_WORDS = 3
+MIN_HAN_CHARACTERS = 4
+
+# Languages of the model that languages missing from it pass for, in the
+# same alphabet; text detected as one of them is left to Google
+UNMODELLED_LOOKALIKES = {
+    'id': ('ms', 'jw', 'su'),
+    'hr': ('bs', 'sr'),
+    'mk': ('sr',),
+    'iw': ('yi',),
+    'tl': ('ceb',),
+    'sw': ('zu', 'xh', 'sn'),
+    'es': ('gl',),
+    'pt': ('gl',),
+    'nl': ('lb', 'fy'),
+    'af': ('fy',),
+    'so': ('ha',),
+    'vi': ('yo',),
+}
+
+
+@lru_cache(maxsize=4096)
+def char_script(ch):
+    """Return the Unicode script of a letter ('LATIN', 'CYRILLIC', ...), or None"""
+    if not ch.isalpha():
+        return None
+    try:
+        script = unicodedata.name(ch).split(' ', 1)[0]
+    except ValueError:
+        return None
+    if script == 'CJK':
+        return 'HAN'
+    return script
+
+
+def normalize(text):
+    """Lowercase and fold characters the way the language profiles were built"""
+    chars = []
+    for ch in text.lower():
+        if 'Ạ' <= ch <= 'ỿ':
+            # Vietnamese letters share one representative
+            ch = 'ể'
+        elif ch == 'ș':
+            ch = 'ş'
+        elif ch == 'ț':
+            ch = 'ţ'
+        elif ch == 'ی':
+            ch = 'ي'
+        elif not ch.isalpha():
+            ch = ' '
+        chars.append(ch)
+    return ''.join(chars)
+
+
+def extract_ngrams(text, n_max=3):
+    """Character 1..n_max grams of each word, padded with spaces"""
+    grams = []
+    for word in normalize(text).split():
+        padded = f" {word} "
+        for n in range(1, n_max + 1):
+            for i in range(len(padded) - n + 1):
+                gram = padded[i:i + n]
+                if gram.strip() and not (n == 1 and gram == ' '):
+                    grams.append(gram)
+    return grams
+
+
+class Detection:
+    """Detected language with a confidence between 0 and 1"""
+
+    __slots__ = ('lang', 'confidence', 'method')
+
+    def __init__(self, lang, confidence, method):
+        self.lang = lang
+        self.confidence = confidence
+        self.method = method
+
+    def __repr__(self):
+        return f"Detection(lang={self.lang!r}, confidence={self.confidence:.2f}, method={self.method!r})"
+
+
+class NgramModel:
+    """
+    Sparse naive Bayes tables.
+
+    For gram ``g`` the entries ``offsets[g]:offsets[g + 1]`` of ``entry_langs``
+    and ``entry_scores`` hold the languages whose profile contains it and
+    ``log P(g | lang) - floor[lang][n]``; every other language scores the
+    per-length ``floor``.
+    """
+
+    def __init__(self, languages, scripts, floors, grams, offsets, entry_langs, entry_scores):
+        self.languages = languages
+        self.scripts = scripts
+        self.floors = floors
+        self.index = {gram: i for i, gram in enumerate(grams)}
+        self.offsets = offsets
+        self.entry_langs = entry_langs
+        self.entry_scores = entry_scores
+
+    @classmethod
+    def load(cls, path=model_path):
+        data = Path(path).read_bytes()
+        if not data.startswith(MAGIC):
+            raise ValueError(f"{path} is not a language detector model")
+        header_end = data.index(b"\n", len(MAGIC))
+        header = json.loads(data[len(MAGIC):header_end])
+        position = header_end + 1
+
+        def take(typecode, count):
+            nonlocal position
+            table = array(typecode)
+            size = table.itemsize * count
+            table.frombytes(data[position:position + size])
+            position += size
+            return table
+
+        grams = data[position:position + header['grams_size']].decode('utf-8').split('\0')
+        position += header['grams_size']
+        offsets = take('I', len(grams) + 1)
+        entry_langs = take('B', offsets[-1])
+        entry_scores = take('f', offsets[-1])
+        return cls(header['languages'], header['scripts'], header['floors'],
+                   grams, offsets, entry_langs, entry_scores)
+
+    def has_gram(self, gram, lang):
+        """Check whether the profile of a language index contains the gram"""
+        i = self.index.get(gram)
+        if i is None:
+            return False
+        return lang in self.entry_langs[self.offsets[i]:self.offsets[i + 1]]
+
+    def scores(self, grams, candidates):
+        """Log-likelihood of the grams for each candidate language index"""
+        totals = [0.0] * len(self.languages)
+        index, offsets = self.index, self.offsets
+        entry_langs, entry_scores = self.entry_langs, self.entry_scores
+        for gram in grams:
+            i = index.get(gram)
+            if i is None:
+                continue
+            start, end = offsets[i], offsets[i + 1]
+            for lang, score in zip(entry_langs[start:end], entry_scores[start:end]):
+                totals[lang] += score
+
+        lengths = Counter(map(len, grams))
+        return {
+            lang: totals[lang] + sum(self.floors[lang][n - 1] * count for n, count in lengths.items())
+            for lang in candidates
+        }
+
+
+def build_model(profiles_dir, path=model_path, top=600, languages=None):
+    """
+    Compile langdetect JSON profiles into the binary model.
+
+    Keeps the ``top`` most frequent grams of each length per language.
+    """
+    from plugin.languages import LANGUAGES
+
+    profiles = {}
+    for profile_path in sorted(Path(profiles_dir).iterdir()):
+        code = {'he': 'iw'}.get(profile_path.name, profile_path.name)
+        if code not in LANGUAGES or (languages and code not in languages):
+            continue
+        profile = json.loads(profile_path.read_text(encoding='utf-8'))
+        freq = Counter()
+        for gram, count in profile['freq'].items():
+            freq[normalize(gram) if gram.strip() else gram] += count
+        profiles[code] = (freq, profile['n_words'])
+
+    codes = sorted(profiles)
+    scripts, floors, entries = {}, [], {}
+    for lang, code in enumerate(codes):
+        freq, n_words = profiles[code]
+
+        # The script the language's most common letters are written in
+        letters = Counter()
+        for gram, count in freq.items():
+            if len(gram) == 1 and char_script(gram):
+                letters[char_script(gram)] += count
+        scripts[code] = letters.most_common(1)[0][0]
+
+        floor = []
+        for n in (1, 2, 3):
+            kept = Counter({g: c for g, c in freq.items() if len(g) == n and g.strip()}).most_common(top)
+            total = n_words[n - 1] or 1
+            # Unseen grams score half the rarest kept one
+            floor.append(math.log(kept[-1][1] / total / 2) if kept else math.log(1e-7))
+            for gram, count in kept:
+                entries.setdefault(gram, []).append((lang, math.log(count / total) - floor[-1]))
+        floors.append(floor)
+
+    grams = sorted(entries)
+    offsets, entry_langs, entry_scores = array('I', [0]), array('B'), array('f')
+    for gram in grams:
+        for lang, score in entries[gram]:
+            entry_langs.append(lang)
+            entry_scores.append(score)
+        offsets.append(len(entry_langs))
+
+    grams_blob = '\0'.join(grams).encode('utf-8')
+    header = {
+        'languages': codes,
+        'scripts': scripts,
+        'floors': floors,
+        'grams_size': len(grams_blob),
+        'source': 'langdetect language profiles (Apache License 2.0)',
+    }
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b"\n")
+        f.write(grams_blob)
+        for table in (offsets, entry_langs, entry_scores):
+            f.write(table.tobytes())
+    return len(codes), len(grams)
+
+
+class LanguageDetector:
+    """Script fast path in front of the n-gram model, loaded on first use"""
+
+    def __init__(self, path=model_path):
+        self.path = Path(path)
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = NgramModel.load(self.path) if self.path.exists() else False
+        return self._model
+
+    def detect(self, text):
+        """
+        Return a Detection, or None when the text has no letters.
+
+        Guesses the model cannot back up have a confidence of 0.
+        """
+        scripts = Counter(script for script in map(char_script, text) if script)
+        if not scripts:
+            return None
+
+        # Any kana means Japanese, even when Han characters dominate
+        if 'HIRAGANA' in scripts or 'KATAKANA' in scripts:
+            return Detection('ja', SCRIPT_CONFIDENCE, 'script')
+
+        script, count = scripts.most_common(1)[0]
+        share = count / sum(scripts.values())
+        if script in SCRIPT_LANGUAGES:
+            return Detection(SCRIPT_LANGUAGES[script], SCRIPT_CONFIDENCE * share, 'script')
+
+        model = self.model
+        if not model:
+            return None
+        model_script = 'CJK' if script == 'HAN' else script
+        candidates = [
+            lang for lang, code in enumerate(model.languages)
+            if model.scripts[code] in (script, model_script)
+        ]
+        if not candidates:
+            return None
+        if len(candidates) == 1:
+            code = model.languages[candidates[0]]
+            confidence = 0.0 if code in UNMODELLED_LOOKALIKES else SCRIPT_CONFIDENCE * share
+            return Detection(code, confidence, 'script')
+
+        grams = extract_ngrams(text)
+        scores = model.scores(grams, candidates)
+
+        # Naive Bayes is overconfident on correlated grams; temper by their count
+        temperature = max(1.0, len(grams) ** 0.5)
+        best = max(scores.values())
+        weights = {lang: math.exp((score - best) / temperature) for lang, score in scores.items()}
+        lang = max(weights, key=weights.get)
+        code = model.languages[lang]
+        if script == 'HAN':
+            enough = count >= MIN_HAN_CHARACTERS
+        else:
+            words = sum(1 for word in text.split() if any(map(str.isalpha, word)))
+            # A letter the language never uses means another language
+            enough = words >= MIN_WORDS and all(
+                model.has_gram(gram, lang) for gram in set(grams) if len(gram) == 1
+            )
+        if not enough or code in UNMODELLED_LOOKALIKES:
+            return Detection(code, 0.0, 'ngram')
+        return Detection(code, share * weights[lang] / sum(weights.values()), 'ngram')
+
+
+# Global language detector instance
+language_detector = LanguageDetector()
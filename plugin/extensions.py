@@ -2,13 +2,20 @@
 
 import gettext
 
-from plugin.settings import LOCAL, TRANSLATIONS_PATH
+from plugin import settings
+from plugin.settings import TRANSLATIONS_PATH
 
-# localization
-translation = gettext.translation(
-    "messages",
-    TRANSLATIONS_PATH,
-    languages=[LOCAL],
-)
+translation = None
 
-_ = translation.gettext
+
+def _(message):
+    """Localize a message, loading the gettext catalog on first use"""
+    global translation
+    if translation is None:
+        # localization
+        translation = gettext.translation(
+            "messages",
+            TRANSLATIONS_PATH,
+            languages=[settings.LOCAL],
+        )
+    return translation.gettext(message)
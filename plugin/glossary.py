@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Glossaries of fixed translations.
+
+A glossary maps terms of one language pair (product names, UI labels) to
+their translations. Term lists in TSV or CSV are compiled with
+``python commands.py build-glossary`` into ``glossary/<src>_<dest>.gloss``:
+records sorted by their normalized term (casefolded, diacritics removed,
+whitespace collapsed) behind a table of offsets. Lookups binary search
+the memory-mapped file, so only the pages touched are read, whatever the
+size of the glossary.
+"""
+
+import csv
+import json
+import mmap
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+
+from plugin.settings_manager import atomic_write, file_key, settings_manager
+
+glossary_dir = Path(__file__).resolve().parent.parent / "glossary"
+
+MAGIC = b"DTGL1\n"
+SUFFIX = ".gloss"
+
+
+def normalize(text):
+    """Fold case, diacritics and whitespace the way glossary keys are stored"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.casefold().split())
+
+
+def glossary_path(src, dest, directory=glossary_dir):
+    # Language codes contain hyphens ('zh-cn') but never underscores
+    return Path(directory) / f"{src}_{dest}{SUFFIX}"
+
+
+def read_terms(path, source_column=0, target_column=1, skip_header=False):
+    """Yield (term, translation) pairs of a TSV or CSV file; '#' lines are comments"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if Path(path).suffix.lower() == '.csv':
+            rows = csv.reader(f)
+        else:
+            rows = csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+        if skip_header:
+            next(rows, None)
+        for row in rows:
+            if not row or row[0].startswith('#') or len(row) <= max(source_column, target_column):
+                continue
+            term = ' '.join(row[source_column].split())
+            translation = row[target_column].strip()
+            if term and translation:
+                yield term, translation
+
+
+def build_glossary(terms, path, src, dest):
+    """
+    Compile (term, translation) pairs into a glossary file.
+
+    A term listed twice keeps its last translation. Returns the number of
+    entries written.
+    """
+    entries = {}
+    for term, translation in terms:
+        entries[term] = translation
+    records = sorted(
+        ('\0'.join((normalize(term), term, translation)).encode('utf-8') for term, translation in entries.items()),
+        # Keys sort before the term that follows them
+        key=lambda record: record.split(b'\0', 1)[0],
+    )
+
+    offsets = array('Q', [0])
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+
+    header = json.dumps({'src': src, 'dest': dest, 'entries': len(records)}).encode('utf-8') + b"\n"
+    # Align the offset table for the memoryview over it
+    padding = b"\0" * (-(len(MAGIC) + len(header)) % offsets.itemsize)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, b"".join([MAGIC, header, padding, offsets.tobytes()] + records))
+    return len(records)
+
+
+class Glossary:
+    """One memory-mapped glossary file"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a glossary")
+        header_end = self._map.find(b"\n", len(MAGIC))
+        header = json.loads(self._map[len(MAGIC):header_end])
+        self.src = header['src']
+        self.dest = header['dest']
+        self.count = header['entries']
+
+        table_start = header_end + 1
+        table_start += -table_start % 8
+        self._records = table_start + (self.count + 1) * 8
+        self._offsets = memoryview(self._map)[table_start:self._records].cast('Q')
+
+    def __len__(self):
+        return self.count
+
+    def _key(self, i):
+        start = self._records + self._offsets[i]
+        return self._map[start:self._map.find(b'\0', start)]
+
+    def _entry(self, i):
+        start, end = self._records + self._offsets[i], self._records + self._offsets[i + 1]
+        _, term, translation = self._map[start:end].decode('utf-8').split('\0')
+        return term, translation
+
+    def lookup(self, text):
+        """
+        Return the (term, translation) matching the text, or None.
+
+        Among terms that normalize alike, one spelled exactly like the text
+        is preferred.
+        """
+        key = normalize(text).encode('utf-8')
+        if not key:
+            return None
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        exact = ' '.join(text.split())
+        match = None
+        while low < self.count and self._key(low) == key:
+            term, translation = self._entry(low)
+            if term == exact:
+                return term, translation
+            if match is None:
+                match = term, translation
+            low += 1
+        return match
+
+    def close(self):
+        self._offsets.release()
+        self._map.close()
+
+
+class Glossaries:
+    """The compiled glossaries of the glossary directory, opened on first use"""
+
+    # Seconds between checks of the directory for rebuilt glossaries
+    check_interval = 1.0
+
+    def __init__(self, directory=None):
+        self._directory = Path(directory) if directory else None
+        self._lock = threading.Lock()
+        self._pairs = {}
+        self._open = {}
+        self._key = None
+        self._checked = 0.0
+
+    @property
+    def directory(self):
+        if self._directory is None:
+            return glossary_dir.parent / settings_manager.get('Glossary', 'directory', 'glossary')
+        return self._directory
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        directory = self.directory
+        # Building a glossary renames it into place, which changes the directory
+        key = (directory, file_key(directory))
+        if key == self._key:
+            return
+        self._key = key
+        # Maps still in use by a lookup are unmapped once it drops them
+        self._open = {}
+        self._pairs = {}
+        if key[1] is not None:
+            for path in directory.glob('*' + SUFFIX):
+                src, _, dest = path.stem.partition('_')
+                if dest:
+                    self._pairs[src, dest] = path
+
+    def get(self, src, dest):
+        """Return the Glossary of a language pair, or None"""
+        with self._lock:
+            self._refresh()
+            pair = (src, dest)
+            if pair not in self._open:
+                path = self._pairs.get(pair)
+                try:
+                    self._open[pair] = Glossary(path) if path else None
+                except (OSError, ValueError):
+                    self._open[pair] = None
+            return self._open[pair]
+
+    def pairs(self):
+        with self._lock:
+            self._refresh()
+            return sorted(self._pairs)
+
+    def lookup(self, src, dest, text):
+        """
+        Return the (src, term, translation) of a glossary entry for the text, or None.
+
+        With ``src='auto'``, every glossary into ``dest`` is consulted.
+        """
+        if not settings_manager.get_boolean('Glossary', 'enabled', True):
+            return None
+        sources = [src] if src != 'auto' else [pair[0] for pair in self.pairs() if pair[1] == dest]
+        for source in sources:
+            glossary = self.get(source, dest)
+            match = glossary.lookup(text) if glossary else None
+            if match:
+                return (source,) + match
+        return None
+
+
+# Global glossary instance
+glossaries = Glossaries()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Deadlines, hedged requests and circuit breakers for service endpoints.
+
+A call goes to one endpoint. If it has not answered after the recent p95
+latency, the same request is sent to the next endpoint as well (a
+hedge), and whichever answers first wins; a single endpoint is not
+hedged, as a duplicate request to it would only add load. Failed
+attempts move on to the next endpoint while the call's deadline allows.
+Endpoints that keep failing are skipped for a cooldown by their circuit
+breaker.
+
+Attempts run on daemon threads: a request that hangs is abandoned at the
+deadline and never holds up the answer or the exit of the process.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+
+class DeadlineExceeded(TimeoutError):
+    """No endpoint answered within the deadline of a call"""
+
+
+class CircuitBreaker:
+    """
+    Takes an endpoint out after consecutive failures.
+
+    Once the cooldown has passed, a single trial request is let through;
+    it closes the breaker on success and re-opens it on failure.
+    """
+
+    def __init__(self, failures=3, cooldown=30.0):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at = None
+        self.trial = False
+
+    def available(self, now):
+        if self.opened_at is None:
+            return True
+        return not self.trial and now - self.opened_at >= self.cooldown
+
+    def attempt(self, now):
+        if self.opened_at is not None and now - self.opened_at >= self.cooldown:
+            self.trial = True
+
+    def success(self):
+        self.consecutive = 0
+        self.opened_at = None
+        self.trial = False
+
+    def failure(self, now):
+        """Record a failure, returning True when it opens the breaker"""
+        self.consecutive += 1
+        if self.trial or (self.opened_at is None and self.consecutive >= self.failures):
+            self.opened_at = now
+            self.trial = False
+            return True
+        return False
+
+
+class HedgedCaller:
+    """Runs calls against a list of equivalent endpoints"""
+
+    # Successful latencies kept for the hedge delay, and needed before using them
+    window = 200
+    min_samples = 20
+
+    def __init__(self, deadline=5.0, hedge=True, hedge_delay=1.0, hedge_percentile=95,
+                 min_hedge_delay=0.05, max_hedges=1, breaker_failures=3, breaker_cooldown=30.0,
+                 is_failure=None, on_event=None):
+        self.deadline = deadline
+        self.hedge = hedge
+        self.initial_hedge_delay = hedge_delay
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedges = max_hedges
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        # Errors of the request itself (e.g. an invalid language) are not the endpoint's fault
+        self.is_failure = is_failure or (lambda error: True)
+        self.on_event = on_event
+        self.breakers = {}
+        self.latencies = deque(maxlen=self.window)
+        self.stats = Counter()
+        self._events = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _breaker(self, endpoint):
+        breaker = self.breakers.get(endpoint)
+        if breaker is None:
+            breaker = self.breakers[endpoint] = CircuitBreaker(self.breaker_failures, self.breaker_cooldown)
+        return breaker
+
+    def _count(self, name):
+        # Called with the lock held; events are reported from the caller's thread
+        self.stats[name] += 1
+        self._events.append(name)
+
+    def hedge_delay(self):
+        """Seconds to wait for an attempt before hedging it"""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < self.min_samples:
+            return self.initial_hedge_delay
+        p = samples[min(len(samples) - 1, len(samples) * self.hedge_percentile // 100)]
+        return max(self.min_hedge_delay, p)
+
+    def order(self, endpoints):
+        """Endpoints in rotation, without those whose breaker is open"""
+        now = time.monotonic()
+        with self._lock:
+            start = self._next % len(endpoints)
+            self._next = start + 1
+            rotated = endpoints[start:] + endpoints[:start]
+            available = [endpoint for endpoint in rotated if self._breaker(endpoint).available(now)]
+        if not available:
+            # Every breaker is open: fail open on the one closest to its trial
+            available = [min(rotated, key=lambda endpoint: self.breakers[endpoint].opened_at)]
+        return available
+
+    def _launch(self, fn, endpoint):
+        future = Future()
+        with self._lock:
+            self._breaker(endpoint).attempt(time.monotonic())
+
+        def run():
+            start = time.monotonic()
+            try:
+                result = fn(endpoint)
+            except Exception as error:
+                with self._lock:
+                    if self.is_failure(error):
+                        self._count('failures')
+                        if self._breaker(endpoint).failure(time.monotonic()):
+                            self._count('breaker_trips')
+                future.set_exception(error)
+            else:
+                with self._lock:
+                    self.latencies.append(time.monotonic() - start)
+                    self._breaker(endpoint).success()
+                future.set_result(result)
+
+        threading.Thread(target=run, name=f"attempt {endpoint}", daemon=True).start()
+        return future
+
+    def call(self, fn, endpoints):
+        """
+        Return ``fn(endpoint)`` of the first endpoint to answer.
+
+        Raises DeadlineExceeded when nothing answered in time, or the last
+        error when every endpoint failed.
+        """
+        endpoints = self.order(list(endpoints))
+        distinct = len(set(endpoints)) > 1
+        start = time.monotonic()
+        deadline_at = start + self.deadline if self.deadline > 0 else float('inf')
+        delay = self.hedge_delay()
+        hedge_at = start + delay
+
+        pending = {self._launch(fn, endpoints[0]): False}
+        attempts, hedges, last_error = 1, 0, None
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline_at:
+                    with self._lock:
+                        self._count('deadline_exceeded')
+                    raise DeadlineExceeded(f"No answer within {self.deadline:g}s")
+
+                can_hedge = self.hedge and distinct and hedges < self.max_hedges
+                wake_at = min(deadline_at, hedge_at) if can_hedge else deadline_at
+                timeout = None if wake_at == float('inf') else max(0.0, wake_at - now)
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    hedged = pending.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        if hedged:
+                            with self._lock:
+                                self._count('hedge_wins')
+                        return future.result()
+                    if not self.is_failure(error):
+                        raise error
+                    last_error = error
+
+                if not pending:
+                    if attempts >= len(endpoints):
+                        raise last_error
+                    # Move on to the next endpoint right away
+                    pending[self._launch(fn, endpoints[attempts])] = False
+                    attempts += 1
+                    hedge_at = time.monotonic() + delay
+                elif can_hedge and time.monotonic() >= hedge_at:
+                    pending[self._launch(fn, endpoints[attempts % len(endpoints)])] = True
+                    attempts += 1
+                    hedges += 1
+                    hedge_at = time.monotonic() + delay
+                    with self._lock:
+                        self._count('hedges')
+        finally:
+            self._report()
+
+    def _report(self):
+        with self._lock:
+            events, self._events = self._events, []
+        if self.on_event:
+            for name in events:
+                self.on_event(name)
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Language codes supported by Google Translate.
+
+Mirrors ``googletrans.constants`` so that validating language codes does not
+import ``googletrans`` (and with it ``httpx``/``h2``/``hstspreload``).
+"""
+
+import unicodedata
+from collections import namedtuple
+from types import MappingProxyType
+
+LANGUAGES = {
+    'af': 'afrikaans',
+    'sq': 'albanian',
+    'am': 'amharic',
+    'ar': 'arabic',
+    'hy': 'armenian',
+    'az': 'azerbaijani',
+    'eu': 'basque',
+    'be': 'belarusian',
+    'bn': 'bengali',
+    'bs': 'bosnian',
+    'bg': 'bulgarian',
+    'ca': 'catalan',
+    'ceb': 'cebuano',
+    'ny': 'chichewa',
+    'zh-cn': 'chinese (simplified)',
+    'zh-tw': 'chinese (traditional)',
+    'co': 'corsican',
+    'hr': 'croatian',
+    'cs': 'czech',
+    'da': 'danish',
+    'nl': 'dutch',
+    'en': 'english',
+    'eo': 'esperanto',
+    'et': 'estonian',
+    'tl': 'filipino',
+    'fi': 'finnish',
+    'fr': 'french',
+    'fy': 'frisian',
+    'gl': 'galician',
+    'ka': 'georgian',
+    'de': 'german',
+    'el': 'greek',
+    'gu': 'gujarati',
+    'ht': 'haitian creole',
+    'ha': 'hausa',
+    'haw': 'hawaiian',
+    'iw': 'hebrew',
+    'he': 'hebrew',
+    'hi': 'hindi',
+    'hmn': 'hmong',
+    'hu': 'hungarian',
+    'is': 'icelandic',
+    'ig': 'igbo',
+    'id': 'indonesian',
+    'ga': 'irish',
+    'it': 'italian',
+    'ja': 'japanese',
+    'jw': 'javanese',
+    'kn': 'kannada',
+    'kk': 'kazakh',
+    'km': 'khmer',
+    'ko': 'korean',
+    'ku': 'kurdish (kurmanji)',
+    'ky': 'kyrgyz',
+    'lo': 'lao',
+    'la': 'latin',
+    'lv': 'latvian',
+    'lt': 'lithuanian',
+    'lb': 'luxembourgish',
+    'mk': 'macedonian',
+    'mg': 'malagasy',
+    'ms': 'malay',
+    'ml': 'malayalam',
+    'mt': 'maltese',
+    'mi': 'maori',
+    'mr': 'marathi',
+    'mn': 'mongolian',
+    'my': 'myanmar (burmese)',
+    'ne': 'nepali',
+    'no': 'norwegian',
+    'or': 'odia',
+    'ps': 'pashto',
+    'fa': 'persian',
+    'pl': 'polish',
+    'pt': 'portuguese',
+    'pa': 'punjabi',
+    'ro': 'romanian',
+    'ru': 'russian',
+    'sm': 'samoan',
+    'gd': 'scots gaelic',
+    'sr': 'serbian',
+    'st': 'sesotho',
+    'sn': 'shona',
+    'sd': 'sindhi',
+    'si': 'sinhala',
+    'sk': 'slovak',
+    'sl': 'slovenian',
+    'so': 'somali',
+    'es': 'spanish',
+    'su': 'sundanese',
+    'sw': 'swahili',
+    'sv': 'swedish',
+    'tg': 'tajik',
+    'ta': 'tamil',
+    'te': 'telugu',
+    'th': 'thai',
+    'tr': 'turkish',
+    'uk': 'ukrainian',
+    'ur': 'urdu',
+    'ug': 'uyghur',
+    'uz': 'uzbek',
+    'vi': 'vietnamese',
+    'cy': 'welsh',
+    'xh': 'xhosa',
+    'yi': 'yiddish',
+    'yo': 'yoruba',
+    'zu': 'zulu',
+}
+
+SPECIAL_CASES = {
+    'ee': 'et',
+}
+
+
+def locale_to_language(locale):
+    """Map a gettext locale such as 'zh_CN' or 'en_US' to a language code"""
+    code = locale.lower().replace('_', '-').split('.')[0]
+    if code in LANGUAGES:
+        return code
+    code = code.split('-')[0]
+    return SPECIAL_CASES.get(code, code)
+
+
+# Names shown by 'tr list' for the most used languages
+DISPLAY_NAMES = {
+    'ar': 'Arabic (العربية)',
+    'zh-cn': 'Chinese Simplified (中文简体)',
+    'zh-tw': 'Chinese Traditional (中文繁體)',
+    'en': 'English',
+    'fr': 'French (Français)',
+    'de': 'German (Deutsch)',
+    'es': 'Spanish (Español)',
+    'it': 'Italian (Italiano)',
+    'ja': 'Japanese (日本語)',
+    'ko': 'Korean (한국어)',
+    'pt': 'Portuguese (Português)',
+    'ru': 'Russian (Русский)',
+    'tr': 'Turkish (Türkçe)',
+    'hi': 'Hindi (हिन्दी)',
+    'th': 'Thai (ไทย)',
+    'vi': 'Vietnamese (Tiếng Việt)',
+    'nl': 'Dutch (Nederlands)',
+    'pl': 'Polish (Polski)',
+    'sv': 'Swedish (Svenska)',
+    'da': 'Danish (Dansk)',
+    'no': 'Norwegian (Norsk)',
+}
+
+# Endonyms, searchable alongside the English names
+NATIVE_NAMES = {
+    'af': 'Afrikaans', 'sq': 'Shqip', 'am': 'አማርኛ', 'ar': 'العربية', 'hy': 'Հայերեն',
+    'az': 'Azərbaycanca', 'eu': 'Euskara', 'be': 'Беларуская', 'bn': 'বাংলা', 'bs': 'Bosanski',
+    'bg': 'Български', 'ca': 'Català', 'ceb': 'Cebuano', 'ny': 'Chichewa', 'zh-cn': '中文简体',
+    'zh-tw': '中文繁體', 'co': 'Corsu', 'hr': 'Hrvatski', 'cs': 'Čeština', 'da': 'Dansk',
+    'nl': 'Nederlands', 'en': 'English', 'eo': 'Esperanto', 'et': 'Eesti', 'tl': 'Tagalog',
+    'fi': 'Suomi', 'fr': 'Français', 'fy': 'Frysk', 'gl': 'Galego', 'ka': 'ქართული',
+    'de': 'Deutsch', 'el': 'Ελληνικά', 'gu': 'ગુજરાતી', 'ht': 'Kreyòl ayisyen', 'ha': 'Hausa',
+    'haw': 'ʻŌlelo Hawaiʻi', 'iw': 'עברית', 'he': 'עברית', 'hi': 'हिन्दी', 'hmn': 'Hmoob',
+    'hu': 'Magyar', 'is': 'Íslenska', 'ig': 'Igbo', 'id': 'Bahasa Indonesia', 'ga': 'Gaeilge',
+    'it': 'Italiano', 'ja': '日本語', 'jw': 'Basa Jawa', 'kn': 'ಕನ್ನಡ', 'kk': 'Қазақ тілі',
+    'km': 'ខ្មែរ', 'ko': '한국어', 'ku': 'Kurdî', 'ky': 'Кыргызча', 'lo': 'ລາວ',
+    'la': 'Latina', 'lv': 'Latviešu', 'lt': 'Lietuvių', 'lb': 'Lëtzebuergesch', 'mk': 'Македонски',
+    'mg': 'Malagasy', 'ms': 'Bahasa Melayu', 'ml': 'മലയാളം', 'mt': 'Malti', 'mi': 'Māori',
+    'mr': 'मराठी', 'mn': 'Монгол', 'my': 'မြန်မာ', 'ne': 'नेपाली', 'no': 'Norsk',
+    'or': 'ଓଡ଼ିଆ', 'ps': 'پښتو', 'fa': 'فارسی', 'pl': 'Polski', 'pt': 'Português',
+    'pa': 'ਪੰਜਾਬੀ', 'ro': 'Română', 'ru': 'Русский', 'sm': 'Gagana Samoa', 'gd': 'Gàidhlig',
+    'sr': 'Српски', 'st': 'Sesotho', 'sn': 'ChiShona', 'sd': 'سنڌي', 'si': 'සිංහල',
+    'sk': 'Slovenčina', 'sl': 'Slovenščina', 'so': 'Soomaali', 'es': 'Español', 'su': 'Basa Sunda',
+    'sw': 'Kiswahili', 'sv': 'Svenska', 'tg': 'Тоҷикӣ', 'ta': 'தமிழ்', 'te': 'తెలుగు',
+    'th': 'ไทย', 'tr': 'Türkçe', 'uk': 'Українська', 'ur': 'اردو', 'ug': 'ئۇيغۇرچە',
+    'uz': 'Oʻzbekcha', 'vi': 'Tiếng Việt', 'cy': 'Cymraeg', 'xh': 'isiXhosa', 'yi': 'ייִדיש',
+    'yo': 'Yorùbá', 'zu': 'isiZulu',
+}
+
+# Other names people search for, including ISO 639-2 codes
+ALIASES = {
+    'zh-cn': ('chinese', 'mandarin', 'simplified chinese', 'zho', 'chi'),
+    'zh-tw': ('chinese', 'traditional chinese', 'taiwanese mandarin'),
+    'en': ('eng',), 'fr': ('fra', 'fre'), 'de': ('deu', 'ger'), 'es': ('spa', 'castilian'),
+    'it': ('ita',), 'ja': ('jpn',), 'ko': ('kor',), 'pt': ('por', 'brazilian'), 'ru': ('rus',),
+    'ar': ('ara',), 'nl': ('nld', 'dut', 'flemish'), 'fa': ('farsi', 'fas', 'per'),
+    'iw': ('heb',), 'he': ('heb',), 'tl': ('filipino', 'fil', 'tgl'), 'my': ('burmese',),
+    'or': ('oriya',), 'gd': ('gaelic',), 'ht': ('creole',), 'ku': ('kurmanji',),
+    'ny': ('nyanja', 'chewa'), 'st': ('sotho',), 'jw': ('javanese',), 'el': ('ell', 'gre'),
+    'sv': ('swe',), 'pl': ('pol',), 'tr': ('tur',), 'uk': ('ukr',), 'hi': ('hin',),
+    'vi': ('vie',), 'th': ('tha',), 'no': ('nor', 'bokmal', 'bokmål'),
+}
+
+
+Language = namedtuple('Language', ['code', 'name', 'display', 'native', 'aliases'])
+
+
+def fold(text):
+    """Casefold and strip diacritics, so 'francais' finds 'Français'"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class LanguageIndex:
+    """
+    Immutable lookup table of the supported languages.
+
+    Built once from LANGUAGES; codes resolve in O(1) and ``search`` ranks
+    languages by code, name, endonym and alias using prefixes and a trigram
+    index for typos.
+    """
+
+    def __init__(self, languages=LANGUAGES, special_cases=SPECIAL_CASES):
+        entries = []
+        for code, name in languages.items():
+            entries.append(Language(
+                code,
+                name.capitalize(),
+                DISPLAY_NAMES.get(code, name.capitalize()),
+                NATIVE_NAMES.get(code, ''),
+                ALIASES.get(code, ()),
+            ))
+        self.by_code = MappingProxyType({entry.code: entry for entry in entries})
+        self.codes = frozenset(self.by_code) | frozenset(special_cases)
+        self.available = tuple(
+            (entry.code, entry.display) for entry in sorted(entries, key=lambda entry: entry.display)
+        )
+
+        # (folded key, entry) pairs and an inverted trigram index over them
+        keys = []
+        for entry in entries:
+            for key in (entry.code, entry.name, entry.native, *entry.aliases):
+                if key:
+                    keys.append((fold(key), entry))
+        self._keys = tuple(keys)
+        self._key_trigrams = tuple(trigrams(key) for key, _ in keys)
+        postings = {}
+        for i, grams in enumerate(self._key_trigrams):
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self._postings = MappingProxyType({gram: tuple(ids) for gram, ids in postings.items()})
+
+    def __contains__(self, code):
+        return code in self.codes
+
+    def get(self, code):
+        return self.by_code.get(code)
+
+    def _score(self, query, key, i, query_trigrams):
+        if key == query:
+            return 3.0
+        if key.startswith(query):
+            return 2.0 + len(query) / len(key)
+        if any(word.startswith(query) for word in key.split()):
+            return 1.5 + len(query) / len(key)
+        shared = len(query_trigrams & self._key_trigrams[i])
+        return shared / (len(query_trigrams) + len(self._key_trigrams[i]) - shared)
+
+    def search(self, query, limit=10, min_score=0.3):
+        """Return up to ``limit`` languages matching ``query``, best first"""
+        query = fold(query.strip())
+        if not query:
+            return []
+        query_trigrams = trigrams(query)
+
+        # Only keys sharing a trigram with the query can match
+        candidates = set()
+        for gram in query_trigrams:
+            candidates.update(self._postings.get(gram, ()))
+
+        best = {}
+        for i in candidates:
+            key, entry = self._keys[i]
+            score = self._score(query, key, i, query_trigrams)
+            if score >= min_score and score > best.get(entry.code, (0,))[0]:
+                best[entry.code] = (score, entry)
+        ranked = sorted(best.values(), key=lambda match: (-match[0], match[1].display))
+        return [entry for _, entry in ranked[:limit]]
+
+
+_language_index = None
+
+
+def language_index():
+    """Return the shared LanguageIndex, built on first use"""
+    global _language_index
+    if _language_index is None:
+        _language_index = LanguageIndex()
+    return _language_index
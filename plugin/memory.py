@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Fuzzy translation memory.
+
+Every translation fetched from the network is remembered with its query,
+and queries that are close to an earlier one (the same sentence with
+another number or name) are offered that earlier translation with its
+similarity. Similarity is the Jaccard index of the character trigrams of
+the two queries.
+
+Candidates are found with MinHash and locality-sensitive hashing: the
+trigrams of a query are summarized in a signature of ``HASHES`` minimum
+hashes, cut into ``BANDS`` bands. Queries that share a band are likely to
+be similar, so a lookup is one indexed query for the keys of its bands,
+followed by exact scoring of the few candidates.
+
+Entries live in SQLite next to the translation cache. They are added
+and evicted one by one, oldest first, so the index is never rebuilt and
+stays within ``max_entries``.
+"""
+
+import hashlib
+import sqlite3
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+from plugin.cache import normalize_query
+from plugin.settings_manager import settings_manager
+
+memory_path = Path(__file__).resolve().parent.parent / "translation_memory.sqlite3"
+
+# 32 minimum hashes of 16 bits, in 8 bands of 4: queries with a trigram
+# similarity of 0.6 share a band 67% of the time, 0.7 89%, 0.8 98.5%
+HASHES = 32
+BANDS = 8
+ROWS = HASHES // BANDS
+SHINGLE = 3
+
+_signature = struct.Struct(f"<{HASHES}H")
+
+
+def shingles(text):
+    """Character trigrams of a normalized query; shorter queries are their own shingle"""
+    if len(text) <= SHINGLE:
+        return {text}
+    return {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def similarity(a, b):
+    """Jaccard index of two shingle sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def signature(text):
+    """MinHash signature of a normalized query, as bytes"""
+    # One blake2b digest gives all HASHES 16-bit hashes of a shingle at once
+    rows = [
+        _signature.unpack(hashlib.blake2b(shingle.encode("utf-8"), digest_size=HASHES * 2).digest())
+        for shingle in shingles(text)
+    ]
+    return _signature.pack(*map(min, zip(*rows)))
+
+
+def band_keys(dest, text):
+    """Index keys of a query's bands, separate for each target language"""
+    sig = signature(text)
+    seed = zlib.crc32(dest.encode("utf-8"))
+    width = ROWS * 2
+    return [band << 32 | zlib.crc32(sig[band * width:(band + 1) * width], seed) for band in range(BANDS)]
+
+
+class TranslationMemory:
+    """Past translations by target language, searchable by similarity of their queries"""
+
+    def __init__(self, path=None, max_entries=None):
+        self.path = Path(path) if path else memory_path
+        self.max_entries = max_entries if max_entries is not None else \
+            settings_manager.get_int('Memory', 'max_entries', 20000)
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        """Open the database on first use; each thread has its own connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(str(self.path), timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY,
+                    dest TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    src TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    UNIQUE (dest, query)
+                );
+                CREATE TABLE IF NOT EXISTS bands (
+                    key INTEGER NOT NULL,
+                    id INTEGER NOT NULL,
+                    PRIMARY KEY (key, id)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS meta (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO meta (name, value) VALUES ('entries', 0);
+                """
+            )
+        return conn
+
+    def __len__(self):
+        try:
+            return self.conn.execute("SELECT value FROM meta WHERE name = 'entries'").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def add(self, dest, query, src, text):
+        """Remember the translation of a query, replacing an earlier one of the same query"""
+        self.add_many([(dest, query, src, text)])
+
+    def add_many(self, entries):
+        """Remember (dest, query, src, text) translations in one transaction"""
+        try:
+            self._add_many(entries)
+        except sqlite3.Error:
+            # A locked memory must never fail a translation
+            pass
+
+    def _add_many(self, entries):
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            added = 0
+            for dest, query, src, text in entries:
+                query = normalize_query(query)
+                keys = band_keys(dest, query)
+                row = conn.execute("SELECT id FROM entries WHERE dest = ? AND query = ?", (dest, query)).fetchone()
+                if row is not None:
+                    # Moves to the end of the eviction order
+                    conn.execute("DELETE FROM entries WHERE id = ?", row)
+                    conn.executemany("DELETE FROM bands WHERE key = ? AND id = ?", [(key, row[0]) for key in keys])
+                else:
+                    added += 1
+                entry_id = conn.execute(
+                    "INSERT INTO entries (dest, query, src, text) VALUES (?, ?, ?, ?)", (dest, query, src, text)
+                ).lastrowid
+                conn.executemany("INSERT OR IGNORE INTO bands (key, id) VALUES (?, ?)",
+                                 [(key, entry_id) for key in keys])
+            conn.execute("UPDATE meta SET value = value + ? WHERE name = 'entries'", (added,))
+            count = conn.execute("SELECT value FROM meta WHERE name = 'entries'").fetchone()[0]
+            if count > self.max_entries:
+                self._evict(count - self.max_entries)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, count):
+        conn = self.conn
+        oldest = conn.execute("SELECT id, dest, query FROM entries ORDER BY id LIMIT ?", (count,)).fetchall()
+        conn.executemany(
+            "DELETE FROM bands WHERE key = ? AND id = ?",
+            [(key, entry_id) for entry_id, dest, query in oldest for key in band_keys(dest, query)],
+        )
+        conn.executemany("DELETE FROM entries WHERE id = ?", [(entry_id,) for entry_id, _, _ in oldest])
+        conn.execute("UPDATE meta SET value = value - ? WHERE name = 'entries'", (len(oldest),))
+
+    def lookup(self, dest, query, limit=2, min_similarity=0.6, max_candidates=100):
+        """
+        Return up to ``limit`` (similarity, query, src, text) of the closest
+        earlier queries translated to ``dest``, best first.
+
+        The query itself is left out; its translation is the cache's.
+        """
+        try:
+            return self._lookup(dest, query, limit, min_similarity, max_candidates)
+        except sqlite3.Error:
+            return []
+
+    def _lookup(self, dest, query, limit, min_similarity, max_candidates):
+        query = normalize_query(query)
+        keys = band_keys(dest, query)
+        rows = self.conn.execute(
+            "SELECT entries.query, entries.src, entries.text FROM entries JOIN ("
+            f"  SELECT id, COUNT(*) AS bands FROM bands WHERE key IN ({', '.join('?' * len(keys))})"
+            "   GROUP BY id ORDER BY bands DESC LIMIT ?"
+            ") AS candidates USING (id) WHERE entries.dest = ? AND entries.query != ?",
+            keys + [max_candidates, dest, query],
+        ).fetchall()
+        target = shingles(query)
+        matches = []
+        for candidate, src, text in rows:
+            score = similarity(target, shingles(candidate))
+            if score >= min_similarity:
+                matches.append((score, candidate, src, text))
+        matches.sort(key=lambda match: match[0], reverse=True)
+        return matches[:limit]
+
+    def clear(self):
+        """Forget every translation"""
+        self.conn.execute("DELETE FROM entries")
+        self.conn.execute("DELETE FROM bands")
+        self.conn.execute("UPDATE meta SET value = 0 WHERE name = 'entries'")
+        self.conn.execute("VACUUM")
+
+
+# Global translation memory instance
+translation_memory = TranslationMemory()
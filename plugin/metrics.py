@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Per-stage timing of queries.
+
+Each request is traced from the top of ``main.py`` (or its arrival at the
+resident backend) to its output. Code marks its stages with
+``with metrics.stage('network'):``; stages nest and each records only its
+own time, so the stages of a request add up to its total. The trace is
+appended to ``metrics.jsonl`` as one compact line after the answer has
+been printed, and ``tr stats`` summarizes the file. Work done on other
+threads counts towards the stage that waits for it.
+
+With ``DIRECTTRANSLATE_PROFILE`` set, ``main.py`` also writes a cProfile
+dump of the query to ``profiles/``.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+basedir = Path(__file__).resolve().parent.parent
+metrics_path = basedir / "metrics.jsonl"
+profiles_dir = basedir / "profiles"
+
+# Stages in the order a query passes them, as shown by 'tr stats'
+STAGES = (
+    'interpreter', 'imports', 'settings', 'forward', 'dispatch', 'glossary',
+    'cache', 'debounce', 'shared', 'detect', 'network', 'memory', 'render', 'output',
+)
+
+# How queries were answered
+OUTCOMES = ('glossary', 'cache', 'shared', 'network', 'provisional', 'pending', 'suppressed', 'error')
+
+_local = threading.local()
+
+
+class Trace:
+    """Stage timings of one request"""
+
+    __slots__ = ('started', 'started_at', 'stages', 'stack', 'command', 'outcome', 'resident')
+
+    def __init__(self, started=None, started_at=None, resident=False):
+        self.started = started if started is not None else time.perf_counter()
+        self.started_at = started_at if started_at is not None else time.time()
+        self.stages = {}
+        # [name, start, time spent in nested stages]
+        self.stack = []
+        self.command = None
+        self.outcome = None
+        self.resident = resident
+
+    def record(self):
+        """The trace as a metrics line"""
+        total = time.perf_counter() - self.started
+        stages = dict(self.stages)
+        if not self.resident:
+            started = process_started()
+            if started is not None and 0 <= self.started_at - started < 60:
+                stages['interpreter'] = self.started_at - started
+                total += stages['interpreter']
+        record = {
+            't': round(self.started_at, 3),
+            'c': self.command,
+            'ms': round(total * 1000, 2),
+            's': {name: round(seconds * 1000, 2) for name, seconds in stages.items()},
+        }
+        if self.outcome:
+            record['o'] = self.outcome
+        if self.resident:
+            record['r'] = 1
+        return record
+
+
+class _Stage:
+    __slots__ = ('name', 'trace')
+
+    def __init__(self, name):
+        self.name = name
+        self.trace = getattr(_local, 'trace', None)
+
+    def __enter__(self):
+        if self.trace is not None:
+            self.trace.stack.append([self.name, time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, *exc_info):
+        trace = self.trace
+        if trace is not None:
+            name, start, nested = trace.stack.pop()
+            elapsed = time.perf_counter() - start
+            trace.stages[name] = trace.stages.get(name, 0.0) + elapsed - nested
+            if trace.stack:
+                trace.stack[-1][2] += elapsed
+        return False
+
+
+def stage(name):
+    """Context manager timing a stage of the current request, if it is traced"""
+    return _Stage(name)
+
+
+def begin(started=None, started_at=None, resident=False):
+    """Start tracing a request on this thread"""
+    trace = _local.trace = Trace(started, started_at, resident)
+    return trace
+
+
+def elapsed():
+    """Seconds since the current request arrived, 0 when it is not traced"""
+    trace = getattr(_local, 'trace', None)
+    return time.perf_counter() - trace.started if trace is not None else 0.0
+
+
+def tag(command=None, outcome=None):
+    """Name the command of the current request or how it was answered"""
+    trace = getattr(_local, 'trace', None)
+    if trace is not None:
+        if command and not trace.command:
+            trace.command = command
+        if outcome:
+            trace.outcome = outcome
+
+
+def end():
+    """Stop tracing and append the record to the metrics file"""
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    if trace is None:
+        return None
+
+    from plugin.settings_manager import settings_manager
+
+    if not settings_manager.get_boolean('Metrics', 'enabled', True):
+        return None
+    record = trace.record()
+    try:
+        append(record, settings_manager.get_int('Metrics', 'max_kb', 1024) * 1024)
+    except OSError:
+        pass
+    return record
+
+
+def append(record, max_bytes, path=metrics_path):
+    """Append one line, moving a full file to ``metrics.jsonl.1``"""
+    try:
+        if path.stat().st_size >= max_bytes:
+            os.replace(path, path.with_name(path.name + ".1"))
+    except OSError:
+        pass
+    # A single short write keeps lines whole across processes
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, separators=(',', ':')) + "\n")
+
+
+def process_started():
+    """Wall-clock time this process was created, or None where unknown"""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            times = [wintypes.FILETIME() for _ in range(4)]
+            kernel32 = ctypes.windll.kernel32
+            if not kernel32.GetProcessTimes(kernel32.GetCurrentProcess(), *map(ctypes.byref, times)):
+                return None
+            created = times[0].dwHighDateTime << 32 | times[0].dwLowDateTime
+            # FILETIME counts 100 ns intervals since 1601
+            return created / 1e7 - 11644473600
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/stat", "rb") as f:
+                # Fields after the parenthesized command name; starttime is field 22
+                fields = f.read().rsplit(b")", 1)[1].split()
+            with open("/proc/uptime", "rb") as f:
+                uptime = float(f.read().split()[0])
+            return time.time() - uptime + int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    return None
+
+
+def profile_path():
+    """Where a cProfile dump of this process goes"""
+    profiles_dir.mkdir(exist_ok=True)
+    return profiles_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof"
+
+
+def read_records(limit=5000, path=metrics_path):
+    """The most recent records, oldest first"""
+    lines = []
+    for candidate in (path, path.with_name(path.name + ".1")):
+        if len(lines) >= limit:
+            break
+        try:
+            with open(candidate, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()[-(limit - len(lines)):] + lines
+        except OSError:
+            continue
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # Lines cut short by a crash are skipped
+            continue
+    return records
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(records):
+    """
+    p50/p95 per stage and of the total, and how queries were answered.
+
+    Totals are those of the process Flow Launcher waited for; with the
+    resident backend, its records add the stages after 'forward'.
+    """
+    totals = [record['ms'] for record in records if not record.get('r')]
+    stages = {}
+    for record in records:
+        for name, ms in record.get('s', {}).items():
+            stages.setdefault(name, []).append(ms)
+    outcomes = {}
+    for record in records:
+        if record.get('o'):
+            outcomes[record['o']] = outcomes.get(record['o'], 0) + 1
+    return {
+        'queries': len(totals),
+        'total': (percentile(totals, 0.5), percentile(totals, 0.95)) if totals else None,
+        'stages': [
+            (name, len(stages[name]), percentile(stages[name], 0.5), percentile(stages[name], 0.95),
+             sum(stages[name]))
+            for name in sorted(stages, key=lambda name: STAGES.index(name) if name in STAGES else len(STAGES))
+        ],
+        'outcomes': outcomes,
+    }
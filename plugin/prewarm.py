@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Cache prewarming.
+
+Changing the default language turns every query the user repeats into a
+cache miss, and a fresh install starts with an empty cache. A prewarm job
+replays the most used recent queries to the default language (counted by
+``TranslationCache.record_query``) and the phrases of an optional list
+into a target language in the background, so that they are answered from
+the cache once typed.
+
+Queries go through ``Main.fetch_and_cache`` like those typed in the
+launcher, on a few workers of their own behind a rate limit, and those
+already cached or in a glossary are skipped. A job starts after the
+default language is changed, after ``idle_after`` seconds without queries
+in the resident backend, and from ``commands.py prewarm``. A newer job
+replaces one still running.
+"""
+
+import threading
+from pathlib import Path
+
+from plugin.cache import translation_cache
+from plugin.settings_manager import settings_manager
+
+basedir = Path(__file__).resolve().parent.parent
+
+# Consecutive failures after which a job gives up, as when offline
+MAX_FAILURES = 5
+
+
+def is_enabled():
+    """Check whether prewarming is switched on in user_settings.ini"""
+    return settings_manager.get_boolean('Prewarm', 'enabled', True)
+
+
+def history_age():
+    """Seconds after which an unused query is forgotten, when the next job starts"""
+    return settings_manager.get_float('Prewarm', 'history_days', 30) * 86400
+
+
+def record(src, dest, query):
+    """Count a query translated to the default language"""
+    if dest == settings_manager.get_default_language() and is_enabled():
+        translation_cache.record_query(
+            src, query, max_entries=settings_manager.get_int('Prewarm', 'history_size', 1000), max_age=history_age()
+        )
+
+
+def read_phrases(path):
+    """Phrases of a list, one per line; blank lines and '#' comments are skipped"""
+    path = Path(path)
+    if not path.is_absolute():
+        path = basedir / path
+    with open(path, encoding="utf-8-sig") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def candidates(limit=None, phrases=None):
+    """(src, query) to prewarm: the most used recent queries first, then the phrase list"""
+    if limit is None:
+        limit = settings_manager.get_int('Prewarm', 'queries', 100)
+    queries = translation_cache.frequent_queries(limit, max_age=history_age()) if limit > 0 else []
+    path = phrases if phrases is not None else settings_manager.get('Prewarm', 'phrases', '')
+    if path:
+        try:
+            queries += [('auto', phrase) for phrase in read_phrases(path)]
+        except OSError:
+            pass
+    return list(dict.fromkeys(queries))
+
+
+class PrewarmJob:
+    """Translates (src, query) pairs into one language ahead of use"""
+
+    def __init__(self, dest, queries=None, workers=None, rate=None):
+        self.dest = dest
+        self.queries = queries
+        self.workers = max(1, workers or settings_manager.get_int('Prewarm', 'workers', 2))
+        self.rate = rate if rate is not None else settings_manager.get_float('Prewarm', 'rate', 2.0)
+        self.stats = {'queries': 0, 'cached': 0, 'shared': 0, 'translated': 0, 'failed': 0}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _warm(self, limiter, src, query):
+        from plugin.glossary import glossaries
+        from plugin.ui import Main
+
+        if self._stopped.is_set():
+            return None
+        try:
+            if src == self.dest or translation_cache.contains(src, self.dest, query) or \
+                    glossaries.lookup(src, self.dest, query):
+                return 'cached'
+            limiter.acquire()
+            if self._stopped.is_set():
+                return None
+            Main.fetch_and_cache(src, self.dest, query)
+        except Exception:
+            return 'failed'
+        return 'translated'
+
+    def run(self):
+        """Translate the queries that are not cached yet and return the stats"""
+        from plugin.batch import RateLimiter
+        from plugin.ui import lookup_shared
+
+        queries = candidates() if self.queries is None else self.queries
+        self.stats['queries'] = len(queries)
+        # What other machines shared is fetched in batches, without asking Google
+        self.stats['shared'] = len(lookup_shared([
+            (src, self.dest, query) for src, query in queries
+            if src != self.dest and not translation_cache.contains(src, self.dest, query)
+        ]))
+        limiter = RateLimiter(self.rate, burst=1)
+        remaining = iter(queries)
+        lock = threading.Lock()
+        failures = [0]
+
+        def work():
+            while not self._stopped.is_set():
+                with lock:
+                    item = next(remaining, None)
+                if item is None:
+                    return
+                outcome = self._warm(limiter, *item)
+                if outcome is None:
+                    continue
+                with lock:
+                    self.stats[outcome] += 1
+                    failures[0] = failures[0] + 1 if outcome == 'failed' else 0
+                    if failures[0] >= MAX_FAILURES:
+                        self.stop()
+
+        # Threads rather than an executor, which takes no work once the
+        # interpreter is shutting down
+        threads = [threading.Thread(target=work, name="prewarm") for _ in range(min(self.workers, len(queries)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        translation_cache.count('prewarmed', self.stats['translated'])
+        return self.stats
+
+    def start(self):
+        """Run in a background thread, which a process without the resident backend waits for before exiting"""
+        # That thread runs while the interpreter shuts down, when modules
+        # registering exit handlers (concurrent.futures) can no longer be imported
+        import plugin.batch  # noqa: F401
+        import plugin.glossary  # noqa: F401
+        import plugin.shared_cache  # noqa: F401
+        import plugin.ui  # noqa: F401
+
+        self._thread = threading.Thread(target=self.run, name="prewarm")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Let the queries already sent finish and skip the others"""
+        self._stopped.set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+_job = None
+_job_lock = threading.Lock()
+
+
+def start(dest=None, queries=None):
+    """Prewarm into ``dest`` (the default language) in the background, replacing a running job"""
+    global _job
+    dest = dest or settings_manager.get_default_language()
+    if not is_enabled() or dest == 'auto':
+        return None
+    with _job_lock:
+        if _job is not None:
+            _job.stop()
+        _job = PrewarmJob(dest, queries).start()
+        return _job
+
+
+def is_running():
+    """Check whether a prewarm job is still translating"""
+    return _job is not None and _job.is_alive()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Result rows for Flow Launcher.
+
+Each request collects its rows in its own ``ResultList``. Rows are
+``__slots__`` objects that write themselves into the JSON-RPC payload
+directly, producing the same text ``json.dumps`` would for the equivalent
+dicts without building them.
+"""
+
+import json
+from json.encoder import encode_basestring_ascii as _string
+
+_dumps = json.dumps
+
+_ROW = '{"Title": %s, "SubTitle": %s, "IcoPath": %s}'
+_ACTION_ROW = '{"Title": %s, "SubTitle": %s, "IcoPath": %s, "JsonRPCAction": {"method": %s, "parameters": %s}}'
+
+
+class Result:
+    """One row: title, subtitle, icon and an optional JSON-RPC action"""
+
+    __slots__ = ('title', 'subtitle', 'icon', 'method', 'parameters')
+
+    def __init__(self, title, subtitle, icon, method=None, parameters=None):
+        self.title = title
+        self.subtitle = subtitle
+        self.icon = icon
+        self.method = method
+        self.parameters = parameters
+
+    def __repr__(self):
+        return f"Result({self.title!r}, {self.subtitle!r})"
+
+    def to_json(self):
+        if not self.method:
+            return _ROW % (_string(self.title), _string(self.subtitle), _string(self.icon))
+        try:
+            # Actions nearly always carry string parameters
+            parameters = "[" + ", ".join(map(_string, self.parameters or ())) + "]"
+        except TypeError:
+            parameters = _dumps(self.parameters)
+        return _ACTION_ROW % (
+            _string(self.title), _string(self.subtitle), _string(self.icon), _string(self.method), parameters
+        )
+
+
+class ResultList(list):
+    """The rows of one request, holding at most ``limit`` of them (0 for no limit)"""
+
+    def __init__(self, limit=0):
+        super().__init__()
+        self.limit = limit
+        self.dropped = 0
+
+    def add(self, title, subtitle, icon, method=None, parameters=None):
+        if self.limit and len(self) >= self.limit:
+            self.dropped += 1
+            return
+        self.append(Result(title, subtitle, icon, method, parameters))
+
+    def to_json(self):
+        return "[" + ", ".join(row.to_json() if isinstance(row, Result) else _dumps(row) for row in self) + "]"
+
+
+def payload(results, debug_message=""):
+    """Serialize the response to a query or context_menu request"""
+    rows = results.to_json() if isinstance(results, ResultList) else _dumps(results)
+    return f'{{"result": {rows}, "debugMessage": {_dumps(debug_message)}}}'
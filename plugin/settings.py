@@ -1,23 +1,25 @@
 # -*- coding: utf-8 -*-
 
 
-import os
 from pathlib import Path
 
-from dotenv import load_dotenv
-
 setting_pyfile = Path(__file__).resolve()
 pludir = setting_pyfile.parent
 basedir = pludir.parent
 
 dotenv_path = basedir / ".env"
-if dotenv_path.exists():
-    load_dotenv(dotenv_path)
 
 
-# The default value can work, if no user config.
-CONFIG = os.getenv("CONFIG", "default config")
-LOCAL = os.getenv("local", "en")
+def __getattr__(name):
+    # Only the gettext locale needs .env, which the settings manager reads on first access
+    if name in ("CONFIG", "LOCAL"):
+        from plugin.settings_manager import settings_manager
+
+        # The default value can work, if no user config.
+        globals()["CONFIG"] = settings_manager.get_env("CONFIG", "default config")
+        globals()["LOCAL"] = settings_manager.get_env("local", "en")
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # the information of package
@@ -27,13 +29,6 @@ __short_description__ = "Translate between any languages supported by Googletran
 GITHUB_USERNAME = "SweedXD"
 
 
-readme_path = basedir / "README.md"
-try:
-    __long_description__ = open(readme_path, "r").read()
-except:
-    __long_description__ = __short_description__
-
-
 # extensions
 TRANSLATIONS_PATH = basedir / "plugin/translations"
 
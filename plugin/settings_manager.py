@@ -1,141 +1,289 @@
 # -*- coding: utf-8 -*-
+"""
+Plugin settings from ``user_settings.ini`` and ``.env``.
 
+Reads are served from an in-memory snapshot that is reloaded when either
+file's mtime or size changes. The parsed snapshot is also kept in a small
+marshal blob (``.settings_cache``), so a new process whose files have not
+changed starts without importing configparser or python-dotenv. Changes
+are written back atomically, a short while after the last of a burst.
+"""
+
+import atexit
+import marshal
 import os
-import configparser
+import threading
+import time
 from pathlib import Path
-from googletrans.constants import LANGUAGES
+
+from plugin import metrics
+from plugin.languages import language_index
+
+# Accepted spellings of booleans, as in configparser
+BOOLEAN_STATES = {
+    '1': True, 'yes': True, 'true': True, 'on': True,
+    '0': False, 'no': False, 'false': False, 'off': False,
+}
+
+BLOB_VERSION = 1
+
+
+def file_key(path):
+    """(mtime, size) of a file, or None when it does not exist"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def atomic_write(path, data):
+    """Replace a file in one step, so readers never see it half-written"""
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
 
 class SettingsManager:
     """Manages plugin settings for Direct Translate"""
-    
-    def __init__(self):
-        self.plugin_dir = Path(__file__).parent.parent
+
+    # Seconds between checks of the files for outside changes
+    check_interval = 1.0
+
+    # Seconds a change waits for further changes before it is written
+    write_delay = 0.5
+
+    def __init__(self, plugin_dir=None):
+        self.plugin_dir = Path(plugin_dir) if plugin_dir else Path(__file__).parent.parent
         self.env_file = self.plugin_dir / ".env"
         self.settings_file = self.plugin_dir / "user_settings.ini"
-        self.config = configparser.ConfigParser()
+        self.blob_file = self.plugin_dir / ".settings_cache"
+        self._lock = threading.RLock()
+        self._sections = {}
+        self._env = {}
+        self._env_lines = []
+        self._key = None
+        self._checked = 0.0
+        self._dirty = False
+        self._timer = None
         self._load_settings()
-    
+        # Pending changes are written when a one-shot process exits
+        atexit.register(self.flush)
+
     def _load_settings(self):
-        """Load settings from both .env and user_settings.ini files"""
+        """Load settings from the blob if it is current, else from both files"""
+        with metrics.stage('settings'):
+            self._load()
+
+    def _load(self):
         # Create default settings file if it doesn't exist
         if not self.settings_file.exists():
             self._create_default_settings()
-        
+
+        key = (file_key(self.settings_file), file_key(self.env_file))
+        try:
+            blob = marshal.loads(self.blob_file.read_bytes())
+            if blob['version'] == BLOB_VERSION and tuple(blob['key']) == key:
+                self._sections, self._env, self._env_lines = blob['sections'], blob['env'], blob['env_lines']
+                self._key = key
+                self._checked = time.monotonic()
+                return
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            pass
+
+        self._parse()
+        self._key = key
+        self._checked = time.monotonic()
+        self._write_blob()
+
+    def _parse(self):
+        """Parse user_settings.ini with configparser and .env with python-dotenv"""
+        import configparser
+
+        config = configparser.ConfigParser(inline_comment_prefixes=(';', '#'))
         # Load from settings file with proper encoding handling
         try:
-            self.config.read(self.settings_file, encoding='utf-8')
-        except UnicodeDecodeError:
-            # If file has encoding issues, recreate it with defaults
-            self._create_default_settings()
-            self.config.read(self.settings_file, encoding='utf-8')
+            config.read(self.settings_file, encoding='utf-8')
         except Exception:
-            # If any other error, recreate with defaults
+            # If file has encoding or syntax issues, recreate it with defaults
             self._create_default_settings()
-    
+            config = configparser.ConfigParser(inline_comment_prefixes=(';', '#'))
+            config.read(self.settings_file, encoding='utf-8')
+        self._sections = {section: dict(config.items(section, raw=True)) for section in config.sections()}
+
+        self._env, self._env_lines = {}, []
+        if self.env_file.exists():
+            from dotenv import dotenv_values
+
+            self._env = {name: value for name, value in dotenv_values(self.env_file).items() if value is not None}
+            self._env_lines = self.env_file.read_text(encoding='utf-8').splitlines(keepends=True)
+
+    def _write_blob(self):
+        try:
+            atomic_write(self.blob_file, marshal.dumps({
+                'version': BLOB_VERSION,
+                'key': self._key,
+                'sections': self._sections,
+                'env': self._env,
+                'env_lines': self._env_lines,
+            }))
+        except OSError:
+            pass
+
+    def _refresh(self):
+        """Reload the snapshot if either file changed since it was taken"""
+        now = time.monotonic()
+        if now - self._checked < self.check_interval or self._dirty:
+            return
+        self._checked = now
+        if (file_key(self.settings_file), file_key(self.env_file)) != self._key:
+            with self._lock:
+                self._load_settings()
+
     def _create_default_settings(self):
         """Create default settings file"""
-        self.config['Translation'] = {
-            'default_language': 'ar',
-            'default_language_name': 'Arabic'
+        self._sections = {
+            'Translation': {
+                'default_language': 'ar',
+                'default_language_name': 'Arabic'
+            }
         }
-        
-        with open(self.settings_file, 'w', encoding='utf-8') as f:
-            self.config.write(f)
-    
+        atomic_write(self.settings_file, self._render_settings().encode('utf-8'))
+
+    def _render_settings(self):
+        """user_settings.ini in configparser's layout"""
+        lines = []
+        for section, options in self._sections.items():
+            lines.append(f"[{section}]\n")
+            lines.extend(f"{option} = {value}\n" for option, value in options.items())
+            lines.append("\n")
+        return "".join(lines)
+
+    @property
+    def config(self):
+        """A read-only configparser copy of the settings, for callers that need one"""
+        import configparser
+
+        config = configparser.ConfigParser(interpolation=None)
+        config.read_dict(self._sections)
+        return config
+
+    def get(self, section, option, fallback=None):
+        """Get a raw option value"""
+        self._refresh()
+        return self._sections.get(section, {}).get(option.lower(), fallback)
+
+    def get_env(self, name, fallback=None):
+        """Get a variable from the environment or, failing that, from .env"""
+        value = os.environ.get(name)
+        if value is not None:
+            return value
+        self._refresh()
+        return self._env.get(name, fallback)
+
     def get_default_language(self):
         """Get the configured default language"""
+        return self.get('Translation', 'default_language', 'ar')
+
+    def get_favorite_targets(self):
+        """Get the languages 'tr * <text>' translates into"""
+        value = self.get('Translation', 'favorite_targets', '')
+        return [code.strip().lower() for code in value.split(',') if code.strip()]
+
+    def get_int(self, section, option, fallback):
+        """Get an integer option, falling back on missing or malformed values"""
+        try:
+            return int(self.get(section, option, fallback))
+        except (TypeError, ValueError):
+            return fallback
+
+    def get_boolean(self, section, option, fallback):
+        """Get a boolean option, falling back on missing or malformed values"""
+        value = self.get(section, option)
+        if value is None:
+            return fallback
+        return BOOLEAN_STATES.get(value.lower(), fallback)
+
+    def get_float(self, section, option, fallback):
+        """Get a float option, falling back on missing or malformed values"""
         try:
-            return self.config.get('Translation', 'default_language', fallback='ar')
-        except:
-            return 'ar'
-    
+            return float(self.get(section, option, fallback))
+        except (TypeError, ValueError):
+            return fallback
+
     def set_default_language(self, lang_code, lang_name=None):
         """Set the default language"""
-        if 'Translation' not in self.config:
-            self.config['Translation'] = {}
-        
-        self.config['Translation']['default_language'] = lang_code
-        if lang_name:
-            self.config['Translation']['default_language_name'] = lang_name
-        
-        # Save to settings file
-        with open(self.settings_file, 'w', encoding='utf-8') as f:
-            self.config.write(f)
-        
-        # Update .env file for backward compatibility
-        self._update_env_file(lang_code)
-    
-    def _update_env_file(self, lang_code):
-        """Update the .env file with the new default language"""
-        env_content = []
-        env_updated = False
-        
-        if self.env_file.exists():
-            with open(self.env_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.strip().startswith('default_language'):
-                        env_content.append(f"default_language = '{lang_code}'  # Default target language for translation\n")
-                        env_updated = True
-                    else:
-                        env_content.append(line)
-        
-        if not env_updated:
-            env_content.append(f"default_language = '{lang_code}'  # Default target language for translation\n")
-        
-        with open(self.env_file, 'w', encoding='utf-8') as f:
-            f.writelines(env_content)
-    
+        with self._lock:
+            translation = self._sections.setdefault('Translation', {})
+            translation['default_language'] = lang_code
+            if lang_name:
+                translation['default_language_name'] = lang_name
+
+            # Update .env for backward compatibility
+            self._update_env_lines(lang_code)
+            self._schedule_write()
+
+    def _update_env_lines(self, lang_code):
+        """Update the cached .env lines with the new default language"""
+        line = f"default_language = '{lang_code}'  # Default target language for translation\n"
+        for i, existing in enumerate(self._env_lines):
+            if existing.strip().startswith('default_language'):
+                self._env_lines[i] = line
+                break
+        else:
+            if self._env_lines and not self._env_lines[-1].endswith("\n"):
+                self._env_lines[-1] += "\n"
+            self._env_lines.append(line)
+        self._env['default_language'] = lang_code
+
+    def _schedule_write(self):
+        """Write after ``write_delay``, so a burst of changes costs one write"""
+        self._dirty = True
+        if self.write_delay <= 0:
+            self.flush()
+        elif self._timer is None:
+            self._start_timer()
+
+    def _start_timer(self):
+        self._timer = threading.Timer(self.write_delay, self.flush)
+        self._timer.daemon = True
+        try:
+            self._timer.start()
+        except RuntimeError:
+            # The interpreter is shutting down
+            self._timer = None
+
+    def flush(self):
+        """Write pending changes to user_settings.ini, .env and the blob"""
+        with self._lock:
+            self._timer = None
+            if not self._dirty:
+                return
+            try:
+                atomic_write(self.settings_file, self._render_settings().encode('utf-8'))
+                atomic_write(self.env_file, "".join(self._env_lines).encode('utf-8'))
+            except OSError:
+                # Keep the changes pending and try again, e.g. after an
+                # editor or a sync client has let go of the file
+                if self.write_delay > 0:
+                    self._start_timer()
+                return
+            self._dirty = False
+            self._key = (file_key(self.settings_file), file_key(self.env_file))
+            self._write_blob()
+
     def get_available_languages(self):
-        """Get list of available languages for translation"""
-        # Convert Google Translate LANGUAGES dict to list of tuples with proper names
-        all_languages = []
-        
-        # Add common languages first with native names for better UX
-        priority_languages = {
-            'ar': 'Arabic (العربية)',
-            'zh-cn': 'Chinese Simplified (中文简体)',
-            'zh-tw': 'Chinese Traditional (中文繁體)', 
-            'en': 'English',
-            'fr': 'French (Français)',
-            'de': 'German (Deutsch)',
-            'es': 'Spanish (Español)',
-            'it': 'Italian (Italiano)',
-            'ja': 'Japanese (日本語)',
-            'ko': 'Korean (한국어)',
-            'pt': 'Portuguese (Português)',
-            'ru': 'Russian (Русский)',
-            'tr': 'Turkish (Türkçe)',
-            'hi': 'Hindi (हिन्दी)',
-            'th': 'Thai (ไทย)',
-            'vi': 'Vietnamese (Tiếng Việt)',
-            'nl': 'Dutch (Nederlands)',
-            'pl': 'Polish (Polski)',
-            'sv': 'Swedish (Svenska)',
-            'da': 'Danish (Dansk)',
-            'no': 'Norwegian (Norsk)'
-        }
-        
-        # Add all Google Translate supported languages
-        for code, name in LANGUAGES.items():
-            if code in priority_languages:
-                # Use our enhanced name for priority languages
-                all_languages.append((code, priority_languages[code]))
-            else:
-                # Use Google's name, capitalize first letter
-                display_name = name.capitalize()
-                all_languages.append((code, display_name))
-        
-        # Add Chinese variants that might not be in LANGUAGES
-        if 'zh-cn' not in [lang[0] for lang in all_languages]:
-            all_languages.append(('zh-cn', 'Chinese Simplified (中文简体)'))
-        if 'zh-tw' not in [lang[0] for lang in all_languages]:
-            all_languages.append(('zh-tw', 'Chinese Traditional (中文繁體)'))
-        
-        return sorted(all_languages, key=lambda x: x[1])
-    
+        """Get the (code, display name) pairs of all languages, sorted by name"""
+        return language_index().available
+
+    def search_languages(self, query, limit=10):
+        """Get the languages best matching a code, name or alias, best first"""
+        return language_index().search(query, limit=limit)
+
     def is_valid_language(self, lang_code):
         """Check if language code is valid"""
-        return lang_code in LANGUAGES or lang_code in ['auto']
+        return lang_code == 'auto' or lang_code in language_index().by_code
 
 # Global settings manager instance
 settings_manager = SettingsManager()
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Shared cache tier.
+
+Workstations that translate the same vocabulary can share their
+translations through a key-value server reached over HTTP. A query missing
+from the local cache is looked up there before going to Google, and
+translations fetched from Google are written there for the other machines.
+
+The protocol is two JSON POST requests, both batched:
+
+    POST /get  {"keys": [[src, dest, query], ...]}
+               -> {"values": [[[src, text], ...] or null, ...]}
+    POST /put  {"entries": [[src, dest, query, [[src, text], ...]], ...]}
+               -> {"stored": n}
+
+A body that is not such an object is answered with 400; keys and entries
+of the wrong shape are skipped (a null value, not counted as stored).
+
+Queries are normalized like the local cache keys. With a ``token``, the
+client sends it as a bearer token. Lookups get a short timeout, and writes
+are collected for ``flush_delay`` seconds and sent together from a
+background thread. The tier fails open: after an error or a timeout it is
+skipped for ``cooldown`` seconds, by every process of the install, and the
+query goes to Google as if it were not configured.
+
+``serve`` runs a small reference server that keeps the entries in a
+``TranslationCache``, for local testing and small teams:
+
+    python commands.py serve-shared-cache --port 8790
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from plugin.cache import TranslationCache, normalize_query, translation_cache
+from plugin.settings_manager import settings_manager
+
+basedir = Path(__file__).resolve().parent.parent
+# Written when the shared tier fails; others skip it until its cooldown has passed
+down_marker_path = basedir / ".shared_cache_down"
+
+# Entries per request, and the most the reference server accepts
+MAX_BATCH = 500
+MAX_BODY = 4 * 1024 * 1024
+
+
+def valid_results(value):
+    """Check that a value is a non-empty list of (src, text) results"""
+    return isinstance(value, list) and bool(value) and all(
+        isinstance(result, list) and len(result) == 2 and all(isinstance(part, str) for part in result)
+        for result in value
+    )
+
+
+class SharedCache:
+    """Client of the shared cache tier"""
+
+    def __init__(self, url=None, token=None, timeout=None, cooldown=None, flush_delay=None,
+                 counters=translation_cache, down_marker=down_marker_path):
+        from urllib.parse import urlsplit
+
+        from plugin.hedging import CircuitBreaker
+
+        url = self.address = (url if url is not None else settings_manager.get('SharedCache', 'url', '')).strip()
+        if url and "://" not in url:
+            url = f"http://{url}"
+        self.url = urlsplit(url.rstrip('/')) if url else None
+        self.token = token if token is not None else settings_manager.get('SharedCache', 'token', '')
+        self.timeout = timeout if timeout is not None else \
+            settings_manager.get_float('SharedCache', 'timeout', 0.3)
+        self.flush_delay = flush_delay if flush_delay is not None else \
+            settings_manager.get_float('SharedCache', 'flush_delay', 0.2)
+        self.breaker = CircuitBreaker(
+            failures=1,
+            cooldown=cooldown if cooldown is not None else settings_manager.get_float('SharedCache', 'cooldown', 30),
+        )
+        self.counters = counters
+        self.down_marker = Path(down_marker)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pending = {}
+        self._flusher = None
+
+        # Another process found the tier down moments ago
+        try:
+            self.breaker.failure(self.down_marker.stat().st_mtime)
+        except OSError:
+            pass
+
+    @property
+    def enabled(self):
+        return self.url is not None
+
+    def _connection(self):
+        """Keep-alive connection of this thread, opened on first use"""
+        import http.client
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+            conn = self._local.conn = cls(self.url.hostname, self.url.port, timeout=self.timeout)
+        return conn
+
+    def _post(self, path, body):
+        import http.client
+
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        for attempt in range(2):
+            conn = self._connection()
+            reused = conn.sock is not None
+            try:
+                conn.request('POST', self.url.path + path, data, headers)
+                response = conn.getresponse()
+                payload = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # The server closed an idle keep-alive connection
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            if response.status != 200:
+                raise OSError(f"shared cache answered {response.status}")
+            return json.loads(payload)
+
+    def _call(self, path, body):
+        """One request, or None when the tier is down or fails"""
+        now = time.time()
+        with self._lock:
+            if not self.breaker.available(now):
+                return None
+            self.breaker.attempt(now)
+        try:
+            response = self._post(path, body)
+        except Exception:
+            self.counters.count('shared_errors')
+            with self._lock:
+                if self.breaker.failure(time.time()):
+                    # The marker only spares the other processes a timeout
+                    try:
+                        self.down_marker.touch()
+                    except OSError:
+                        pass
+            return None
+        with self._lock:
+            if self.breaker.opened_at is not None:
+                try:
+                    self.down_marker.unlink(missing_ok=True)
+                except OSError:
+                    pass
+            self.breaker.success()
+        return response
+
+    def get_many(self, keys):
+        """Return the results of each (src, dest, query) key, or None for those missing"""
+        keys = [[src, dest, normalize_query(query)] for src, dest, query in keys]
+        values = []
+        for offset in range(0, len(keys), MAX_BATCH):
+            batch = keys[offset:offset + MAX_BATCH]
+            response = self._call('/get', {'keys': batch})
+            found = response.get('values') if isinstance(response, dict) else None
+            if not isinstance(found, list) or len(found) != len(batch):
+                found = [None] * len(batch)
+            values += [[tuple(result) for result in value] if valid_results(value) else None for value in found]
+        return values
+
+    def put(self, src, dest, query, results):
+        """Queue a translation for the next batched write"""
+        with self._lock:
+            self._pending[(src, dest, normalize_query(query))] = [list(result) for result in results]
+            if self._flusher is None:
+                # Not a daemon thread: a process without the resident backend
+                # writes its translations before exiting
+                self._flusher = threading.Thread(target=self._flush_later, name="shared-cache")
+                self._flusher.start()
+
+    def _flush_later(self):
+        time.sleep(self.flush_delay)
+        with self._lock:
+            pending, self._pending, self._flusher = self._pending, {}, None
+        self.put_many([key + (results,) for key, results in pending.items()])
+
+    def put_many(self, entries):
+        """Write (src, dest, query, results) entries, returning how many were sent"""
+        entries = [[src, dest, normalize_query(query), [list(result) for result in results]]
+                   for src, dest, query, results in entries]
+        sent = 0
+        for offset in range(0, len(entries), MAX_BATCH):
+            batch = entries[offset:offset + MAX_BATCH]
+            if self._call('/put', {'entries': batch}) is not None:
+                sent += len(batch)
+        if sent:
+            self.counters.count('shared_puts', sent)
+        return sent
+
+
+_shared_cache = None
+
+
+def get_shared_cache():
+    """Return the shared cache client, or None when no url is configured"""
+    global _shared_cache
+    url = settings_manager.get('SharedCache', 'url', '').strip()
+    if not url:
+        return None
+    if _shared_cache is None or _shared_cache.address != url:
+        _shared_cache = SharedCache(url)
+    return _shared_cache
+
+
+def make_server(host='127.0.0.1', port=8790, path=None, max_entries=1000000, ttl_days=30, token=''):
+    """Create the reference server; port 0 picks a free one"""
+    import hmac
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    store = TranslationCache(path or basedir / "shared_cache.sqlite3", max_entries=max_entries,
+                             ttl=ttl_days * 86400)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _authorized(self):
+            return not token or hmac.compare_digest(self.headers.get('Authorization', ''), f"Bearer {token}")
+
+        def do_GET(self):
+            if not self._authorized():
+                return self._send(401, {'error': 'unauthorized'})
+            if self.path.rstrip('/') != '/stats':
+                return self._send(404, {'error': 'not found'})
+            stats = store.stats()
+            if stats is None:
+                return self._send(503, {'error': 'store unavailable'})
+            self._send(200, stats)
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.close_connection = True
+                return self._send(400, {'error': 'invalid content length'})
+            if length > MAX_BODY:
+                self.close_connection = True
+                return self._send(413, {'error': 'too large'})
+            body = self.rfile.read(length)
+            if not self._authorized():
+                return self._send(401, {'error': 'unauthorized'})
+            field = {'/get': 'keys', '/put': 'entries'}.get(self.path)
+            if field is None:
+                return self._send(404, {'error': 'not found'})
+            try:
+                request = json.loads(body)
+            except ValueError:
+                return self._send(400, {'error': 'invalid json'})
+            if not isinstance(request, dict) or not isinstance(request.get(field), list):
+                return self._send(400, {'error': f"expected an object with a list of {field}"})
+
+            if field == 'keys':
+                values = []
+                for key in request['keys'][:MAX_BATCH]:
+                    if isinstance(key, list) and len(key) == 3 and all(isinstance(part, str) for part in key):
+                        results = store.get(*key)
+                        values.append([list(result) for result in results] if results else None)
+                    else:
+                        values.append(None)
+                return self._send(200, {'values': values})
+
+            stored = 0
+            for entry in request['entries'][:MAX_BATCH]:
+                if isinstance(entry, list) and len(entry) == 4 and \
+                        all(isinstance(part, str) for part in entry[:3]) and valid_results(entry[3]):
+                    store.put(entry[0], entry[1], entry[2], entry[3])
+                    stored += 1
+            self._send(200, {'stored': stored})
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(**kwargs):
+    """Run the reference server until interrupted, see ``make_server``"""
+    server = make_server(**kwargs)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
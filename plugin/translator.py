@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+googletrans backend.
+
+One ``Translator`` per process reuses a single httpx connection pool, so
+keep-alive and HTTP/2 connections (and the TKK token) survive between
+translations instead of paying a new TLS handshake every time. Each
+request is pinned to one service URL and run through a ``HedgedCaller``,
+which bounds it with a deadline, hedges slow requests on another URL and
+skips failing ones. Only imported on a cache miss, as it loads the HTTP
+stack.
+"""
+
+import json
+import threading
+
+import httpcore
+import httpx
+from googletrans import Translator, urls
+from googletrans.constants import DEFAULT_CLIENT_SERVICE_URLS
+from httpx._config import SSLConfig
+
+from plugin.backend import BATCH, CANDIDATES, DETECT, Backend, Translation
+from plugin.cache import translation_cache
+from plugin.hedging import HedgedCaller
+from plugin.settings_manager import settings_manager
+
+
+class CountingConnectionPool(httpcore.SyncConnectionPool):
+    """Connection pool that counts requests and newly opened connections"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.requests = 0
+        self.connections_opened = 0
+
+    def request(self, *args, **kwargs):
+        self.requests += 1
+        return super().request(*args, **kwargs)
+
+    def _add_to_pool(self, connection, timeout=None):
+        # Only called for connections that could not be taken from the pool
+        self.connections_opened += 1
+        super()._add_to_pool(connection, timeout=timeout)
+
+
+class PooledTranslator(Translator):
+    """Translator that rotates through its service URLs in order, unless a thread pins one"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._service_url_index = -1
+        self._service_url_lock = threading.Lock()
+        self._pinned = threading.local()
+
+    def pinned(self, url, method, *args, **kwargs):
+        """Call a translator method with its requests sent to one service URL"""
+        self._pinned.url = url
+        try:
+            return getattr(self, method)(*args, **kwargs)
+        finally:
+            self._pinned.url = None
+
+    def _pick_service_url(self):
+        url = getattr(self._pinned, 'url', None)
+        if url:
+            return url
+        with self._service_url_lock:
+            self._service_url_index = (self._service_url_index + 1) % len(self.service_urls)
+            return self.service_urls[self._service_url_index]
+
+
+class TranslatorPool:
+    """Builds the process-wide translator from the [Network] settings"""
+
+    def __init__(self):
+        self._translator = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self.hedger = HedgedCaller(
+            deadline=settings_manager.get_float('Network', 'deadline', 5),
+            hedge=settings_manager.get_boolean('Network', 'hedge', True),
+            hedge_delay=settings_manager.get_float('Network', 'hedge_delay', 1.0),
+            hedge_percentile=settings_manager.get_int('Network', 'hedge_percentile', 95),
+            max_hedges=settings_manager.get_int('Network', 'max_hedges', 1),
+            breaker_failures=settings_manager.get_int('Network', 'breaker_failures', 3),
+            breaker_cooldown=settings_manager.get_float('Network', 'breaker_cooldown', 30),
+            # Invalid languages are raised as ValueError before any request
+            is_failure=lambda error: not isinstance(error, ValueError) or isinstance(error, json.JSONDecodeError),
+            on_event=translation_cache.count,
+        )
+
+    def _build(self):
+        service_urls = [
+            url.strip()
+            for url in settings_manager.get('Network', 'service_urls', '').split(',')
+            if url.strip()
+        ] or list(DEFAULT_CLIENT_SERVICE_URLS)
+        explicit_schemes = any("://" in url for url in service_urls)
+        if explicit_schemes:
+            # Explicit schemes, e.g. a local stand-in at http://127.0.0.1:8765
+            urls.TRANSLATE = "{host}/translate_a/single"
+            service_urls = [url if "://" in url else f"https://{url}" for url in service_urls]
+        http2 = settings_manager.get_boolean('Network', 'http2', True)
+        timeout = httpx.Timeout(
+            settings_manager.get_float('Network', 'timeout', 5),
+            connect_timeout=settings_manager.get_float('Network', 'connect_timeout', 3),
+        )
+
+        # Error responses raise instead of echoing the query back as its translation
+        translator = PooledTranslator(
+            service_urls=service_urls, timeout=timeout, http2=http2, raise_exception=True
+        )
+        if explicit_schemes:
+            # The constructor strips a googleapis URL down to its bare host
+            translator.service_urls = service_urls
+
+        self._pool = CountingConnectionPool(
+            ssl_context=SSLConfig().ssl_context,
+            max_connections=settings_manager.get_int('Network', 'max_connections', 10),
+            max_keepalive=settings_manager.get_int('Network', 'max_keepalive', 5),
+            keepalive_expiry=settings_manager.get_float('Network', 'keepalive_expiry', 60),
+            http2=http2,
+        )
+        translator.client.transport.close()
+        translator.client.transport = self._pool
+        return translator
+
+    def get(self):
+        """Return the shared translator, creating it on first use"""
+        if self._translator is None:
+            with self._lock:
+                if self._translator is None:
+                    self._translator = self._build()
+        return self._translator
+
+    def call(self, method, *args, **kwargs):
+        """Call a translator method under the deadline, hedges and breakers"""
+        translator = self.get()
+        return self.hedger.call(
+            lambda url: translator.pinned(url, method, *args, **kwargs), translator.service_urls
+        )
+
+    def stats(self):
+        """Return request, connection and hedging counters for the shared client"""
+        if self._pool is None:
+            stats = {'requests': 0, 'connections_opened': 0, 'connections_reused': 0}
+        else:
+            stats = {
+                'requests': self._pool.requests,
+                'connections_opened': self._pool.connections_opened,
+                'connections_reused': self._pool.requests - self._pool.connections_opened,
+            }
+        for name in ('hedges', 'hedge_wins', 'failures', 'breaker_trips', 'deadline_exceeded'):
+            stats[name] = self.hedger.stats[name]
+        return stats
+
+
+# Global translator pool instance
+translator_pool = TranslatorPool()
+
+
+class GoogletransBackend(Backend):
+    """Google Translate through the shared googletrans client"""
+
+    name = 'googletrans'
+    capabilities = frozenset({DETECT, BATCH, CANDIDATES})
+
+    def warm_up(self):
+        translator_pool.get()
+
+    def translate(self, text, src='auto', dest='en'):
+        translation = translator_pool.call('translate', text, src=src, dest=dest)
+        try:
+            candidates = list(translation.extra_data['language'][0])
+        except (KeyError, IndexError, TypeError):
+            candidates = []
+        return Translation(translation.src, dest, translation.text, candidates)
+
+    def detect(self, text):
+        detected = translator_pool.call('detect', text)
+        return detected.lang, detected.confidence
+
+    def stats(self):
+        return translator_pool.stats()
@@ -1,71 +1,503 @@
 # -*- coding: utf-8 -*-
 
-import copy
+import json
+import threading
 from typing import List
 
 from flowlauncher import FlowLauncher
 
-from googletrans import Translator
-from googletrans.constants import LANGUAGES, SPECIAL_CASES
-from plugin.templates import *
+from plugin import metrics
+from plugin.languages import language_index
+from plugin.settings import ICON_PATH
 from plugin.extensions import _
 from plugin.settings_manager import settings_manager
-import locale
+from plugin.cache import translation_cache
+from plugin.debounce import debouncer
+from plugin.backend import CANDIDATES, get_backend
+from plugin.results import ResultList, payload
+
+
+def detect_language(query: str):
+    """Return the source language detected offline, or None to let Google detect it"""
+    if not settings_manager.get_boolean('Detection', 'offline', True):
+        return None
+    # Imported here so that commands other than translation never load the model
+    from plugin.detect import MIN_CONFIDENCE, language_detector
+
+    try:
+        with metrics.stage('detect'):
+            detection = language_detector.detect(query)
+    except Exception:
+        return None
+    if detection and detection.confidence >= settings_manager.get_float('Detection', 'min_confidence', MIN_CONFIDENCE):
+        return detection.lang
+    return None
+
+
+def lookup_glossary(src: str, dest: str, query: str):
+    """Return the (src, term, translation) of a glossary entry for the query, or None"""
+    # Imported here so that commands other than translation never stat the glossaries
+    from plugin.glossary import glossaries
+
+    try:
+        with metrics.stage('glossary'):
+            entry = glossaries.lookup(src, dest, query)
+    except Exception:
+        return None
+    if entry:
+        translation_cache.count('glossary_hits')
+    return entry
+
+
+def lookup_memory(dest: str, query: str):
+    """Return (similarity, query, src, text) of the closest earlier translations to dest"""
+    limit = settings_manager.get_int('Memory', 'suggestions', 2)
+    if limit <= 0 or not settings_manager.get_boolean('Memory', 'enabled', True):
+        return []
+    # Imported here so that commands other than translation never open the memory
+    from plugin.memory import translation_memory
+
+    with metrics.stage('memory'):
+        matches = translation_memory.lookup(
+            dest, query, limit=limit, min_similarity=settings_manager.get_float('Memory', 'min_similarity', 0.6)
+        )
+    if matches:
+        translation_cache.count('memory_suggestions', len(matches))
+    return matches
+
+
+def remember(dest: str, query: str, results: List[tuple]):
+    """Add a translation fetched over the network to the translation memory"""
+    if not results or not settings_manager.get_boolean('Memory', 'enabled', True):
+        return
+    src, text = results[0]
+    if text.lower() == query.lower():
+        return
+    from plugin.memory import translation_memory
+
+    translation_memory.add(dest, query, src, text)
+
+
+def record_query(src: str, dest: str, query: str):
+    """Count a translated query for prewarming the cache after a change of default language"""
+    # Imported here so that only translations load the prewarm job
+    from plugin import prewarm
+
+    with metrics.stage('cache'):
+        prewarm.record(src, dest, query)
+
+
+def lookup_shared(keys: List[tuple]) -> dict:
+    """Look up (src, dest, query) keys in the shared cache tier, keeping the hits locally"""
+    # Imported here so that only cache misses load the shared cache client
+    from plugin.shared_cache import get_shared_cache
+
+    shared = get_shared_cache()
+    if shared is None or not keys:
+        return {}
+    with metrics.stage('shared'):
+        values = shared.get_many(keys)
+    found = {key: results for key, results in zip(keys, values) if results is not None}
+    for (src, dest, query), results in found.items():
+        translation_cache.put(src, dest, query, results)
+        remember(dest, query, results)
+    if found:
+        translation_cache.count('shared_hits', len(found))
+    if len(found) < len(keys):
+        translation_cache.count('shared_misses', len(keys) - len(found))
+    return found
+
+
+def share(src: str, dest: str, query: str, results: List[tuple]):
+    """Queue a translation fetched from Google for the shared cache tier"""
+    from plugin.shared_cache import get_shared_cache
+
+    shared = get_shared_cache()
+    if shared is not None and results:
+        shared.put(src, dest, query, results)
+
+
+_executor = None
+
+
+def get_executor():
+    """Return the worker pool for concurrent translations"""
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        _executor = ThreadPoolExecutor(
+            max_workers=settings_manager.get_int('Translation', 'max_parallel', 4),
+            thread_name_prefix="translate",
+        )
+    return _executor
+
+
+# Translations still running in the worker pool, by (src, dest, query)
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def fetch_in_background(fetch, src: str, dest: str, query: str):
+    """Start a translation in the worker pool, or join the one already running for the same query"""
+    key = (src, dest, query)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is None:
+            future = _inflight[key] = get_executor().submit(fetch, src, dest, query)
+            future.add_done_callback(lambda future: _inflight.pop(key, None))
+    return future
 
 
 class Main(FlowLauncher):
-    items = []
+    # Set by the daemon, whose worker threads survive the request
+    resident = False
+    # The query as typed and the action keyword it came with, when the
+    # request carries one, for rows that re-run it
+    raw_query = ""
+    action_keyword = None
+    # Methods a JSON-RPC request may call: the queries and the actions of rows
+    rpc_methods = frozenset({
+        "query", "context_menu", "set_default_language", "confirm_language_change",
+        "cancel_language_change", "clear_cache",
+    })
+
+    def __init__(self):
+        """Answer the JSON-RPC request in sys.argv on stdout, like FlowLauncher"""
+        import sys
+
+        request = json.loads(sys.argv[1]) if len(sys.argv) > 1 else {"method": "query", "parameters": [""]}
+        output = self._dispatch(request)
+        if output is not None:
+            with metrics.stage('output'):
+                print(output)
+
+    @classmethod
+    def handle(cls, request: dict):
+        """
+        Run a JSON-RPC request without going through sys.argv and stdout.
+
+        Returns the text FlowLauncher would print, or None for actions.
+        """
+        return cls.__new__(cls)._dispatch(request)
+
+    def _dispatch(self, request: dict):
+        # Every request collects its own rows
+        self.items = ResultList(limit=settings_manager.get_int('Results', 'max_results', 200))
+        self.debugMessage = ""
+        self.action_keyword = request.get("actionKeyword")
+        method = request.get("method", "query")
+        if method not in self.rpc_methods:
+            raise ValueError(f"invalid method: {method}")
+        if method != "query":
+            metrics.tag(command=method)
+        with metrics.stage('dispatch'):
+            results = getattr(self, method)(*request.get("parameters", []))
+        if method in ("query", "context_menu"):
+            with metrics.stage('render'):
+                return payload(results, self.debugMessage)
+        return None
+
+    @staticmethod
+    def warm_up():
+        """Load the HTTP stack, the cache and the language model ahead of the first query"""
+        get_backend().warm_up()
+        translation_cache.stats()
+        detect_language("warm up")
 
     @staticmethod
     def system_lang():
+        import locale
+
         lang = locale.getdefaultlocale()
         return lang[0][:2] if lang else "en"
 
     def add_item(self, title: str, subtitle: str, method: str = None, parameters: list = None):
-        item = {'Title': title, 'SubTitle': subtitle, 'IcoPath': ICON_PATH}
-        if method:
-            item['JsonRPCAction'] = {
-                'method': method,
-                'parameters': parameters or []
-            }
-        self.items.append(item)
+        self.items.add(title, subtitle, ICON_PATH, method, parameters)
+
+    @staticmethod
+    def remaining_budget():
+        """
+        Seconds left to answer the current query, or None without a budget.
+
+        The budget counts from the arrival of the request (the top of
+        main.py, or the resident backend receiving it), so a slow start
+        leaves less time for the network.
+        """
+        budget = settings_manager.get_float('Translation', 'query_budget', 2.0)
+        if budget <= 0:
+            return None
+        return max(0.0, budget - metrics.elapsed())
 
     @staticmethod
     def valid_lang(lang: str) -> bool:
-        return lang in LANGUAGES or lang in SPECIAL_CASES
+        return lang in language_index().codes
+
+    @staticmethod
+    def fetch_translations(src: str, dest: str, query: str) -> List[tuple]:
+        """Translate over the network, returning a list of (src, text) results"""
+        if src == "auto":
+            # Confident offline detections skip Google's detector
+            detected = detect_language(query)
+            if detected:
+                translation_cache.count('detect_local')
+                if detected == dest:
+                    # Already in the target language, nothing to translate
+                    return [(detected, query)]
+                return Main.fetch_translations(detected, dest, query)
+            translation_cache.count('detect_remote')
+
+        # The HTTP stack is only loaded here, on the first cache miss
+        with metrics.stage('imports'):
+            backend = get_backend()
+
+        # Long texts go sentence by sentence, each sentence cached on its own
+        split_above = settings_manager.get_int('Translation', 'split_above', 1000)
+        if 0 < split_above < len(query):
+            from plugin.batch import translate_text
+
+            with metrics.stage('network'):
+                return [translate_text(
+                    query, src=src, dest=dest,
+                    workers=settings_manager.get_int('Translation', 'max_parallel', 4),
+                )]
+
+        with metrics.stage('network'):
+            translation = backend.translate(query, src=src, dest=dest)
+            results = [(translation.src, translation.text)]
+
+            # Auto-detection comes back with the translation in a single request;
+            # other candidate languages are only translated when opted in
+            if src == "auto" and CANDIDATES in backend.capabilities and \
+                    settings_manager.get_boolean('Translation', 'detect_candidates', False):
+                for candidate in translation.candidates:
+                    if candidate != translation.src:
+                        results.append((candidate, backend.translate(query, src=candidate, dest=dest).text))
+
+        return results
+
+    @classmethod
+    def fetch_and_cache(cls, src: str, dest: str, query: str) -> List[tuple]:
+        """Translate over the network and store the results in the cache"""
+        results = cls.fetch_translations(src, dest, query)
+        with metrics.stage('cache'):
+            translation_cache.put(src, dest, query, results)
+        with metrics.stage('memory'):
+            remember(dest, query, results)
+        with metrics.stage('shared'):
+            share(src, dest, query, results)
+        return results
+
+    def add_results(self, dest: str, query: str, results: List[tuple]):
+        """Show the (src, text) results of translating the query to one language"""
+        for src, text in results:
+            # Check if translation actually happened
+            if text.lower() == query.lower():
+                # Translation didn't change - show debug info
+                self.add_item(f"⚠️ {text}", f"No change: {src} → {dest} (same text)")
+            else:
+                # Normal translation result
+                self.add_item(str(text), f"{src} → {dest}   {query}")
+
+    def add_glossary(self, dest: str, entry: tuple):
+        """Show a glossary entry"""
+        src, term, text = entry
+        self.add_item(str(text), f"📘 Glossary: {src} → {dest}   {term}")
+
+    def add_provisional(self, dest: str, provisional: tuple):
+        """Show the cached translation of a prefix of the query"""
+        prefix, results = provisional
+        for src, text in results:
+            self.add_item(f"⏳ {text}", f"Provisional: {src} → {dest}   {prefix}…")
+
+    def add_memory(self, dest: str, query: str):
+        """Show the closest earlier translations of similar queries"""
+        for score, similar, src, text in lookup_memory(dest, query):
+            self.add_item(f"🧠 {text}", f"Memory {score:.0%}: {src} → {dest}   {similar}")
+
+    def add_pending(self, src: str, dest: str, query: str):
+        """Show a translation that is still running after the query's budget"""
+        # Global plugins (keyword "*") are queried without one
+        keyword = self.action_keyword
+        requery = f"{keyword} {self.raw_query}" if keyword and keyword != "*" else self.raw_query
+        self.add_item("⏳ Still translating…", f"{src} → {dest}   {query} — select to show the result",
+                      method="Flow.Launcher.ChangeQuery", parameters=[requery, True])
 
     def translate(self, src: str, dest: str, query: str):
+        metrics.tag(command="translate")
+        provisional = None
         try:
             # Check if destination language is valid first
             if not self.valid_lang(dest):
                 self.add_item(f"❌ Invalid language code: {dest}", f"'{dest}' is not supported by Google Translate")
                 return self.items
-                
-            translator = Translator()
-            if src == "auto":
-                detected = translator.detect(query)
-                src = detected.lang
-                sources = src if isinstance(src, list) else [src]
-            else: 
-                sources = [src]
-
-            for src in sources:
-                translation = translator.translate(query, src=src, dest=dest)
-                
-                # Check if translation actually happened
-                if translation.text.lower() == query.lower():
-                    # Translation didn't change - show debug info
-                    self.add_item(f"⚠️ {translation.text}", f"No change: {src} → {dest} (same text)")
+
+            # Any newer keystroke supersedes this query from here on
+            token = debouncer.begin()
+
+            # Fixed terms are answered from the glossary without the network
+            entry = lookup_glossary(src, dest, query)
+            if entry:
+                metrics.tag(outcome='glossary')
+                self.add_glossary(dest, entry)
+                return self.items
+
+            with metrics.stage('cache'):
+                results = translation_cache.get(src, dest, query)
+            cached = results is not None
+            metrics.tag(outcome='cache' if cached else 'network')
+            if not cached:
+                if debouncer.too_short(query):
+                    self.add_item("⌨️ Keep typing…", f"Type at least {debouncer.min_query_length} characters to translate")
+                    return self.items
+
+                # Earlier keystrokes of the same phrase stand in while translating
+                with metrics.stage('cache'):
+                    provisional = translation_cache.get_prefix(src, dest, query)
+
+                # Only the query the user settled on goes to the network
+                with metrics.stage('debounce'):
+                    settled = debouncer.settle(token)
+                if not settled:
+                    metrics.tag(outcome='suppressed')
+                    translation_cache.count('debounce_suppressed')
+                    if provisional:
+                        self.add_provisional(dest, provisional)
+                    self.add_memory(dest, query)
+                    return self.items
+                translation_cache.count('debounce_sent')
+
+                # Another machine may have translated it already
+                results = lookup_shared([(src, dest, query)]).get((src, dest, query))
+
+                window = self.remaining_budget()
+                if provisional and self.resident:
+                    # Show the prefix result if the network is slow
+                    speculation = settings_manager.get_float('Translation', 'speculation_window', 0.3)
+                    window = speculation if window is None else min(window, speculation)
+                if results is not None:
+                    metrics.tag(outcome='shared')
+                elif window is None:
+                    results = self.fetch_and_cache(src, dest, query)
                 else:
-                    # Normal translation result
-                    self.add_item(str(translation.text), f"{src} → {dest}   {query}")
-                    
+                    from concurrent.futures import TimeoutError as FutureTimeoutError
+
+                    # The translation still completes and fills the cache when it
+                    # outlasts the window: in the resident backend, or before this
+                    # process exits, once the answer has been sent
+                    future = fetch_in_background(self.fetch_and_cache, src, dest, query)
+                    try:
+                        with metrics.stage('network'):
+                            results = future.result(timeout=window)
+                    except FutureTimeoutError:
+                        if provisional:
+                            metrics.tag(outcome='provisional')
+                            translation_cache.count('provisional_shown')
+                            self.add_provisional(dest, provisional)
+                        else:
+                            metrics.tag(outcome='pending')
+                            translation_cache.count('pending_shown')
+                        self.add_pending(src, dest, query)
+                        self.add_memory(dest, query)
+                        return self.items
+
+            self.add_results(dest, query, results)
+            if not cached:
+                # An exact cache hit needs no suggestions of similar ones
+                self.add_memory(dest, query)
+            record_query(src, dest, query)
+
         except Exception as error:
+            metrics.tag(outcome='error')
             error_msg = str(error)
             if "invalid destination language" in error_msg.lower():
                 self.add_item(f"❌ Invalid language: {dest}", f"'{dest}' not supported - try 'tr list' for valid codes")
+            elif isinstance(error, TimeoutError):
+                self.add_item(f"⏱️ Timed out: {error_msg}", f"Google did not answer: {src} → {dest}   {query}")
             else:
                 self.add_item(f"❌ Error: {error_msg}", f"Failed: {src} → {dest}   {query}")
+            if provisional:
+                self.add_provisional(dest, provisional)
+            self.add_memory(dest, query)
+        return self.items
+
+    def parse_targets(self, token: str):
+        """Parse 'en,fr,de' or '*' (favorite targets) into a list of languages, or None"""
+        if token == "*":
+            return settings_manager.get_favorite_targets() or None
+        if "," not in token:
+            return None
+        targets = list(dict.fromkeys(code for code in token.split(",") if code))
+        if any(self.valid_lang(code) for code in targets):
+            return targets
+        return None
+
+    def translate_many(self, src: str, dests: List[str], query: str):
+        """Translate a query into several languages concurrently, one row per language"""
+        metrics.tag(command="translate_many")
+        for dest in dests:
+            if not self.valid_lang(dest):
+                self.add_item(f"❌ Invalid language code: {dest}", f"'{dest}' is not supported by Google Translate")
+        dests = [dest for dest in dests if self.valid_lang(dest)]
+
+        # Any newer keystroke supersedes this query from here on
+        token = debouncer.begin()
+
+        entries = {dest: lookup_glossary(src, dest, query) for dest in dests}
+        with metrics.stage('cache'):
+            results = {dest: translation_cache.get(src, dest, query) for dest in dests if not entries[dest]}
+        missing = [dest for dest, cached in results.items() if cached is None]
+        pending = []
+        metrics.tag(outcome='network' if missing else 'cache' if results else 'glossary')
+        if missing:
+            if debouncer.too_short(query):
+                self.add_item("⌨️ Keep typing…", f"Type at least {debouncer.min_query_length} characters to translate")
+                return self.items
+            with metrics.stage('debounce'):
+                settled = debouncer.settle(token)
+            if not settled:
+                metrics.tag(outcome='suppressed')
+                translation_cache.count('debounce_suppressed')
+                return self.items
+            translation_cache.count('debounce_sent')
+
+            # Other machines may have translated some of them already, looked up in one request
+            for (_src, dest, _query), found in lookup_shared([(src, dest, query) for dest in missing]).items():
+                results[dest] = found
+            missing = [dest for dest in missing if results[dest] is None]
+            if not missing:
+                metrics.tag(outcome='shared')
+
+            from concurrent.futures import wait
+
+            # Latency is that of the slowest language rather than the sum; those
+            # still running after the budget are shown as pending
+            futures = {dest: fetch_in_background(self.fetch_and_cache, src, dest, query) for dest in missing}
+            with metrics.stage('network'):
+                wait(futures.values(), timeout=self.remaining_budget())
+            for dest, future in futures.items():
+                if not future.done():
+                    pending.append(dest)
+                    continue
+                try:
+                    results[dest] = future.result()
+                except Exception as error:
+                    results[dest] = error
+            if pending:
+                metrics.tag(outcome='pending')
+                translation_cache.count('pending_shown')
+
+        for dest in dests:
+            if entries[dest]:
+                self.add_glossary(dest, entries[dest])
+            elif dest in pending:
+                self.add_pending(src, dest, query)
+            elif isinstance(results[dest], TimeoutError):
+                self.add_item(f"⏱️ Timed out: {results[dest]}", f"Google did not answer: {src} → {dest}   {query}")
+            elif isinstance(results[dest], Exception):
+                self.add_item(f"❌ Error: {results[dest]}", f"Failed: {src} → {dest}   {query}")
+            else:
+                self.add_results(dest, query, results[dest])
         return self.items
 
     def help_action(self):
@@ -81,25 +513,98 @@ class Main(FlowLauncher):
         
         return self.items
     
-    def show_languages(self):
-        """Show all available languages when 'tr list' is typed"""
-        # Show all available languages with direct clickable options
-        for code, name in settings_manager.get_available_languages():
+    def show_languages(self, search: str = ""):
+        """Show all available languages for 'tr list', or the best matches for 'tr list <name>'"""
+        if search:
+            languages = [(language.code, language.display) for language in settings_manager.search_languages(search)]
+            if not languages:
+                self.add_item(f"❌ No language matches '{search}'", "Type 'tr list' to see all languages")
+                return self.items
+        else:
+            languages = settings_manager.get_available_languages()
+
+        # Show the languages with direct clickable options
+        for code, name in languages:
             self.add_item(f"{code} - {name}", f"Click to set {name} as default", 
                         method="set_default_language", parameters=[code, name])
         return self.items
 
+    def cache_action(self):
+        """Show translation cache statistics when 'tr cache' is typed"""
+        stats = translation_cache.stats()
+        if stats is None:
+            self.add_item("❌ Cache unavailable", "translation_cache.sqlite3 is locked or damaged, try again later")
+            self.add_item("🗑️ Clear Cache", "Click to remove all cached translations and the translation memory",
+                          method="clear_cache", parameters=[])
+            return self.items
+        self.add_item(f"🗄️ Cache: {stats['entries']} / {stats['max_entries']} entries",
+                      f"{stats['size'] / 1024:.0f} KB on disk, {stats['evictions']} evicted")
+        self.add_item(f"🎯 Hit ratio: {stats['hit_ratio']:.0%}",
+                      f"{stats['hits']} hits, {stats['misses']} misses")
+        self.add_item(f"⏱️ Debounce: {stats['debounce_suppressed']} requests suppressed",
+                      f"{stats['debounce_sent']} settled queries sent to Google, "
+                      f"{stats['provisional_shown']} answered provisionally")
+        if stats['pending_shown']:
+            self.add_item(f"⏳ Budget: {stats['pending_shown']} queries answered before their translation",
+                          "Translations that outlasted query_budget finished in the background")
+        detections = stats['detect_local'] + stats['detect_remote']
+        if detections:
+            self.add_item(f"🔍 Offline detection: {stats['detect_local'] / detections:.0%}",
+                          f"{stats['detect_local']} detected locally, {stats['detect_remote']} left to Google")
+        if stats['hedges'] or stats['breaker_trips'] or stats['deadline_exceeded']:
+            self.add_item(f"🛡️ Hedging: {stats['hedge_wins']} of {stats['hedges']} hedges won",
+                          f"{stats['breaker_trips']} endpoints taken out, "
+                          f"{stats['deadline_exceeded']} translations past the deadline")
+        from plugin.memory import translation_memory
+
+        remembered = len(translation_memory)
+        if remembered:
+            self.add_item(f"🧠 Memory: {remembered} / {translation_memory.max_entries} translations",
+                          f"{stats['memory_suggestions']} similar translations suggested")
+        shared_lookups = stats['shared_hits'] + stats['shared_misses']
+        if shared_lookups or stats['shared_errors']:
+            self.add_item(f"🌐 Shared cache: {stats['shared_hits']} of {shared_lookups} lookups found",
+                          f"{stats['shared_puts']} translations shared, {stats['shared_errors']} failed requests")
+        if stats['prewarmed']:
+            self.add_item(f"🔥 Prewarm: {stats['prewarmed']} translations cached ahead of use",
+                          "Frequent queries translated after a change of default language or at idle")
+        if stats['glossary_hits']:
+            self.add_item(f"📘 Glossary: {stats['glossary_hits']} terms answered locally",
+                          "Translations found in the glossaries under 'glossary/'")
+        self.add_item("🗑️ Clear Cache", "Click to remove all cached translations and the translation memory",
+                      method="clear_cache", parameters=[])
+        return self.items
+
+    def stats_action(self):
+        """Show per-stage query timings when 'tr stats' is typed"""
+        summary = metrics.summarize(metrics.read_records())
+        if not summary['queries']:
+            self.add_item("📈 No timings recorded yet", "Queries are timed while [Metrics] enabled = true")
+            return self.items
+
+        p50, p95 = summary['total']
+        self.add_item(f"📈 {summary['queries']} queries: p50 {p50:.0f} ms, p95 {p95:.0f} ms",
+                      "Total time per query, including interpreter start")
+        overall = sum(total for *_stage, total in summary['stages']) or 1
+        for name, count, p50, p95, total in summary['stages']:
+            self.add_item(f"⏱️ {name}: p50 {p50:.1f} ms, p95 {p95:.1f} ms",
+                          f"In {count} requests, {total / overall:.0%} of all time")
+
+        outcomes = summary['outcomes']
+        answered = sum(outcomes.values())
+        if answered:
+            local = outcomes.get('cache', 0) + outcomes.get('glossary', 0)
+            self.add_item(f"🎯 Answered locally: {local / answered:.0%}",
+                          ", ".join(f"{name} {outcomes[name] / answered:.0%}"
+                                    for name in metrics.OUTCOMES if outcomes.get(name)))
+        return self.items
+
     def settings_action(self, params):
         """Handle 'set' command for changing language (tr set <code>)"""
         if len(params) >= 2:
             lang_code = params[1]
             if settings_manager.is_valid_language(lang_code):
-                # Find the language name from available languages
-                lang_name = lang_code.upper()  # Default fallback
-                for code, name in settings_manager.get_available_languages():
-                    if code == lang_code:
-                        lang_name = name
-                        break
+                lang_name = language_index().get(lang_code).display if lang_code != 'auto' else lang_code.upper()
                 
                 # Check if this is already the current language
                 current_lang = settings_manager.get_default_language()
@@ -115,6 +620,15 @@ class Main(FlowLauncher):
                             method="cancel_language_change", parameters=[])
                 return self.items
             else:
+                # 'tr set fren' offers the closest languages instead
+                matches = settings_manager.search_languages(" ".join(params[1:]), limit=5)
+                if matches:
+                    for language in matches:
+                        self.add_item(f"🔎 {language.code} - {language.display}",
+                                      f"Click to set {language.display} as default",
+                                      method="confirm_language_change",
+                                      parameters=[language.code, language.display])
+                    return self.items
                 self.add_item("❌ Invalid Language", f"'{lang_code}' is not a valid language code")
                 self.add_item("💡 Available Languages", "Type 'tr' to see all options")
                 return self.items
@@ -124,23 +638,48 @@ class Main(FlowLauncher):
             return self.items
 
     def query(self, param: str='') -> List[dict]:
+        self.raw_query = param
         query = param.strip()
         params = query.lower().split(" ")
         
         # Show help only if completely empty
         if not query.strip(): 
+            metrics.tag(command="help")
             return self.help_action()
 
         # Handle 'set' command for changing language (tr set <code>)
         if params[0] == "set":
+            metrics.tag(command="set")
             return self.settings_action(params)
         
         # Handle 'list' command for showing languages (tr list)
         if params[0] == "list":
-            return self.show_languages()
+            metrics.tag(command="list")
+            return self.show_languages(" ".join(params[1:]))
+
+        # Handle 'cache' command for showing cache statistics (tr cache)
+        if params == ["cache"]:
+            metrics.tag(command="cache")
+            return self.cache_action()
+
+        # Handle 'stats' command for showing query timings (tr stats)
+        if params == ["stats"]:
+            metrics.tag(command="stats")
+            return self.stats_action()
 
         # For any other input, try to translate
         try:
+            # Several targets at once: 'tr en,fr <text>', 'tr de en,fr <text>' or 'tr * <text>'
+            if len(params) >= 2:
+                targets = self.parse_targets(params[0])
+                if targets:
+                    return self.translate_many("auto", targets, " ".join(params[1:]))
+                if len(params) >= 3 and self.valid_lang(params[0]):
+                    targets = self.parse_targets(params[1])
+                    if targets:
+                        return self.translate_many(params[0], targets, " ".join(params[2:]))
+
+
             # Check if we have multiple words and first word is a valid language code
             if len(params) >= 2 and self.valid_lang(params[0]):
                 # Check if second word is also a language code
@@ -162,6 +701,8 @@ class Main(FlowLauncher):
         """Action method called when user clicks on a language option"""
         try:
             settings_manager.set_default_language(lang_code, lang_name)
+            # Frequent queries were cached for the previous language
+            self.prewarm(lang_code)
             # Return False to prevent Flow Launcher from closing
             return False
         except Exception as e:
@@ -172,12 +713,35 @@ class Main(FlowLauncher):
         """Action method called when user clicks confirm button"""
         try:
             settings_manager.set_default_language(lang_code, lang_name)
+            # Frequent queries were cached for the previous language
+            self.prewarm(lang_code)
             # Return False to prevent Flow Launcher from closing
             return False
         except Exception as e:
             # Return False to prevent Flow Launcher from closing even on error
             return False
     
+    @staticmethod
+    def prewarm(dest: str):
+        """Translate frequent queries into a new default language in the background"""
+        from plugin import prewarm
+
+        try:
+            prewarm.start(dest)
+        except Exception:
+            pass
+
+    def clear_cache(self):
+        """Action method called when user clicks the clear cache button"""
+        from plugin.memory import translation_memory
+
+        for store in (translation_cache, translation_memory):
+            try:
+                store.clear()
+            except Exception:
+                pass
+        return False
+
     def cancel_language_change(self):
         """Action method called when user clicks cancel button"""
         # Just return False to prevent Flow Launcher from closing